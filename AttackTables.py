@@ -0,0 +1,99 @@
+### Per-square move and attack tables, built once at import.
+### Squares are (row, col) tuples for the 8x8 board, tables are indexed as TABLE[row][col].
+### The bitboard versions of the same tables are indexed by square number row * 8 + col.
+
+# Directions are (dRow, dCol). The first four are orthogonal, the last four diagonal.
+DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+ROOK_DIRECTIONS = DIRECTIONS[:4]
+BISHOP_DIRECTIONS = DIRECTIONS[4:]
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+PAWN_CAPTURE_OFFSETS = {'w': ((-1, -1), (-1, 1)), 'b': ((1, -1), (1, 1))}
+
+
+def _onBoard(r, c):
+    return 0 <= r < 8 and 0 <= c < 8
+
+
+def _steps(r, c, offsets):
+    return tuple((r + dr, c + dc) for dr, dc in offsets if _onBoard(r + dr, c + dc))
+
+
+def _ray(r, c, d):
+    squares = []
+    endRow, endCol = r + d[0], c + d[1]
+    while _onBoard(endRow, endCol):
+        squares.append((endRow, endCol))
+        endRow += d[0]
+        endCol += d[1]
+    return tuple(squares)
+
+
+def _table(build):
+    return [[build(r, c) for c in range(8)] for r in range(8)]
+
+
+KNIGHT_TARGETS = _table(lambda r, c: _steps(r, c, KNIGHT_OFFSETS))
+KING_TARGETS = _table(lambda r, c: _steps(r, c, KING_OFFSETS))
+# squares attacked by a pawn of the given color standing on (row, col)
+PAWN_CAPTURES = {color: _table(lambda r, c, offsets=offsets: _steps(r, c, offsets))
+                 for color, offsets in PAWN_CAPTURE_OFFSETS.items()}
+
+# (direction, squares ordered outward from the piece) for every direction that leaves the square
+ROOK_RAYS = _table(lambda r, c: tuple((d, _ray(r, c, d)) for d in ROOK_DIRECTIONS if _ray(r, c, d)))
+BISHOP_RAYS = _table(lambda r, c: tuple((d, _ray(r, c, d)) for d in BISHOP_DIRECTIONS if _ray(r, c, d)))
+QUEEN_RAYS = _table(lambda r, c: ROOK_RAYS[r][c] + BISHOP_RAYS[r][c])
+
+
+# --- Bitboard tables ---
+
+def squareBit(r, c):
+    return 1 << (r * 8 + c)
+
+
+def _mask(squares):
+    mask = 0
+    for r, c in squares:
+        mask |= squareBit(r, c)
+    return mask
+
+
+KNIGHT_ATTACKS = [_mask(KNIGHT_TARGETS[sq // 8][sq % 8]) for sq in range(64)]
+KING_ATTACKS = [_mask(KING_TARGETS[sq // 8][sq % 8]) for sq in range(64)]
+PAWN_ATTACKS = {color: [_mask(table[sq // 8][sq % 8]) for sq in range(64)] for color, table in PAWN_CAPTURES.items()}
+
+# Directions that move towards higher square numbers find their first blocker in the lowest set bit,
+# the others in the highest set bit.
+POSITIVE_DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+# RAY_MASKS[d][sq] is (mask, positive) for every slider direction
+RAY_MASKS = {d: [(_mask(_ray(sq // 8, sq % 8, d)), d in POSITIVE_DIRECTIONS) for sq in range(64)]
+             for d in DIRECTIONS}
+
+
+# --- Pawn structure masks, for the pawn evaluation ---
+
+FILE_MASKS = [_mask((r, c) for r in range(8)) for c in range(8)]
+ADJACENT_FILE_MASKS = [(FILE_MASKS[c - 1] if c > 0 else 0) | (FILE_MASKS[c + 1] if c < 7 else 0) for c in range(8)]
+# rows in front of a pawn of the given color at the given row, white moves towards row 0
+_AHEAD = {'w': lambda row: range(0, row), 'b': lambda row: range(row + 1, 8)}
+_BEHIND = {'w': lambda row: range(row, 8), 'b': lambda row: range(0, row + 1)}
+
+
+def _pawnMasks(rows, files):
+    return {color: [_mask((r, c) for r in rows[color](sq // 8) for c in range(8) if c in files(sq % 8))
+                    for sq in range(64)] for color in rows}
+
+
+def _threeFiles(col):
+    return (col - 1, col, col + 1)
+
+
+# own and adjacent files in front of the pawn: an enemy pawn there stops it from being passed
+PASSED_PAWN_MASKS = _pawnMasks(_AHEAD, _threeFiles)
+# own and adjacent files from the pawn's row forward, where candidate passers count pawns on both sides
+FORWARD_SPAN_MASKS = _pawnMasks({'w': lambda row: range(0, row + 1), 'b': lambda row: range(row, 8)}, _threeFiles)
+# adjacent files level with or behind the pawn: any friendly pawn there keeps it from being backward
+BACKWARD_SUPPORT_MASKS = _pawnMasks(_BEHIND, lambda col: (col - 1, col + 1))
+# adjacent files within two rows, where a passed pawn counts as connected
+CONNECTED_MASKS = [_mask((r, c) for r in range(sq // 8 - 2, sq // 8 + 3) for c in (sq % 8 - 1, sq % 8 + 1)
+                         if _onBoard(r, c)) for sq in range(64)]
@@ -0,0 +1,199 @@
+### Evaluate many positions at once with NumPy, for offline analysis.
+### Positions are packed as (pieces, whiteToMove, castling): pieces is an (N, 64) int8 array of piece
+### indexes in PIECES order (EMPTY for no piece) by square number row * 8 + col, whiteToMove an (N,) bool
+### array and castling an (N,) uint8 array of castle masks (1 = wks, 2 = wqs, 4 = bks, 8 = bqs).
+### evaluate() gives the same score as SmartMoveFinder.scoreBoard without a search window.
+
+import numpy as np
+
+from AttackTables import (ADJACENT_FILE_MASKS, BACKWARD_SUPPORT_MASKS, CONNECTED_MASKS, FILE_MASKS,
+                          FORWARD_SPAN_MASKS, PASSED_PAWN_MASKS, PAWN_ATTACKS)
+import SmartMoveFinder
+from SmartMoveFinder import PIECE_SQUARE_EG, PIECE_SQUARE_MG, TOTAL_PHASE, phaseWeight
+
+PIECES = ("wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK")
+PIECE_INDEX = {piece: i for i, piece in enumerate(PIECES)}
+EMPTY = len(PIECES)
+FEN_PIECES = {'P': 'wp', 'N': 'wN', 'B': 'wB', 'R': 'wR', 'Q': 'wQ', 'K': 'wK',
+              'p': 'bp', 'n': 'bN', 'b': 'bB', 'r': 'bR', 'q': 'bQ', 'k': 'bK'}
+CASTLE_BITS = {'K': 1, 'Q': 2, 'k': 4, 'q': 8}
+SQUARES = np.arange(64)
+
+# Piece-square values by [piece index, square], the empty row is all zeros
+MG_TABLE = np.zeros((EMPTY + 1, 64))
+EG_TABLE = np.zeros((EMPTY + 1, 64))
+for _piece, _i in PIECE_INDEX.items():
+    MG_TABLE[_i] = PIECE_SQUARE_MG[_piece]
+    EG_TABLE[_i] = PIECE_SQUARE_EG[_piece]
+PHASE_WEIGHTS = np.array([0 if piece[1] == 'K' else phaseWeight[piece[1]] for piece in PIECES] + [0])
+COUNTED = np.array([piece[1] != 'K' for piece in PIECES] + [False])
+
+
+def _matrix(masks):
+    """Bitmasks by square as a (64, 64) matrix, so board @ matrix.T counts the pieces inside each square's mask"""
+    return np.array([[(mask >> sq) & 1 for sq in range(64)] for mask in masks], dtype=np.float32)
+
+
+def _pawnTables(color, enemy, step):
+    """Per-square pawn masks of one side stacked for one matrix product each, plus per-square constants"""
+    front = SQUARES + step
+    onBoard = (front >= 0) & (front < 64)
+    rows = SQUARES // 8
+    rank = 7 - rows if color == 'w' else rows
+    friendlyMasks = (FILE_MASKS[sq % 8] for sq in range(64)), (ADJACENT_FILE_MASKS[sq % 8] for sq in range(64)), \
+        BACKWARD_SUPPORT_MASKS[color], PAWN_ATTACKS[enemy], FORWARD_SPAN_MASKS[color]
+    enemyMasks = (PAWN_ATTACKS[color][sq + step] if onBoard[sq] else 0 for sq in range(64)), \
+        PASSED_PAWN_MASKS[color], FORWARD_SPAN_MASKS[color]
+    return {
+        # board @ friendly gives [file, adjacent files, support, defenders, span] counts, 64 columns each
+        "friendly": np.concatenate([_matrix(masks).T for masks in friendlyMasks], axis=1),
+        # board @ enemy gives [front square attackers, passed pawn mask, span] counts
+        "enemy": np.concatenate([_matrix(masks).T for masks in enemyMasks], axis=1),
+        "front": np.where(onBoard, front, 0),
+        "onBoard": onBoard,
+        "rank": rank,
+        "candidateScale": np.where(rows <= 2 if color == 'w' else rows >= 5, 1.3, 1.0),
+        "promotion": SQUARES % 8 if color == 'w' else 56 + SQUARES % 8,
+    }
+
+
+CONNECTED = _matrix(CONNECTED_MASKS)
+PAWN_TABLES = {'w': _pawnTables('w', 'b', -8), 'b': _pawnTables('b', 'w', 8)}
+DISTANCE = np.maximum(abs(SQUARES[:, None] // 8 - SQUARES[None, :] // 8),
+                      abs(SQUARES[:, None] % 8 - SQUARES[None, :] % 8))
+WING = (SQUARES % 8 <= 2) | (SQUARES % 8 >= 5)
+# SmartMoveFinder penalties by the weakness index pawn_terms gives
+WEAKNESSES = ("DOUBLED_ISOLATED_PENALTY", "DOUBLED_PENALTY", "ISOLATED_PENALTY", "ISOLATED_PENALTY_EG",
+              "BACKWARD_PENALTY")
+
+
+def pack_fens(fens):
+    """Pack FEN strings. Only the board, side to move and castling fields matter to the evaluation."""
+    pieces = np.full((len(fens), 64), EMPTY, dtype=np.int8)
+    whiteToMove = np.zeros(len(fens), dtype=bool)
+    castling = np.zeros(len(fens), dtype=np.uint8)
+    for n, fen in enumerate(fens):
+        fields = fen.split()
+        sq = 0
+        for ch in fields[0]:
+            if ch.isdigit():
+                sq += int(ch)
+            elif ch != '/':
+                pieces[n, sq] = PIECE_INDEX[FEN_PIECES[ch]]
+                sq += 1
+        whiteToMove[n] = len(fields) < 2 or fields[1] == 'w'
+        if len(fields) > 2:
+            castling[n] = sum(CASTLE_BITS.get(ch, 0) for ch in fields[2])
+    return pieces, whiteToMove, castling
+
+
+def pack_states(states):
+    """Pack GameState objects (any backend)"""
+    pieces = np.array([[PIECE_INDEX.get(gs.board[sq // 8][sq % 8], EMPTY) for sq in range(64)] for gs in states],
+                      dtype=np.int8).reshape(len(states), 64)
+    whiteToMove = np.array([gs.whiteToMove for gs in states], dtype=bool)
+    castling = np.array([gs.currentCastlingRights.mask() for gs in states], dtype=np.uint8)
+    return pieces, whiteToMove, castling
+
+
+def pawn_terms(pieces, endgame, kings):
+    """
+    Everything evaluate_pawns needs apart from the pawn constants, one entry per pawn of the batch, so the pawn
+    score is linear in the constants. The tests are the same as pawn_structure_entry. Returns arrays of
+    (position, sign, weakness index or -1, rank, passed, passedScale, passedExtra, candidateScale): a passed pawn
+    scores PASSED_PAWN_BONUS[rank] * passedScale + passedExtra, any other CANDIDATE_PAWN_BONUS[rank] * candidateScale.
+    The mask counts come from one matrix product per side over the whole batch.
+    """
+    count = len(pieces)
+    boards = {color: (pieces == PIECE_INDEX[color + 'p']).astype(np.float32) for color in 'wb'}
+    colors = pieces // 6  # 0 white, 1 black, 2 empty
+    terms = []
+    for color, enemy, sign in (('w', 'b', 1), ('b', 'w', -1)):
+        tables = PAWN_TABLES[color]
+        n, sq = np.nonzero(boards[color])
+        friendly = (boards[color] @ tables["friendly"])[n[:, None], sq[:, None] + np.arange(0, 320, 64)]
+        enemies = (boards[enemy] @ tables["enemy"])[n[:, None], sq[:, None] + np.arange(0, 192, 64)]
+        inEndgame = endgame[n]
+
+        doubled = friendly[:, 0] > 1
+        isolated = friendly[:, 1] == 0
+        front = tables["front"][sq]
+        backward = (tables["onBoard"][sq] & (pieces[n, front] == EMPTY)
+                    & (enemies[:, 0] > 0) & (friendly[:, 2] == 0))
+        weakness = np.select([doubled & isolated, doubled, isolated & ~inEndgame, isolated, backward],
+                             [0, 1, 2, 3, 4], -1)
+
+        passed = enemies[:, 1] == 0
+        passedBoard = np.zeros((count, 64), dtype=np.float32)
+        passedBoard[n[passed], sq[passed]] = 1
+        connected = (passedBoard @ CONNECTED.T)[n, sq] > 0
+        promotion = tables["promotion"][sq]
+        kingRace = np.where(inEndgame, (DISTANCE[kings[enemy][n], promotion]
+                                        - DISTANCE[kings[color][n], promotion]) * 0.15, 0.0)
+        scale = np.where(tables["onBoard"][sq] & (colors[n, front] == (1 if color == 'w' else 0)), 0.6, 1.0)
+        scale = scale * np.where(connected, 1.5, 1.0)
+        scale = scale * np.where(inEndgame & WING[sq], 1.2, 1.0)
+
+        advantage = friendly[:, 4] - enemies[:, 2]
+        candidateScale = tables["candidateScale"][sq] * np.select([advantage >= 2, advantage == 1], [1.5, 1.2], 1.0)
+
+        terms.append((n, np.full(len(n), sign), weakness, tables["rank"][sq], passed,
+                      np.where(friendly[:, 3] > 0, 1.3, 1.0) * scale, kingRace * scale,
+                      np.where(advantage >= 0, candidateScale, 0.0)))
+    return tuple(np.concatenate(column) for column in zip(*terms))
+
+
+def pawn_scores(pieces, endgame, kings):
+    """evaluate_pawns for every position, with the current SmartMoveFinder pawn constants"""
+    n, sign, weakness, rank, passed, passedScale, passedExtra, candidateScale = pawn_terms(pieces, endgame, kings)
+    penalties = np.array([getattr(SmartMoveFinder, name) for name in WEAKNESSES] + [0.0])
+    perPawn = np.where(passed, np.array(SmartMoveFinder.PASSED_PAWN_BONUS)[rank] * passedScale + passedExtra,
+                       np.array(SmartMoveFinder.CANDIDATE_PAWN_BONUS)[rank] * candidateScale)
+    return np.bincount(n, weights=sign * (perPawn - penalties[weakness]), minlength=len(pieces))
+
+
+def position_terms(positions):
+    """
+    The parts of the evaluation that are not tuned, for a list of FENs or a packed tuple:
+    (pieces, phase, endgame, kings, fixed) with fixed the tempo and castling terms.
+    """
+    if isinstance(positions, tuple):
+        pieces, whiteToMove, castling = positions
+    else:
+        pieces, whiteToMove, castling = pack_fens(positions)
+    rows = np.arange(len(pieces))
+
+    counts = np.bincount((rows[:, None] * (EMPTY + 1) + pieces).ravel(),
+                         minlength=len(pieces) * (EMPTY + 1)).reshape(len(pieces), EMPTY + 1)
+    pieceCount = counts[:, COUNTED].sum(axis=1)
+    phase = np.minimum(counts @ PHASE_WEIGHTS, TOTAL_PHASE)
+    endgame = pieceCount <= 6
+
+    fixed = np.where(endgame, 0.0, np.where(whiteToMove, 0.12, -0.12))
+    wK, wR, bK, bR = (PIECE_INDEX[piece] for piece in ("wK", "wR", "bK", "bR"))
+    fixed += 0.5 * ((pieces[:, 62] == wK) & (pieces[:, 61] == wR))
+    fixed += 0.5 * ((pieces[:, 58] == wK) & (pieces[:, 59] == wR))
+    fixed -= 0.35 * ((pieces[:, 60] == wK) & (castling & 3 == 0))
+    fixed -= 0.5 * ((pieces[:, 6] == bK) & (pieces[:, 5] == bR))
+    fixed -= 0.5 * ((pieces[:, 2] == bK) & (pieces[:, 3] == bR))
+    fixed += 0.35 * ((pieces[:, 4] == bK) & (castling & 12 == 0))
+
+    kings = {color: (pieces == PIECE_INDEX[color + 'K']).argmax(axis=1) for color in 'wb'}
+    return pieces, phase, endgame, kings, fixed
+
+
+def material(pieces, phase, mgTable=MG_TABLE, egTable=EG_TABLE):
+    """tapered_material for every position, from [piece index, square] tables in hundredths of a pawn"""
+    mg = mgTable[pieces, SQUARES].sum(axis=1)
+    eg = egTable[pieces, SQUARES].sum(axis=1)
+    return (mg * phase + eg * (TOTAL_PHASE - phase)) / (100 * TOTAL_PHASE)
+
+
+def evaluate(positions):
+    """
+    Scores from white's point of view for a list of FENs or a packed (pieces, whiteToMove, castling) tuple.
+    Like scoreBoard on a freshly loaded position: checkmate and stalemate are not detected.
+    """
+    pieces, phase, endgame, kings, fixed = position_terms(positions)
+    limit = SmartMoveFinder.PAWN_TERMS_LIMIT  # scoreBoard holds the pawn terms within it
+    return fixed + material(pieces, phase) + np.clip(pawn_scores(pieces, endgame, kings), -limit, limit)
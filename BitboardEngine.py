@@ -0,0 +1,294 @@
+from AttackTables import (BISHOP_DIRECTIONS, KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, RAY_MASKS,
+                          ROOK_DIRECTIONS, squareBit)
+from ChessEngine import GameState, Move
+
+### Bitboard backend for GameState. Each piece type and color is stored as one 64-bit integer where
+### bit (row * 8 + col) is set if that piece stands on board[row][col]. The 8x8 board is still kept in
+### sync so the evaluation, the GUI and the Move class keep working unchanged.
+### That makes it slower than the mailbox GameState: makeMove/undoMove do the whole mailbox update and then the
+### bitboards on top, and the generator is no quicker in Python ("python bench.py perft makeunmake search" has
+### it at about 0.7x the perft speed and half the make/undo speed). Mailbox stays the default backend.
+
+PIECES = ("wp", "wN", "wB", "wR", "wQ", "wK", "bp", "bN", "bB", "bR", "bQ", "bK")
+
+
+def lowestSquare(bb):
+    return (bb & -bb).bit_length() - 1
+
+
+def highestSquare(bb):
+    return bb.bit_length() - 1
+
+
+def squares(bb):
+    """Yield the index of every set bit, lowest first"""
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def slidingAttacks(sq, occupied, directions):
+    attacks = 0
+    for d in directions:
+        ray, positive = RAY_MASKS[d][sq]
+        blockers = ray & occupied
+        if blockers:
+            blocker = lowestSquare(blockers) if positive else highestSquare(blockers)
+            ray ^= RAY_MASKS[d][blocker][0]
+        attacks |= ray
+    return attacks
+
+
+def rookAttacks(sq, occupied):
+    return slidingAttacks(sq, occupied, ROOK_DIRECTIONS)
+
+
+def bishopAttacks(sq, occupied):
+    return slidingAttacks(sq, occupied, BISHOP_DIRECTIONS)
+
+
+class BitboardGameState(GameState):
+    def __init__(self):
+        super().__init__()
+        self.syncBitboards()
+
+    def load_fen(self, fen):
+        super().load_fen(fen)
+        self.syncBitboards()
+
+    def syncBitboards(self):
+        """Rebuild every bitboard from self.board. Only used when the board is set up, not during search."""
+        self.bitboards = {piece: 0 for piece in PIECES}
+        for r in range(8):
+            for c in range(8):
+                piece = self.board[r][c]
+                if piece != "--":
+                    self.bitboards[piece] |= squareBit(r, c)
+        self.colorOccupancy = {'w': 0, 'b': 0}
+        for piece, bb in self.bitboards.items():
+            self.colorOccupancy[piece[0]] |= bb
+
+    def makeMove(self, move):
+        super().makeMove(move)
+        self.toggleMove(move)
+
+    def undoMove(self):
+        if self.ply != 0:
+            move = self.lastMove()
+            super().undoMove()
+            self.toggleMove(move)
+
+    def toggleMove(self, move):
+        """XOR a move in or out of the bitboards. Applying it twice restores the previous position."""
+        bitboards = self.bitboards
+        occupancy = self.colorOccupancy
+        color = move.pieceMoved[0]
+        startBit = squareBit(move.startRow, move.startCol)
+        endBit = squareBit(move.endRow, move.endCol)
+
+        bitboards[move.pieceMoved] ^= startBit
+        if move.isPawnPromotion:
+            bitboards[color + move.promotedPiece] ^= endBit
+        else:
+            bitboards[move.pieceMoved] ^= endBit
+        occupancy[color] ^= startBit | endBit
+
+        if move.isEnPassantMove:
+            capturedBit = squareBit(move.startRow, move.endCol)
+            bitboards[move.pieceCaptured] ^= capturedBit
+            occupancy[move.pieceCaptured[0]] ^= capturedBit
+        elif move.pieceCaptured != "--":
+            bitboards[move.pieceCaptured] ^= endBit
+            occupancy[move.pieceCaptured[0]] ^= endBit
+
+        if move.isCastleMove:
+            if move.endCol - move.startCol == 2:  # kingside
+                rookBits = squareBit(move.endRow, move.endCol + 1) | squareBit(move.endRow, move.endCol - 1)
+            else:  # queenside
+                rookBits = squareBit(move.endRow, move.endCol - 2) | squareBit(move.endRow, move.endCol + 1)
+            bitboards[color + 'R'] ^= rookBits
+            occupancy[color] ^= rookBits
+
+    # determine if the enemy can attack the square r, c
+    def squareUnderAttack(self, r, c):
+        enemy = 'b' if self.whiteToMove else 'w'
+        ally = 'w' if self.whiteToMove else 'b'
+        return self.attackersTo(r * 8 + c, enemy, ally, self.colorOccupancy['w'] | self.colorOccupancy['b']) != 0
+
+    def attackersTo(self, sq, enemy, ally, occupied):
+        bitboards = self.bitboards
+        attackers = KNIGHT_ATTACKS[sq] & bitboards[enemy + 'N']
+        attackers |= KING_ATTACKS[sq] & bitboards[enemy + 'K']
+        attackers |= PAWN_ATTACKS[ally][sq] & bitboards[enemy + 'p']
+        queens = bitboards[enemy + 'Q']
+        rookLike = bitboards[enemy + 'R'] | queens
+        if rookLike:
+            attackers |= rookAttacks(sq, occupied) & rookLike
+        bishopLike = bitboards[enemy + 'B'] | queens
+        if bishopLike:
+            attackers |= bishopAttacks(sq, occupied) & bishopLike
+        return attackers
+
+    def generateLegalMoves(self, capturesOnly=False):
+        """Same contract as GameState.generateLegalMoves, worked out on the bitboards"""
+        ally = 'w' if self.whiteToMove else 'b'
+        enemy = 'b' if self.whiteToMove else 'w'
+        own = self.colorOccupancy[ally]
+        occupied = own | self.colorOccupancy[enemy]
+        kingSq = lowestSquare(self.bitboards[ally + 'K'])
+        checkers = self.attackersTo(kingSq, enemy, ally, occupied)
+        moves = []
+
+        # king steps, tested with the king lifted off the board
+        withoutKing = occupied ^ (1 << kingSq)
+        kingStart = (kingSq // 8, kingSq % 8)
+        kingTargets = KING_ATTACKS[kingSq] & (self.colorOccupancy[enemy] if capturesOnly else ~own)
+        for sq in squares(kingTargets):
+            if not self.attackersTo(sq, enemy, ally, withoutKing):
+                moves.append(Move(kingStart, (sq // 8, sq % 8), self.board))
+
+        if checkers & (checkers - 1) == 0:  # not in double check
+            if checkers:
+                # capture the checking piece or step in between
+                checkerSq = lowestSquare(checkers)
+                checkMask = checkers | self.betweenMask(kingSq, checkerSq)
+            else:
+                checkMask = -1
+                if not capturesOnly:
+                    self.getBitboardCastleMoves(kingSq, enemy, ally, occupied, moves)
+            pins = self.pinnedPieces(kingSq, enemy, ally, occupied)
+            self.generatePieceMoves(ally, enemy, occupied, checkMask, pins, moves, capturesOnly)
+            if self.enPassantPossible != ():
+                self.getEnPassantMoves(kingSq, enemy, ally, occupied, checkers, pins, moves)
+        return moves, checkers
+
+    @staticmethod
+    def betweenMask(fromSq, toSq):
+        """Squares strictly between two squares on a shared line, 0 if they are not aligned"""
+        for d in RAY_MASKS:
+            ray = RAY_MASKS[d][fromSq][0]
+            if ray & (1 << toSq):
+                return ray ^ RAY_MASKS[d][toSq][0] ^ (1 << toSq)
+        return 0
+
+    def pinnedPieces(self, kingSq, enemy, ally, occupied):
+        """Map every pinned piece's square to the mask of squares it may still move to"""
+        pins = {}
+        bitboards = self.bitboards
+        queens = bitboards[enemy + 'Q']
+        own = self.colorOccupancy[ally]
+        for directions, pinners in ((ROOK_DIRECTIONS, bitboards[enemy + 'R'] | queens),
+                                    (BISHOP_DIRECTIONS, bitboards[enemy + 'B'] | queens)):
+            if not pinners:
+                continue
+            for d in directions:
+                ray, positive = RAY_MASKS[d][kingSq]
+                blockers = ray & occupied
+                if not blockers:
+                    continue
+                first = lowestSquare(blockers) if positive else highestSquare(blockers)
+                if not own & (1 << first):
+                    continue
+                beyond = RAY_MASKS[d][first][0] & occupied
+                if not beyond:
+                    continue
+                second = lowestSquare(beyond) if positive else highestSquare(beyond)
+                if pinners & (1 << second):
+                    pins[first] = ray ^ RAY_MASKS[d][second][0]
+        return pins
+
+    def getBitboardCastleMoves(self, kingSq, enemy, ally, occupied, moves):
+        r, c = kingSq // 8, kingSq % 8
+        if (r, c) != ((7, 4) if ally == 'w' else (0, 4)):
+            return
+        rights = self.currentCastlingRights
+        kingside = rights.wks if ally == 'w' else rights.bks
+        queenside = rights.wqs if ally == 'w' else rights.bqs
+        if kingside and not occupied & (squareBit(r, 5) | squareBit(r, 6)):
+            if not self.attackersTo(kingSq + 1, enemy, ally, occupied) and \
+                    not self.attackersTo(kingSq + 2, enemy, ally, occupied):
+                moves.append(Move((r, c), (r, 6), self.board, isCastleMove=True))
+        if queenside and not occupied & (squareBit(r, 1) | squareBit(r, 2) | squareBit(r, 3)):
+            if not self.attackersTo(kingSq - 1, enemy, ally, occupied) and \
+                    not self.attackersTo(kingSq - 2, enemy, ally, occupied):
+                moves.append(Move((r, c), (r, 2), self.board, isCastleMove=True))
+
+    def getEnPassantMoves(self, kingSq, enemy, ally, occupied, checkers, pins, moves):
+        epRow, epCol = self.enPassantPossible
+        epSq = epRow * 8 + epCol
+        capturedSq = epSq + 8 if ally == 'w' else epSq - 8
+        for sq in squares(PAWN_ATTACKS[enemy][epSq] & self.bitboards[ally + 'p']):
+            # play the capture on the occupancy and check the king directly, this also covers
+            # the two pawns leaving the king's rank at once
+            after = occupied ^ (1 << sq) ^ (1 << capturedSq) ^ (1 << epSq)
+            if self.attackersTo(kingSq, enemy, ally, after) & ~(1 << capturedSq):
+                continue
+            moves.append(Move((sq // 8, sq % 8), (epRow, epCol), self.board, isEnPassantMove=True))
+
+    def getAllPossibleMoves(self, capturesOnly=False):
+        moves = []
+        ally = 'w' if self.whiteToMove else 'b'
+        enemy = 'b' if self.whiteToMove else 'w'
+        own = self.colorOccupancy[ally]
+        occupied = own | self.colorOccupancy[enemy]
+        kingTargets = self.colorOccupancy[enemy] if capturesOnly else ~own
+        for sq in squares(self.bitboards[ally + 'K']):
+            self.addMoves(sq, KING_ATTACKS[sq] & kingTargets, moves)
+        self.generatePieceMoves(ally, enemy, occupied, -1, {}, moves, capturesOnly)
+        if self.enPassantPossible != ():
+            epSq = self.enPassantPossible[0] * 8 + self.enPassantPossible[1]
+            for sq in squares(PAWN_ATTACKS[enemy][epSq] & self.bitboards[ally + 'p']):
+                moves.append(Move((sq // 8, sq % 8), self.enPassantPossible, self.board, isEnPassantMove=True))
+        return moves
+
+    def generatePieceMoves(self, ally, enemy, occupied, checkMask, pins, moves, capturesOnly):
+        """
+        Pawn, knight and slider moves landing on checkMask. Pinned pieces stay on their pin line.
+        capturesOnly keeps captures and promotions.
+        """
+        bitboards = self.bitboards
+        self.getPawnBitboardMoves(ally, enemy, occupied, checkMask, pins, moves, capturesOnly)
+        targetMask = checkMask & (self.colorOccupancy[enemy] if capturesOnly else ~self.colorOccupancy[ally])
+        for sq in squares(bitboards[ally + 'N']):
+            if sq not in pins:
+                self.addMoves(sq, KNIGHT_ATTACKS[sq] & targetMask, moves)
+        for sq in squares(bitboards[ally + 'B']):
+            self.addMoves(sq, bishopAttacks(sq, occupied) & targetMask & pins.get(sq, -1), moves)
+        for sq in squares(bitboards[ally + 'R']):
+            self.addMoves(sq, rookAttacks(sq, occupied) & targetMask & pins.get(sq, -1), moves)
+        for sq in squares(bitboards[ally + 'Q']):
+            attacks = rookAttacks(sq, occupied) | bishopAttacks(sq, occupied)
+            self.addMoves(sq, attacks & targetMask & pins.get(sq, -1), moves)
+
+    def addMoves(self, fromSq, targets, moves):
+        start = (fromSq // 8, fromSq % 8)
+        for sq in squares(targets):
+            moves.append(Move(start, (sq // 8, sq % 8), self.board))
+
+    def getPawnBitboardMoves(self, ally, enemy, occupied, checkMask, pins, moves, capturesOnly):
+        """Pushes and captures, en passant is handled by the callers. capturesOnly still pushes to promote."""
+        forward = -1 if ally == 'w' else 1
+        startRow = 6 if ally == 'w' else 1
+        promotionRow = 0 if ally == 'w' else 7
+        enemyOccupancy = self.colorOccupancy[enemy]
+        for sq in squares(self.bitboards[ally + 'p']):
+            r, c = sq // 8, sq % 8
+            endRow = r + forward
+            if not 0 <= endRow < 8:
+                continue
+            allowed = checkMask & pins.get(sq, -1)
+            targets = PAWN_ATTACKS[ally][sq] & enemyOccupancy & allowed
+            pushBit = squareBit(endRow, c)
+            if not occupied & pushBit and (not capturesOnly or endRow == promotionRow):
+                targets |= pushBit & allowed
+                doublePush = squareBit(endRow + forward, c) if r == startRow else 0
+                if doublePush & allowed and not occupied & doublePush:
+                    moves.append(Move((r, c), (endRow + forward, c), self.board))
+            for target in squares(targets):
+                end = (target // 8, target % 8)
+                if end[0] == promotionRow:
+                    for promotedPiece in ('Q', 'R', 'B', 'N'):
+                        moves.append(Move((r, c), end, self.board, promotedPiece=promotedPiece))
+                else:
+                    moves.append(Move((r, c), end, self.board))
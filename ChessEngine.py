@@ -1,6 +1,25 @@
-from SmartMoveFinder import SmartMoveFinder
+from SmartMoveFinder import SmartMoveFinder, pieceScore, phaseWeight, PIECE_SQUARE_MG, PIECE_SQUARE_EG
+from AttackTables import BISHOP_RAYS, KING_TARGETS, KNIGHT_TARGETS, PAWN_CAPTURES, QUEEN_RAYS, ROOK_RAYS
+from HashTables import ZOBRIST_SEED
 import random
 
+UNDO_STACK_SIZE = 256  # plies preallocated for makeMove/undoMove, the stack grows past this if a game gets longer
+SQUARES = [[(r, c) for c in range(8)] for r in range(8)]  # shared square tuples, so makeMove doesn't build new ones
+
+### Zobrist keys, drawn from a fixed seed so a position hashes the same in every process and every GameState.
+### Transposition tables saved to disk depend on it.
+_zobristRandom = random.Random(ZOBRIST_SEED)
+ZOBRIST_TABLE = [[[_zobristRandom.getrandbits(64) for _ in range(8)] for _ in range(8)] for _ in range(12)]
+ZOBRIST_CASTLING = [_zobristRandom.getrandbits(64) for _ in range(4)]  # wks, wqs, bks, bqs
+ZOBRIST_ENPASSANT = [_zobristRandom.getrandbits(64) for _ in range(8)]  # Files A-H
+ZOBRIST_TURN = _zobristRandom.getrandbits(64)
+# combined key for every castling mask, so a change of rights is a single XOR
+ZOBRIST_CASTLING_MASKS = [0] * 16
+for _mask in range(16):
+    for _bit in range(4):
+        if _mask & (1 << _bit):
+            ZOBRIST_CASTLING_MASKS[_mask] ^= ZOBRIST_CASTLING[_bit]
+
 ### This class is responsible for storing all the information about the current state of a chess game. It will also be responsible for determining valid moves at the current state. It will also be a move log.
 
 class GameState:
@@ -23,23 +42,25 @@ class GameState:
         self.moveFunctions = {'p': self.getPawnMoves, 'R': self.getRookMoves, 'N': self.getKnightMoves,
                               'B': self.getBishopMoves, 'Q': self.getQueenMoves, 'K': self.getKingMoves}
         self.whiteToMove = True
-        self.moveLog = []
+        # one record per ply: [move, captured piece, old castling mask, old en-passant square, old hash,
+        #                      old middlegame sum, old endgame sum, old pawn hash, old piece count, old phase]
+        self.undoStack = [[None, "--", 0, (), 0, 0, 0, 0, 0, 0] for _ in range(UNDO_STACK_SIZE)]
+        self.ply = 0
         self.whiteKingPosition = (7, 4)
         self.blackKingPosition = (0, 4)
         self.checkMate = False
         self.staleMate = False
         self.enPassantPossible = () # coordinates for the square where en-passant capture is possible
+        self.pins = {}  # pinned piece square -> direction from the king, only set while generating legal moves
+        self.kingMustStaySafe = False  # king moves are tested for attacks, only set while generating legal moves
         self.currentCastlingRights = castleRights(True, True, True, True)
-        self.castleRightsLog = [castleRights(self.currentCastlingRights.wks,
-                                             self.currentCastlingRights.bks,
-                                             self.currentCastlingRights.wqs,
-                                             self.currentCastlingRights.bqs)]
 
-        # 1. Initialize Zobrist Keys (Keep your existing random generation)
-        self.zobrist_table = [[[random.getrandbits(64) for _ in range(8)] for _ in range(8)] for _ in range(12)]
-        self.zobrist_castling = [random.getrandbits(64) for _ in range(4)]  # wks, wqs, bks, bqs
-        self.zobrist_enpassant = [random.getrandbits(64) for _ in range(8)]  # Files A-H
-        self.zobrist_turn = random.getrandbits(64)
+        # 1. Zobrist Keys, shared by every GameState
+        self.zobrist_table = ZOBRIST_TABLE
+        self.zobrist_castling = ZOBRIST_CASTLING
+        self.zobrist_enpassant = ZOBRIST_ENPASSANT
+        self.zobrist_turn = ZOBRIST_TURN
+        self.zobrist_castling_masks = ZOBRIST_CASTLING_MASKS
 
         self.piece_map = {
             "wp": 0, "wN": 1, "wB": 2, "wR": 3, "wQ": 4, "wK": 5,
@@ -48,10 +69,47 @@ class GameState:
 
         # 2. Compute the initial hash (The only time we do it the slow way)
         self.current_zobrist_hash = self.generate_initial_hash()
+        self.pawn_zobrist_hash = self.generate_pawn_hash()
+
+        self.buildPieceLists()
+        self.evalMg, self.evalEg = self.computeEvalSums()
+        self.pieceCount, self.phase = self.computeMaterialCounters()
+
+    ### (pieces other than kings, game phase) from scratch. makeMove/undoMove keep self.pieceCount/self.phase equal to this.
+    def computeMaterialCounters(self):
+        pieceCount = phase = 0
+        for piece, squares in self.pieceSquares.items():
+            if piece[1] != 'K':
+                pieceCount += len(squares)
+                phase += phaseWeight[piece[1]] * len(squares)
+        return pieceCount, phase
+
+    ### Material plus position sums (middlegame, endgame) from scratch, in hundredths of a pawn with white positive.
+    ### makeMove/undoMove keep self.evalMg/self.evalEg equal to this.
+    def computeEvalSums(self):
+        mg = eg = 0
+        for piece, squares in self.pieceSquares.items():
+            for r, c in squares:
+                mg += PIECE_SQUARE_MG[piece][r * 8 + c]
+                eg += PIECE_SQUARE_EG[piece][r * 8 + c]
+        return mg, eg
+
+    ### Squares of every piece ("wN" -> {(row, col), ...}), kept up to date by makeMove/undoMove
+    ### so generators and the evaluation only visit occupied squares
+    def buildPieceLists(self):
+        self.pieceSquares = {piece: set() for piece in self.piece_map}
+        for r in range(8):
+            for c in range(8):
+                if self.board[r][c] != "--":
+                    self.pieceSquares[self.board[r][c]].add(SQUARES[r][c])
 
-        # 3. Create a log to store hashes for undo
-        self.zobrist_log = [self.current_zobrist_hash]
+    ### Moves played so far, oldest first
+    @property
+    def moveLog(self):
+        return [record[0] for record in self.undoStack[:self.ply]]
 
+    def lastMove(self):
+        return self.undoStack[self.ply - 1][0] if self.ply else None
 
     def load_fen(self, fen):
         parts = fen.split()
@@ -70,6 +128,11 @@ class GameState:
                     piece = ch.upper()
                     if piece == 'P': piece = 'p'
                     self.board[r][c] = color + piece
+                    if piece == 'K':
+                        if color == 'w':
+                            self.whiteKingPosition = (r, c)
+                        else:
+                            self.blackKingPosition = (r, c)
                     c += 1
 
         self.whiteToMove = (turn == 'w')
@@ -85,9 +148,38 @@ class GameState:
             row = Move.ranksToRows[ep[1]]
             self.enPassantPossible = (row, col)
 
-        self.moveLog = []
+        self.ply = 0
+        self.checkMate = False
+        self.staleMate = False
         self.current_zobrist_hash = self.generate_initial_hash()
-        self.zobrist_log = [self.current_zobrist_hash]
+        self.pawn_zobrist_hash = self.generate_pawn_hash()
+        self.buildPieceLists()
+        self.evalMg, self.evalEg = self.computeEvalSums()
+        self.pieceCount, self.phase = self.computeMaterialCounters()
+
+    ### The current position as FEN, the inverse of load_fen. Move counters are not tracked, so they are always "0 1".
+    def to_fen(self):
+        rows = []
+        for r in range(8):
+            row = ""
+            empty = 0
+            for piece in self.board[r]:
+                if piece == "--":
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += piece[1].upper() if piece[0] == 'w' else piece[1].lower()
+            rows.append(row + (str(empty) if empty else ""))
+        rights = self.currentCastlingRights
+        castling = ("K" if rights.wks else "") + ("Q" if rights.wqs else "") + \
+                   ("k" if rights.bks else "") + ("q" if rights.bqs else "")
+        if self.enPassantPossible != ():
+            ep = Move.colsToFiles[self.enPassantPossible[1]] + Move.rowsToRanks[self.enPassantPossible[0]]
+        else:
+            ep = "-"
+        return "%s %s %s %s 0 1" % ("/".join(rows), 'w' if self.whiteToMove else 'b', castling or "-", ep)
 
     def parse_uci_move(gs, uci):
         start_col = Move.filesToCols[uci[0]]
@@ -103,8 +195,8 @@ class GameState:
                     move.endRow == end_row and
                     move.endCol == end_col):
 
-                if move.isPawnPromotion:
-                    move.promotedPiece = promoted
+                if move.isPawnPromotion and move.promotedPiece != promoted:
+                    continue
                 return move
 
         return None
@@ -136,10 +228,7 @@ class GameState:
                     h ^= self.zobrist_table[idx][r][c]
 
         # 2. Castling Rights
-        if self.currentCastlingRights.wks: h ^= self.zobrist_castling[0]
-        if self.currentCastlingRights.wqs: h ^= self.zobrist_castling[1]
-        if self.currentCastlingRights.bks: h ^= self.zobrist_castling[2]
-        if self.currentCastlingRights.bqs: h ^= self.zobrist_castling[3]
+        h ^= self.zobrist_castling_masks[self.currentCastlingRights.mask()]
 
         # 3. En Passant
         # The enPassantPossible variable holds coordinates (row, col) or is empty ()
@@ -152,9 +241,34 @@ class GameState:
 
         return h
 
+    def generate_pawn_hash(self):
+        """Zobrist hash of the pawns alone, the key of the pawn structure cache"""
+        h = 0
+        for r in range(8):
+            for c in range(8):
+                if self.board[r][c] in ("wp", "bp"):
+                    h ^= self.zobrist_table[self.piece_map[self.board[r][c]]][r][c]
+        return h
+
 
-    ### makeMove() will execute a move. This will not work for castling, pawn promotion, and en-passant.
+    ### makeMove() will execute a move, including castling, pawn promotion and en-passant.
+    ### Everything undoMove() needs is saved in a reused record on the undo stack, so nothing is allocated here.
     def makeMove(self, move):
+        if self.ply == len(self.undoStack):
+            self.undoStack.append([None, "--", 0, (), 0, 0, 0, 0, 0, 0])
+        record = self.undoStack[self.ply]
+        record[0] = move
+        record[1] = move.pieceCaptured
+        record[2] = oldCastleMask = self.currentCastlingRights.mask()
+        record[3] = self.enPassantPossible
+        record[4] = self.current_zobrist_hash
+        record[5] = self.evalMg
+        record[6] = self.evalEg
+        record[7] = self.pawn_zobrist_hash
+        record[8] = self.pieceCount
+        record[9] = self.phase
+        self.ply += 1
+
         # --- ZOBRIST: START INCREMENTAL UPDATE (REMOVE OLD STATE) ---
         new_hash = self.current_zobrist_hash
 
@@ -171,35 +285,56 @@ class GameState:
                 # Standard capture at [endRow][endCol]
                 new_hash ^= self.zobrist_table[self.piece_map[move.pieceCaptured]][move.endRow][move.endCol]
 
-        # 3. XOR Out Old Castling Rights (Before they change)
-        if self.currentCastlingRights.wks: new_hash ^= self.zobrist_castling[0]
-        if self.currentCastlingRights.wqs: new_hash ^= self.zobrist_castling[1]
-        if self.currentCastlingRights.bks: new_hash ^= self.zobrist_castling[2]
-        if self.currentCastlingRights.bqs: new_hash ^= self.zobrist_castling[3]
-
-        # 4. XOR Out Old En Passant File (if one existed)
+        # 3. XOR Out Old En Passant File (if one existed)
         if self.enPassantPossible != ():
             new_hash ^= self.zobrist_enpassant[self.enPassantPossible[1]]
         # -------------------------------------------------------------
 
-        # === ORIGINAL LOGIC STARTS HERE ===
         self.board[move.startRow][move.startCol] = "--"
         self.board[move.endRow][move.endCol] = move.pieceMoved
-        self.moveLog.append(move)
         self.whiteToMove = not self.whiteToMove
 
-        # --- FIX: Ensure these match "Position", not "Location" ---
+        pieceSquares = self.pieceSquares
+        endSquare = SQUARES[move.endRow][move.endCol]
+        pieceSquares[move.pieceMoved].remove(SQUARES[move.startRow][move.startCol])
+        if move.pieceCaptured != '--':
+            pieceSquares[move.pieceCaptured].remove(
+                SQUARES[move.startRow][move.endCol] if move.isEnPassantMove else endSquare)
+        newPiece = move.pieceMoved[0] + move.promotedPiece if move.isPawnPromotion else move.pieceMoved
+        pieceSquares[newPiece].add(endSquare)
+
+        # material and position sums: take the piece off its start square and any captured piece off the board
+        startIndex = move.startRow * 8 + move.startCol
+        endIndex = move.endRow * 8 + move.endCol
+        self.evalMg += PIECE_SQUARE_MG[newPiece][endIndex] - PIECE_SQUARE_MG[move.pieceMoved][startIndex]
+        self.evalEg += PIECE_SQUARE_EG[newPiece][endIndex] - PIECE_SQUARE_EG[move.pieceMoved][startIndex]
+        if move.pieceCaptured != '--':
+            captureIndex = move.startRow * 8 + move.endCol if move.isEnPassantMove else endIndex
+            self.evalMg -= PIECE_SQUARE_MG[move.pieceCaptured][captureIndex]
+            self.evalEg -= PIECE_SQUARE_EG[move.pieceCaptured][captureIndex]
+            self.pieceCount -= 1
+            self.phase -= phaseWeight[move.pieceCaptured[1]]
+        if move.isPawnPromotion:
+            self.phase += phaseWeight[move.promotedPiece]
+
+        # pawn-only hash, for the pawn structure cache
+        if move.pieceMoved[1] == 'p':
+            pawnTable = self.zobrist_table[self.piece_map[move.pieceMoved]]
+            self.pawn_zobrist_hash ^= pawnTable[move.startRow][move.startCol]
+            if not move.isPawnPromotion:
+                self.pawn_zobrist_hash ^= pawnTable[move.endRow][move.endCol]
+        if move.pieceCaptured[1] == 'p':
+            captureRow = move.startRow if move.isEnPassantMove else move.endRow
+            self.pawn_zobrist_hash ^= self.zobrist_table[self.piece_map[move.pieceCaptured]][captureRow][move.endCol]
+
         if move.pieceMoved == 'wK':
-            self.whiteKingPosition = (move.endRow, move.endCol)
+            self.whiteKingPosition = SQUARES[move.endRow][move.endCol]
         elif move.pieceMoved == 'bK':
-            self.blackKingPosition = (move.endRow, move.endCol)
-        # ----------------------------------------------------------
+            self.blackKingPosition = SQUARES[move.endRow][move.endCol]
 
         # pawn promotion
         if move.isPawnPromotion:
-            # Assumes 'Q' if not specified, usually handled by Move class
-            promotedType = getattr(move, 'promotedPiece', 'Q')
-            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + promotedType
+            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + move.promotedPiece
 
         # en passant capture
         if move.isEnPassantMove:
@@ -207,40 +342,44 @@ class GameState:
 
         # update enPassantPossible variable
         if move.pieceMoved[1] == 'p' and abs(move.startRow - move.endRow) == 2:  # two square pawn advance
-            self.enPassantPossible = ((move.startRow + move.endRow) // 2, move.startCol)
+            self.enPassantPossible = SQUARES[(move.startRow + move.endRow) // 2][move.startCol]
         else:
             self.enPassantPossible = ()
 
         # castle move
         if move.isCastleMove:
+            rook = move.pieceMoved[0] + 'R'
+            rookSquares = pieceSquares[rook]
             if move.endCol - move.startCol == 2:  # kingside
                 self.board[move.endRow][move.endCol - 1] = self.board[move.endRow][move.endCol + 1]  # move rook
                 self.board[move.endRow][move.endCol + 1] = "--"  # empty rook's original square
+                rookSquares.remove(SQUARES[move.endRow][move.endCol + 1])
+                rookSquares.add(SQUARES[move.endRow][move.endCol - 1])
+                rookFrom, rookTo = endIndex + 1, endIndex - 1
             else:  # queenside
                 self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][move.endCol - 2]  # move rook
                 self.board[move.endRow][move.endCol - 2] = "--"  # empty rook's original square
+                rookSquares.remove(SQUARES[move.endRow][move.endCol - 2])
+                rookSquares.add(SQUARES[move.endRow][move.endCol + 1])
+                rookFrom, rookTo = endIndex - 2, endIndex + 1
+            self.evalMg += PIECE_SQUARE_MG[rook][rookTo] - PIECE_SQUARE_MG[rook][rookFrom]
+            self.evalEg += PIECE_SQUARE_EG[rook][rookTo] - PIECE_SQUARE_EG[rook][rookFrom]
 
         # update castling rights
         self.updateCastleRights(move)
-        self.castleRightsLog.append(castleRights(self.currentCastlingRights.wks,
-                                                 self.currentCastlingRights.bks,
-                                                 self.currentCastlingRights.wqs,
-                                                 self.currentCastlingRights.bqs))
         self.checkMate = False
         self.staleMate = False
-        # === ORIGINAL LOGIC ENDS HERE ===
 
         # --- ZOBRIST: FINISH INCREMENTAL UPDATE (ADD NEW STATE) ---
 
-        # 5. XOR In Moving Piece (at Destination)
+        # 4. XOR In Moving Piece (at Destination)
         if move.isPawnPromotion:
-            promotedType = getattr(move, 'promotedPiece', 'Q')
-            new_piece = move.pieceMoved[0] + promotedType
+            new_piece = move.pieceMoved[0] + move.promotedPiece
             new_hash ^= self.zobrist_table[self.piece_map[new_piece]][move.endRow][move.endCol]
         else:
             new_hash ^= self.zobrist_table[self.piece_map[move.pieceMoved]][move.endRow][move.endCol]
 
-        # 6. XOR In Rook Move (if Castling)
+        # 5. XOR In Rook Move (if Castling)
         if move.isCastleMove:
             rook = 'wR' if move.pieceMoved[0] == 'w' else 'bR'
             if move.endCol - move.startCol == 2:  # Kingside
@@ -252,99 +391,98 @@ class GameState:
                 new_hash ^= self.zobrist_table[self.piece_map[rook]][move.endRow][move.endCol - 2]
                 new_hash ^= self.zobrist_table[self.piece_map[rook]][move.endRow][move.endCol + 1]
 
-        # 7. XOR In New Castling Rights (After update)
-        if self.currentCastlingRights.wks: new_hash ^= self.zobrist_castling[0]
-        if self.currentCastlingRights.wqs: new_hash ^= self.zobrist_castling[1]
-        if self.currentCastlingRights.bks: new_hash ^= self.zobrist_castling[2]
-        if self.currentCastlingRights.bqs: new_hash ^= self.zobrist_castling[3]
+        # 6. Swap Old Castling Rights for the New Ones
+        newCastleMask = self.currentCastlingRights.mask()
+        if newCastleMask != oldCastleMask:
+            new_hash ^= self.zobrist_castling_masks[oldCastleMask] ^ self.zobrist_castling_masks[newCastleMask]
 
-        # 8. XOR In New En Passant File (if valid)
+        # 7. XOR In New En Passant File (if valid)
         if self.enPassantPossible != ():
             new_hash ^= self.zobrist_enpassant[self.enPassantPossible[1]]
 
-        # 9. Flip Turn
+        # 8. Flip Turn
         new_hash ^= self.zobrist_turn
 
-        # 10. Commit Hash
+        # 9. Commit Hash
         self.current_zobrist_hash = new_hash
-        self.zobrist_log.append(new_hash)
 
-    ### Undo the last move
+    ### Undo the last move. Castling rights, en-passant square and hash come back exactly from the undo record.
     def undoMove(self):
-        if len(self.moveLog) != 0:  # to confirm there is a move to undo
-            move = self.moveLog.pop()
+        if self.ply != 0:  # to confirm there is a move to undo
+            self.ply -= 1
+            (move, captured, castleMask, enPassant, zobristHash, self.evalMg, self.evalEg,
+             self.pawn_zobrist_hash, self.pieceCount, self.phase) = self.undoStack[self.ply]
             self.board[move.startRow][move.startCol] = move.pieceMoved
-            self.board[move.endRow][move.endCol] = move.pieceCaptured
+            self.board[move.endRow][move.endCol] = captured
             self.whiteToMove = not self.whiteToMove  # switch turns back
+
+            pieceSquares = self.pieceSquares
+            endSquare = SQUARES[move.endRow][move.endCol]
+            pieceSquares[move.pieceMoved[0] + move.promotedPiece if move.isPawnPromotion else move.pieceMoved].remove(endSquare)
+            pieceSquares[move.pieceMoved].add(SQUARES[move.startRow][move.startCol])
+            if captured != '--':
+                pieceSquares[captured].add(SQUARES[move.startRow][move.endCol] if move.isEnPassantMove else endSquare)
             if move.pieceMoved == "wK":
-                self.whiteKingPosition = (move.startRow, move.startCol)
+                self.whiteKingPosition = SQUARES[move.startRow][move.startCol]
             elif move.pieceMoved == "bK":
-                self.blackKingPosition = (move.startRow, move.startCol)
+                self.blackKingPosition = SQUARES[move.startRow][move.startCol]
 
             # undoing en passant
             if move.isEnPassantMove:
                 self.board[move.endRow][move.endCol] = "--"  # leave landing square blank
-                self.board[move.startRow][move.endCol] = move.pieceCaptured
-                self.enPassantPossible = (move.endRow, move.endCol)
-
-            # undoing 2 square pawn advance
-            if move.pieceMoved[1] == 'p' and abs(move.startRow - move.endRow) == 2:
-                self.enPassantPossible = ()
-
-            # undoing castling rights
-            self.castleRightsLog.pop()  # get rid of the new castle rights from the move we are undoing
-            lastRights = self.castleRightsLog[-1]
-            self.currentCastlingRights.wks = lastRights.wks
-            self.currentCastlingRights.bks = lastRights.bks
-            self.currentCastlingRights.wqs = lastRights.wqs
-            self.currentCastlingRights.bqs = lastRights.bqs
+                self.board[move.startRow][move.endCol] = captured
 
             # undo castling move
             if move.isCastleMove:
+                rookSquares = pieceSquares[move.pieceMoved[0] + 'R']
                 if move.endCol - move.startCol == 2:  # kingside
                     self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][
                         move.endCol - 1]  # move rook back
                     self.board[move.endRow][move.endCol - 1] = "--"  # empty square
+                    rookSquares.remove(SQUARES[move.endRow][move.endCol - 1])
+                    rookSquares.add(SQUARES[move.endRow][move.endCol + 1])
                 else:  # queenside
                     self.board[move.endRow][move.endCol - 2] = self.board[move.endRow][
                         move.endCol + 1]  # move rook back
                     self.board[move.endRow][move.endCol + 1] = "--"  # empty square
+                    rookSquares.remove(SQUARES[move.endRow][move.endCol + 1])
+                    rookSquares.add(SQUARES[move.endRow][move.endCol - 2])
+
+            self.currentCastlingRights.setMask(castleMask)
+            self.enPassantPossible = enPassant
+            self.current_zobrist_hash = zobristHash
+
+    ### Pass the turn (null-move pruning). The hash follows the side to move and the en-passant square, so
+    ### tables keyed by it never mix the two sides up. Returns the en-passant square for undoNullMove.
+    def makeNullMove(self):
+        enPassant = self.enPassantPossible
+        if enPassant != ():
+            self.current_zobrist_hash ^= self.zobrist_enpassant[enPassant[1]]
+            self.enPassantPossible = ()
+        self.whiteToMove = not self.whiteToMove
+        self.current_zobrist_hash ^= self.zobrist_turn
+        return enPassant
 
-            # --- ZOBRIST: RESTORE HASH ---
-            if len(self.zobrist_log) > 0:
-                self.zobrist_log.pop()
-                self.current_zobrist_hash = self.zobrist_log[-1]
-
-    # @staticmethod
-    # def getCaptureMoves(self):
+    def undoNullMove(self, enPassant):
+        self.whiteToMove = not self.whiteToMove
+        self.current_zobrist_hash ^= self.zobrist_turn
+        if enPassant != ():
+            self.current_zobrist_hash ^= self.zobrist_enpassant[enPassant[1]]
+            self.enPassantPossible = enPassant
+
+    ### Legal captures and promotions only, best first by MVV-LVA. Used by the quiescence search.
+    def getCaptureMoves(self):
+        moves, checks = self.generateLegalMoves(capturesOnly=True)
+        moves.sort(key=mvvLvaScore, reverse=True)
+        return moves
 
     ### All moves considering checks
 
     def getValidMoves(self):
-        tempEnPassantPossible = self.enPassantPossible
-        tempCastleRights = castleRights(self.currentCastlingRights.wks,
-                                        self.currentCastlingRights.bks,
-                                        self.currentCastlingRights.wqs,
-                                        self.currentCastlingRights.bqs)
-        # generate all possible moves
-        moves = self.getAllPossibleMoves()
-        if self.whiteToMove:
-            self.getCastleMoves(self.whiteKingPosition[0], self.whiteKingPosition[1], moves)
-        else:
-            self.getCastleMoves(self.blackKingPosition[0], self.blackKingPosition[1], moves)
-        # make the moves
-        for i in range(len(moves) - 1, -1, -1):
-            self.makeMove(moves[i])
-            # generate all opponent's moves
-            # oppMoves = self.getAllPossibleMoves()
-            # see if these moves attack the king
-            self.whiteToMove = not self.whiteToMove
-            if self.inCheck():
-                moves.remove(moves[i])  # if they attack the king, then it's invalid
-            self.whiteToMove = not self.whiteToMove
-            self.undoMove()
+        moves, checks = self.generateLegalMoves()
+
         if len(moves) == 0:  # either checkmate or stalemate
-            if self.inCheck():
+            if checks:
                 self.checkMate = True
                 print("Checkmate!")
             else:
@@ -355,13 +493,187 @@ class GameState:
             self.staleMate = False
 
         # ADD THIS BLOCK HERE:
-        if self.is_only_two_kings(self.board):
+        if self.is_only_two_kings():
             self.staleMate = True  # Treat as draw
             print("Draw - Only two kings remaining!")
 
-        self.enPassantPossible = tempEnPassantPossible
         return moves
-    
+
+    ### The legal move with this packed id, or None. Lets the search try a hash or killer move
+    ### before any move list is generated for the position.
+    def getLegalMove(self, packed):
+        startRow, startCol = (packed & 63) // 8, packed & 7
+        piece = self.board[startRow][startCol]
+        if piece == "--" or (piece[0] == 'w') != self.whiteToMove:
+            return None
+        moves = []
+        if packed & Move.CASTLE_FLAG:
+            if piece[1] == 'K':
+                self.getCastleMoves(startRow, startCol, moves)
+        else:
+            self.moveFunctions[piece[1]](startRow, startCol, moves)
+        for move in moves:
+            if move.moveID == packed:
+                # the generators ran without pins, so check the mover's king after playing it
+                self.makeMove(move)
+                self.whiteToMove = not self.whiteToMove
+                legal = not self.inCheck()
+                self.whiteToMove = not self.whiteToMove
+                self.undoMove()
+                return move if legal else None
+        return None
+
+    ### Count the leaf nodes of the legal move tree, depth >= 1. The last ply is counted without making the moves.
+    def perft(self, depth):
+        moves, checks = self.generateLegalMoves()
+        if depth == 1:
+            return len(moves)
+        nodes = 0
+        for move in moves:
+            self.makeMove(move)
+            nodes += self.perft(depth - 1)
+            self.undoMove()
+        return nodes
+
+    ### perft split by root move, as a list of (move, nodes)
+    def divide(self, depth):
+        moves, checks = self.generateLegalMoves()
+        counts = []
+        for move in moves:
+            self.makeMove(move)
+            counts.append((move, self.perft(depth - 1) if depth > 1 else 1))
+            self.undoMove()
+        return counts
+
+    def generateLegalMoves(self, capturesOnly=False):
+        """
+        Pins and checks are worked out once for the position and king steps are tested directly,
+        so every generated move is already legal and no move has to be made and undone.
+        Returns (moves, checks).
+        """
+        kingRow, kingCol = self.whiteKingPosition if self.whiteToMove else self.blackKingPosition
+        self.pins, checks = self.checkForPinsAndChecks()
+        self.kingMustStaySafe = True
+        if len(checks) >= 2:  # double check, only the king can move
+            moves = []
+            self.getKingMoves(kingRow, kingCol, moves, capturesOnly)
+        else:
+            moves = self.getAllPossibleMoves(capturesOnly)
+            if len(checks) == 1:
+                moves = self.filterCheckEvasions(moves, checks[0], kingRow, kingCol)
+            elif not capturesOnly:
+                self.getCastleMoves(kingRow, kingCol, moves)
+        if self.enPassantPossible != ():
+            moves = [move for move in moves if not move.isEnPassantMove or self.isEnPassantLegal(move)]
+        self.pins = {}
+        self.kingMustStaySafe = False
+        return moves, checks
+
+    def hasLegalMove(self):
+        """
+        Whether the side to move has a legal move, for telling mate and stalemate apart without a full generation:
+        the moves are generated a piece at a time, with the same pin and check rules, until one is found.
+        Castling needs no look, a king that can castle can also step.
+        Returns (found, checks).
+        """
+        kingRow, kingCol = self.whiteKingPosition if self.whiteToMove else self.blackKingPosition
+        self.pins, checks = self.checkForPinsAndChecks()
+        self.kingMustStaySafe = True
+        turn = 'w' if self.whiteToMove else 'b'
+        found = False
+        for piece, generator in self.moveFunctions.items():
+            if len(checks) >= 2 and piece != 'K':  # double check, only the king can move
+                continue
+            for r, c in self.pieceSquares[turn + piece]:
+                moves = []
+                generator(r, c, moves)
+                if len(checks) == 1:
+                    moves = self.filterCheckEvasions(moves, checks[0], kingRow, kingCol)
+                if self.enPassantPossible != ():
+                    moves = [move for move in moves if not move.isEnPassantMove or self.isEnPassantLegal(move)]
+                if moves:
+                    found = True
+                    break
+            if found:
+                break
+        self.pins = {}
+        self.kingMustStaySafe = False
+        return found, checks
+
+    def checkForPinsAndChecks(self):
+        """
+        Look outward from the king of the side to move.
+        Returns (pins, checks): pins maps a pinned piece's square to the direction from the king,
+        checks is a list of (row, col, dRow, dCol) for every checking piece.
+        """
+        pins = {}
+        checks = []
+        allyColor = "w" if self.whiteToMove else "b"
+        enemyColor = "b" if self.whiteToMove else "w"
+        kingRow, kingCol = self.whiteKingPosition if self.whiteToMove else self.blackKingPosition
+        for d, ray in QUEEN_RAYS[kingRow][kingCol]:
+            possiblePin = None
+            for endRow, endCol in ray:
+                endPiece = self.board[endRow][endCol]
+                if endPiece == "--":
+                    continue
+                if endPiece[0] == allyColor:
+                    if possiblePin is not None:
+                        break  # second allied piece, no pin or check in this direction
+                    possiblePin = (endRow, endCol)
+                    continue
+                pieceType = endPiece[1]
+                orthogonal = d[0] == 0 or d[1] == 0
+                if pieceType == 'Q' or (orthogonal and pieceType == 'R') or (not orthogonal and pieceType == 'B'):
+                    if possiblePin is None:
+                        checks.append((endRow, endCol, d[0], d[1]))
+                    else:
+                        pins[possiblePin] = d
+                break  # enemy piece blocks the rest of the ray
+
+        enemyKnight = enemyColor + 'N'
+        for endRow, endCol in KNIGHT_TARGETS[kingRow][kingCol]:
+            if self.board[endRow][endCol] == enemyKnight:
+                checks.append((endRow, endCol, endRow - kingRow, endCol - kingCol))
+
+        enemyPawn = enemyColor + 'p'
+        for endRow, endCol in PAWN_CAPTURES[allyColor][kingRow][kingCol]:
+            if self.board[endRow][endCol] == enemyPawn:
+                checks.append((endRow, endCol, endRow - kingRow, endCol - kingCol))
+        return pins, checks
+
+    def filterCheckEvasions(self, moves, check, kingRow, kingCol):
+        """Keep king moves and the moves that capture or block a single checking piece"""
+        checkRow, checkCol, dRow, dCol = check
+        if self.board[checkRow][checkCol][1] in ('N', 'p'):
+            validSquares = {(checkRow, checkCol)}  # knights and pawns can only be captured
+        else:
+            validSquares = set()
+            for i in range(1, 8):
+                square = (kingRow + dRow * i, kingCol + dCol * i)
+                validSquares.add(square)
+                if square == (checkRow, checkCol):
+                    break
+        return [move for move in moves
+                if move.pieceMoved[1] == 'K'
+                or (move.endRow, move.endCol) in validSquares
+                or (move.isEnPassantMove and (move.startRow, move.endCol) == (checkRow, checkCol))]
+
+    def isEnPassantLegal(self, move):
+        """
+        En passant removes two pawns from the same rank, which can expose the king to a rook or queen
+        in a way the pin scan does not see. Try the capture on the board and look for checks.
+        """
+        capturedSquare = self.board[move.startRow][move.endCol]
+        self.board[move.startRow][move.startCol] = "--"
+        self.board[move.startRow][move.endCol] = "--"
+        self.board[move.endRow][move.endCol] = move.pieceMoved
+        legal = not self.inCheck()
+        self.board[move.endRow][move.endCol] = "--"
+        self.board[move.startRow][move.endCol] = capturedSquare
+        self.board[move.startRow][move.startCol] = move.pieceMoved
+        return legal
+
     # determine if current player is in check
     def inCheck(self):
         if self.whiteToMove:
@@ -371,67 +683,73 @@ class GameState:
 
 
     # determine if the enemy can attack the square r, c
+    # looks outward from the square for each kind of attacker and stops at the first one found
     def squareUnderAttack(self, r, c):
-        self.whiteToMove = not self.whiteToMove # switch to opponent's view
-        oppMoves = self.getAllPossibleMoves()
-        self.whiteToMove = not self.whiteToMove # switch back
-        for move in oppMoves:
-            if move.endRow == r and move.endCol == c:
+        board = self.board
+        enemyColor = "b" if self.whiteToMove else "w"
+        allyColor = "w" if self.whiteToMove else "b"
+
+        # an enemy pawn attacks us from the squares our own pawn would capture on
+        enemyPawn = enemyColor + 'p'
+        for endRow, endCol in PAWN_CAPTURES[allyColor][r][c]:
+            if board[endRow][endCol] == enemyPawn:
+                return True
+
+        enemyKnight = enemyColor + 'N'
+        for endRow, endCol in KNIGHT_TARGETS[r][c]:
+            if board[endRow][endCol] == enemyKnight:
+                return True
+
+        enemyKing = enemyColor + 'K'
+        for endRow, endCol in KING_TARGETS[r][c]:
+            if board[endRow][endCol] == enemyKing:
                 return True
+
+        # sliders: only the first piece on each ray matters
+        for rays, sliders in ((ROOK_RAYS[r][c], ('R', 'Q')), (BISHOP_RAYS[r][c], ('B', 'Q'))):
+            for d, ray in rays:
+                for endRow, endCol in ray:
+                    endPiece = board[endRow][endCol]
+                    if endPiece != "--":
+                        if endPiece[0] == enemyColor and endPiece[1] in sliders:
+                            return True
+                        break
         return False
     # All moves without checks
 
     @staticmethod
     def is_endgame(gs):
         """Don't use null move in endgames - zugzwang is common"""
-        piece_count = 0
-        for row in gs.board:
-            for square in row:
-                if square != "--" and square[1] != 'K':
-                    piece_count += 1
-        return piece_count <= 6  # Adjust threshold as needed
-
-    def getAllPossibleMoves(self):
+        return gs.pieceCount <= 6  # Adjust threshold as needed
+
+    # capturesOnly keeps captures and promotions, the moves the quiescence search looks at
+    def getAllPossibleMoves(self, capturesOnly=False):
         moves = []
-        for r in range(len(self.board)):
-            for c in range(len(self.board[r])):
-                turn = self.board[r][c][0]
-
-                if (turn == 'w' and self.whiteToMove) or (turn == 'b' and not self.whiteToMove):
-                    piece = self.board[r][c][1]
-                    if piece == 'p':
-                        self.getPawnMoves(r, c, moves)
-                    elif piece == 'R':
-                        self.getRookMoves(r, c, moves)
-                    elif piece == 'N':
-                        self.getKnightMoves(r, c, moves)
-                    elif piece == 'B':
-                        self.getBishopMoves(r, c, moves)
-                    elif piece == 'Q':
-                        self.getQueenMoves(r, c, moves)
-                    elif piece == 'K':
-                        self.getKingMoves(r, c, moves)
+        turn = 'w' if self.whiteToMove else 'b'
+        for piece, generator in self.moveFunctions.items():
+            for r, c in self.pieceSquares[turn + piece]:
+                generator(r, c, moves, capturesOnly)
         return moves
 
     def getPawnMoves(self, r, c, moves, capturesOnly=False):
+        pinDirection = self.pins.get((r, c))
         # WHITE PAWNS
         if self.whiteToMove:
             # 1. Forward One
-            if r - 1 >= 0 and self.board[r - 1][c] == "--":
-                if not capturesOnly:
-                    if r - 1 == 0:  # Promotion!
-                        moves.append(Move((r, c), (r - 1, c), self.board, promotedPiece='Q'))
-                        moves.append(Move((r, c), (r - 1, c), self.board, promotedPiece='R'))
-                        moves.append(Move((r, c), (r - 1, c), self.board, promotedPiece='B'))
-                        moves.append(Move((r, c), (r - 1, c), self.board, promotedPiece='N'))
-                    else:
-                        moves.append(Move((r, c), (r - 1, c), self.board))
-                        # Forward Two (Only possible if not promoting)
-                        if r == 6 and self.board[r - 2][c] == "--":
-                            moves.append(Move((r, c), (r - 2, c), self.board))
+            if r - 1 >= 0 and self.board[r - 1][c] == "--" and self.pinAllows(pinDirection, (-1, 0)):
+                if r - 1 == 0:  # Promotion!
+                    moves.append(Move((r, c), (r - 1, c), self.board, promotedPiece='Q'))
+                    moves.append(Move((r, c), (r - 1, c), self.board, promotedPiece='R'))
+                    moves.append(Move((r, c), (r - 1, c), self.board, promotedPiece='B'))
+                    moves.append(Move((r, c), (r - 1, c), self.board, promotedPiece='N'))
+                elif not capturesOnly:
+                    moves.append(Move((r, c), (r - 1, c), self.board))
+                    # Forward Two (Only possible if not promoting)
+                    if r == 6 and self.board[r - 2][c] == "--":
+                        moves.append(Move((r, c), (r - 2, c), self.board))
 
             # 2. Captures (Left)
-            if c - 1 >= 0 and r - 1 >= 0:
+            if c - 1 >= 0 and r - 1 >= 0 and self.pinAllows(pinDirection, (-1, -1)):
                 target = self.board[r - 1][c - 1]
                 if target != "--" and target[0] == 'b':
                     if r - 1 == 0:  # Promotion!
@@ -445,7 +763,7 @@ class GameState:
                     moves.append(Move((r, c), (r - 1, c - 1), self.board, isEnPassantMove=True))
 
             # 3. Captures (Right)
-            if c + 1 <= 7 and r - 1 >= 0:
+            if c + 1 <= 7 and r - 1 >= 0 and self.pinAllows(pinDirection, (-1, 1)):
                 target = self.board[r - 1][c + 1]
                 if target != "--" and target[0] == 'b':
                     if r - 1 == 0:  # Promotion!
@@ -461,21 +779,20 @@ class GameState:
         # BLACK PAWNS
         else:
             # 1. Forward One
-            if r + 1 <= 7 and self.board[r + 1][c] == "--":
-                if not capturesOnly:
-                    if r + 1 == 7:  # Promotion!
-                        moves.append(Move((r, c), (r + 1, c), self.board, promotedPiece='Q'))
-                        moves.append(Move((r, c), (r + 1, c), self.board, promotedPiece='R'))
-                        moves.append(Move((r, c), (r + 1, c), self.board, promotedPiece='B'))
-                        moves.append(Move((r, c), (r + 1, c), self.board, promotedPiece='N'))
-                    else:
-                        moves.append(Move((r, c), (r + 1, c), self.board))
-                        # Forward Two
-                        if r == 1 and self.board[r + 2][c] == "--":
-                            moves.append(Move((r, c), (r + 2, c), self.board))
+            if r + 1 <= 7 and self.board[r + 1][c] == "--" and self.pinAllows(pinDirection, (1, 0)):
+                if r + 1 == 7:  # Promotion!
+                    moves.append(Move((r, c), (r + 1, c), self.board, promotedPiece='Q'))
+                    moves.append(Move((r, c), (r + 1, c), self.board, promotedPiece='R'))
+                    moves.append(Move((r, c), (r + 1, c), self.board, promotedPiece='B'))
+                    moves.append(Move((r, c), (r + 1, c), self.board, promotedPiece='N'))
+                elif not capturesOnly:
+                    moves.append(Move((r, c), (r + 1, c), self.board))
+                    # Forward Two
+                    if r == 1 and self.board[r + 2][c] == "--":
+                        moves.append(Move((r, c), (r + 2, c), self.board))
 
             # 2. Captures (Left)
-            if c - 1 >= 0 and r + 1 <= 7:
+            if c - 1 >= 0 and r + 1 <= 7 and self.pinAllows(pinDirection, (1, -1)):
                 target = self.board[r + 1][c - 1]
                 if target != "--" and target[0] == 'w':
                     if r + 1 == 7:  # Promotion!
@@ -489,7 +806,7 @@ class GameState:
                     moves.append(Move((r, c), (r + 1, c - 1), self.board, isEnPassantMove=True))
 
             # 3. Captures (Right)
-            if c + 1 <= 7 and r + 1 <= 7:
+            if c + 1 <= 7 and r + 1 <= 7 and self.pinAllows(pinDirection, (1, 1)):
                 target = self.board[r + 1][c + 1]
                 if target != "--" and target[0] == 'w':
                     if r + 1 == 7:  # Promotion!
@@ -503,71 +820,88 @@ class GameState:
                     moves.append(Move((r, c), (r + 1, c + 1), self.board, isEnPassantMove=True))
 
                     
-    def getRookMoves(self, r, c, moves):
-        directions = ((-1, 0), (0, -1), (1,0), (0, 1)) # up, down, left, write
+    def getRookMoves(self, r, c, moves, capturesOnly=False):
         enemyColor = "b" if self.whiteToMove else "w"
-        for d in directions:
-            for i in range(1, 8):
-                endRow = r + d[0] * i
-                endCol = c + d[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8: # make sure the square is on board
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece == "--": # empty space valid
-                        moves.append(Move((r, c), (endRow, endCol), self.board))
-                    elif endPiece[0] == enemyColor: # enemy piece valid
+        pinDirection = self.pins.get((r, c))
+        for d, ray in ROOK_RAYS[r][c]: # up, left, down, right
+            if pinDirection is not None and not self.pinAllows(pinDirection, d):
+                continue
+            for endRow, endCol in ray:
+                endPiece = self.board[endRow][endCol]
+                if endPiece == "--": # empty space valid
+                    if not capturesOnly:
                         moves.append(Move((r, c), (endRow, endCol), self.board))
-                        break
-                    else:
-                        break # friendly piece invalid
+                elif endPiece[0] == enemyColor: # enemy piece valid
+                    moves.append(Move((r, c), (endRow, endCol), self.board))
+                    break
                 else:
-                    break # off board
-
-
+                    break # friendly piece invalid
 
-    def getKnightMoves(self, r, c, moves):
-        knightMoves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+    def getKnightMoves(self, r, c, moves, capturesOnly=False):
         allyColor = "w" if self.whiteToMove else "b"
-        for m in knightMoves:
-            endRow = r + m[0]
-            endCol = c + m[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] != allyColor: # not an ally piece (empty or enemy piece)
-                    moves.append(Move((r, c), (endRow, endCol), self.board))
+        if (r, c) in self.pins:
+            return  # a pinned knight can never stay on the pin line
+        for endRow, endCol in KNIGHT_TARGETS[r][c]:
+            endPiece = self.board[endRow][endCol]
+            if endPiece[0] != allyColor: # not an ally piece (empty or enemy piece)
+                if capturesOnly and endPiece == "--":
+                    continue
+                moves.append(Move((r, c), (endRow, endCol), self.board))
    
-    def getBishopMoves(self, r, c, moves):
-        directions = ((-1, -1), (-1, 1), (1, -1), (1, 1)) # four diagonals
+    def getBishopMoves(self, r, c, moves, capturesOnly=False):
         enemyColor = "b" if self.whiteToMove else "w"
-        for d in directions:
-            for i in range(1, 8):
-                endRow = r + d[0] * i
-                endCol = c + d[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8: # make sure the square is on board
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece == "--": # empty space valid
+        pinDirection = self.pins.get((r, c))
+        for d, ray in BISHOP_RAYS[r][c]: # four diagonals
+            if pinDirection is not None and not self.pinAllows(pinDirection, d):
+                continue
+            for endRow, endCol in ray:
+                endPiece = self.board[endRow][endCol]
+                if endPiece == "--": # empty space valid
+                    if not capturesOnly:
                         moves.append(Move((r, c), (endRow, endCol), self.board))
-                    elif endPiece[0] == enemyColor: # enemy piece valid
+                elif endPiece[0] == enemyColor: # enemy piece valid
+                    moves.append(Move((r, c), (endRow, endCol), self.board))
+                    break
+                else:
+                    break # friendly piece invalid
+
+    def getQueenMoves(self, r, c, moves, capturesOnly=False):
+        enemyColor = "b" if self.whiteToMove else "w"
+        pinDirection = self.pins.get((r, c))
+        for d, ray in QUEEN_RAYS[r][c]:
+            if pinDirection is not None and not self.pinAllows(pinDirection, d):
+                continue
+            for endRow, endCol in ray:
+                endPiece = self.board[endRow][endCol]
+                if endPiece == "--": # empty space valid
+                    if not capturesOnly:
                         moves.append(Move((r, c), (endRow, endCol), self.board))
-                        break
-                    else:
-                        break # friendly piece invalid
+                elif endPiece[0] == enemyColor: # enemy piece valid
+                    moves.append(Move((r, c), (endRow, endCol), self.board))
+                    break
                 else:
-                    break # off board
+                    break # friendly piece invalid
    
-    def getQueenMoves(self, r, c, moves):
-        self.getRookMoves(r, c, moves)
-        self.getBishopMoves(r, c, moves)
-   
-    def getKingMoves(self, r, c, moves):
-        kingMoves = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+    def getKingMoves(self, r, c, moves, capturesOnly=False):
         allyColor = "w" if self.whiteToMove else "b"
-        for i in range(8):
-            endRow = r + kingMoves[i][0]
-            endCol = c + kingMoves[i][1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] != allyColor: # not an ally piece (empty or enemy piece)
-                    moves.append(Move((r, c), (endRow, endCol), self.board))
+        for endRow, endCol in KING_TARGETS[r][c]:
+            endPiece = self.board[endRow][endCol]
+            if endPiece[0] != allyColor: # not an ally piece (empty or enemy piece)
+                if capturesOnly and endPiece == "--":
+                    continue
+                if self.kingMustStaySafe:
+                    # lift the king so it cannot hide behind itself on a slider's ray
+                    self.board[r][c] = "--"
+                    attacked = self.squareUnderAttack(endRow, endCol)
+                    self.board[r][c] = allyColor + 'K'
+                    if attacked:
+                        continue
+                moves.append(Move((r, c), (endRow, endCol), self.board))
+
+    @staticmethod
+    def pinAllows(pinDirection, d):
+        # a pinned piece may only move along the line between its king and the pinning piece
+        return pinDirection is None or pinDirection == d or pinDirection == (-d[0], -d[1])
 
     def updateCastleRights(self, move):
         if move.pieceMoved == 'wK':
@@ -588,8 +922,21 @@ class GameState:
                     self.currentCastlingRights.bqs = False
                 elif move.startCol == 7: # right rook
                     self.currentCastlingRights.bks = False
-        
+        # a rook captured on its original square takes its castling right with it
+        if move.pieceCaptured == 'wR' and move.endRow == 7:
+            if move.endCol == 0:
+                self.currentCastlingRights.wqs = False
+            elif move.endCol == 7:
+                self.currentCastlingRights.wks = False
+        elif move.pieceCaptured == 'bR' and move.endRow == 0:
+            if move.endCol == 0:
+                self.currentCastlingRights.bqs = False
+            elif move.endCol == 7:
+                self.currentCastlingRights.bks = False
+
     def getCastleMoves(self, r, c, moves):
+        if self.board[r][c][1] != 'K':
+            return # castling rights without a king on its square, e.g. a hand-made test position
         if self.squareUnderAttack(r, c):
             return # can't castle while in check
         if (self.whiteToMove and self.currentCastlingRights.wks) or (not self.whiteToMove and self.currentCastlingRights.bks):
@@ -607,23 +954,38 @@ class GameState:
             if not self.squareUnderAttack(r, c-1) and not self.squareUnderAttack(r, c-2):
                 moves.append(Move((r, c), (r, c-2), self.board, isCastleMove = True))
 
-    @staticmethod
-    def is_only_two_kings(board):
-        pieces = []
-        for row in board:
-            for square in row:
-                if square != "--":  # assuming "--" means empty
-                    pieces.append(square)
-        return len(pieces) == 2 and all('K' in piece for piece in pieces)
+    def is_only_two_kings(self):
+        return self.pieceCount == 0 and len(self.pieceSquares['wK']) + len(self.pieceSquares['bK']) == 2
+
+
+def mvvLvaScore(move):
+    """Most valuable victim, least valuable attacker. Promotions come before every capture."""
+    if move.isPawnPromotion:
+        return 100 + pieceScore[move.promotedPiece]
+    if move.pieceCaptured != '--':
+        return 10 * pieceScore[move.pieceCaptured[1]] - pieceScore[move.pieceMoved[1]]
+    return 0
 
 
 class castleRights:
+    __slots__ = ("wks", "bks", "wqs", "bqs")
+
     def __init__(self, wks, bks, wqs, bqs):
         self.wks = wks
         self.bks = bks
         self.wqs = wqs
         self.bqs = bqs
 
+    ### Rights packed as bits: 1 = wks, 2 = wqs, 4 = bks, 8 = bqs (the order of the zobrist castling keys)
+    def mask(self):
+        return (1 if self.wks else 0) | (2 if self.wqs else 0) | (4 if self.bks else 0) | (8 if self.bqs else 0)
+
+    def setMask(self, mask):
+        self.wks = mask & 1 != 0
+        self.wqs = mask & 2 != 0
+        self.bks = mask & 4 != 0
+        self.bqs = mask & 8 != 0
+
 
 class Move:
     # maps keys to values
@@ -633,33 +995,61 @@ class Move:
     filesToCols = {"a":0, "b":1, "c":2, "d":3, "e":4, "f":5, "g":6, "h":7}
     colsToFiles = {v: k for k, v in filesToCols.items()}
 
+    # Packed move layout, also used as the moveID:
+    # bits 0-5 start square (row * 8 + col), bits 6-11 end square,
+    # bits 12-14 promotion piece, bit 15 en passant, bit 16 castle
+    promotionCodes = {'N': 1, 'B': 2, 'R': 3, 'Q': 4}
+    promotionPieces = {v: k for k, v in promotionCodes.items()}
+    EN_PASSANT_FLAG = 1 << 15
+    CASTLE_FLAG = 1 << 16
+
+    __slots__ = ("startRow", "startCol", "endRow", "endCol", "pieceMoved", "pieceCaptured", "isPawnPromotion",
+                 "isEnPassantMove", "isCastleMove", "promotedPiece", "moveID")
+
     def __init__(self, startSq, endSq, board, isEnPassantMove = False, isCastleMove = False, promotedPiece = 'Q'):
-        self.startRow = startSq[0]
+        self.startRow = startRow = startSq[0]
         self.startCol = startSq[1]
-        self.endRow = endSq[0]
+        self.endRow = endRow = endSq[0]
         self.endCol = endSq[1]
-        self.pieceMoved = board[self.startRow][self.startCol]
+        self.pieceMoved = pieceMoved = board[startRow][self.startCol]
+        # a move built from two squares alone (the GUI's clicks) works out its flags from the board
+        if pieceMoved[1] == 'p':
+            isEnPassantMove = isEnPassantMove or (self.endCol != self.startCol and board[endRow][self.endCol] == "--")
+        elif pieceMoved[1] == 'K':
+            isCastleMove = isCastleMove or abs(self.endCol - self.startCol) == 2
         if isEnPassantMove:
-            self.pieceCaptured = board[self.startRow][self.endCol]
+            self.pieceCaptured = board[startRow][self.endCol]
         else:
-            self.pieceCaptured = board[self.endRow][self.endCol]
-        self.isPawnPromotion = False
-        self.isPawnPromotion = (self.pieceMoved == "wp" and self.endRow == 0) or (self.pieceMoved == "bp" and self.endRow == 7)
+            self.pieceCaptured = board[endRow][self.endCol]
+        self.isPawnPromotion = (pieceMoved == "wp" and endRow == 0) or (pieceMoved == "bp" and endRow == 7)
         # En passant
-        self.isEnPassantMove = False
         self.isEnPassantMove = isEnPassantMove
         # Castle move
         self.isCastleMove = isCastleMove
-        # unique move ID
         self.promotedPiece = promotedPiece
-        self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+        # unique move ID, the packed form of the move
+        moveID = startRow * 8 + self.startCol + ((endRow * 8 + self.endCol) << 6)
         if self.isPawnPromotion:
-            self.moveID += ord(self.promotedPiece)
+            moveID |= self.promotionCodes[promotedPiece] << 12
+        if isEnPassantMove:
+            moveID |= Move.EN_PASSANT_FLAG
+        if isCastleMove:
+            moveID |= Move.CASTLE_FLAG
+        self.moveID = moveID
+
+    @staticmethod
+    def fromPacked(packed, board):
+        """Materialize a packed move on the given board"""
+        promotion = (packed >> 12) & 7
+        return Move(((packed & 63) // 8, packed & 7), (((packed >> 6) & 63) // 8, (packed >> 6) & 7), board,
+                    isEnPassantMove=bool(packed & Move.EN_PASSANT_FLAG), isCastleMove=bool(packed & Move.CASTLE_FLAG),
+                    promotedPiece=Move.promotionPieces[promotion] if promotion else 'Q')
 
     def __eq__(self, other):
-        if isinstance(other, Move):
-            return self.moveID == other.moveID
-        return False
+        return other.__class__ is Move and self.moveID == other.moveID
+
+    def __hash__(self):
+        return self.moveID
 
     def getChessNotation(self):
         return self.pieceMoved[1] + self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
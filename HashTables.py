@@ -0,0 +1,229 @@
+### Fixed-size hash tables used by the search. A key is stored next to its entry so a slot
+### taken by another position is a miss, and the table never grows past its slot count.
+
+import mmap
+import os
+import struct
+from array import array
+
+# Seed of the Zobrist keys (ChessEngine). Fixed, so hashes and saved transposition tables mean the same in every
+# process. Changing it makes old table files unreadable.
+ZOBRIST_SEED = 0x5EED_C4E55
+
+# Transposition table file: header, then the key, score and data arrays in native byte order
+TT_MAGIC = b"PYCHESTT"
+TT_VERSION = 2  # 2: keys stored XORed with data and score
+TT_HEADER = struct.Struct("<8sIIQQQ")  # magic, version, slot bytes, zobrist seed, buckets, generation
+TT_HEADER_BYTES = 64  # header padded so the arrays start aligned
+
+
+class PawnHashTable:
+    """Pawn structure scores by pawn-only Zobrist key. Pawns change rarely during a search, so most lookups hit."""
+
+    def __init__(self, bits=14):
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.keys = [None] * self.size
+        self.entries = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, key):
+        index = key & self.mask
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.entries[index]
+        self.misses += 1
+        return None
+
+    def store(self, key, entry):
+        index = key & self.mask
+        self.keys[index] = key
+        self.entries[index] = entry
+
+    def clear(self):
+        self.keys = [None] * self.size
+        self.entries = [None] * self.size
+        self.hits = 0
+        self.misses = 0
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class EvalCache:
+    """
+    scoreBoard results by full Zobrist hash, in two flat arrays sized from a memory budget.
+    Only exact evaluations go in, never lazy ones that stopped short.
+    """
+
+    ENTRY_BYTES = 16  # 8 byte key + 8 byte score
+
+    def __init__(self, megabytes=8):
+        entries = max(1, megabytes * 1024 * 1024 // self.ENTRY_BYTES)
+        self.size = 1 << (entries.bit_length() - 1)  # round down to a power of two so a mask picks the slot
+        self.mask = self.size - 1
+        self.clear()
+
+    def probe(self, key):
+        index = key & self.mask
+        if self.keys[index] == key and self.used[index]:
+            self.hits += 1
+            return self.scores[index]
+        self.misses += 1
+        return None
+
+    def store(self, key, score):
+        index = key & self.mask
+        self.keys[index] = key
+        self.scores[index] = score
+        self.used[index] = 1
+
+    def clear(self):
+        self.keys = array('Q', bytes(8 * self.size))
+        self.scores = array('d', bytes(8 * self.size))
+        self.used = bytearray(self.size)
+        self.hits = 0
+        self.misses = 0
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class TranspositionTable:
+    """
+    Search results by full Zobrist hash, in flat arrays sized from a memory budget.
+    Buckets of two slots: the first keeps the deepest entry of the current search, the second takes whatever the
+    first turns away. Entries from earlier searches (older generations) are replaced first.
+    An entry is (packed best move, depth, flag, score); depth, flag, generation and move share one integer.
+
+    The arrays live in one buffer (a bytearray, a mapped file or shared memory) so processes can share a table
+    without locks: a slot's key is stored XORed with its data and score, so a slot that another process is
+    halfway through writing no longer matches its key and reads as a miss.
+    """
+
+    SLOT_BYTES = 24  # 8 byte key + 8 byte score + 8 byte packed data
+    DEPTH_SHIFT = 17  # packed moves use bits 0-16
+    FLAG_SHIFT = 25
+    GENERATION_SHIFT = 27
+    USED = 1 << 35
+
+    def __init__(self, megabytes=16):
+        self.resize(megabytes)
+
+    @classmethod
+    def bucketsFor(cls, megabytes):
+        buckets = max(1, megabytes * 1024 * 1024 // (2 * cls.SLOT_BYTES))
+        return 1 << (buckets.bit_length() - 1)
+
+    @classmethod
+    def bufferSize(cls, buckets):
+        return 2 * buckets * cls.SLOT_BYTES
+
+    def resize(self, megabytes):
+        buckets = self.bucketsFor(megabytes)
+        self.attach(bytearray(self.bufferSize(buckets)), buckets)
+
+    def attach(self, buffer, buckets, generation=0):
+        """Use buffer, bufferSize(buckets) bytes of keys, then scores, then data, as the table"""
+        self.buckets = buckets
+        self.mask = buckets - 1
+        self.generation = generation
+        size = 16 * buckets
+        self.view = memoryview(buffer)[:3 * size]
+        self.keys = self.view[:size].cast('Q')
+        self.scores = self.view[size:2 * size].cast('d')
+        self.scoreBits = self.view[size:2 * size].cast('Q')  # the same scores as integers, for the key check
+        self.data = self.view[2 * size:].cast('Q')
+
+    def release(self):
+        """Let go of the buffer, which a shared memory block needs before it can be closed"""
+        for view in (self.keys, self.scores, self.scoreBits, self.data, self.view):
+            view.release()
+
+    def clear(self):
+        self.view[:] = bytes(len(self.view))
+        self.generation = 0
+
+    def newSearch(self):
+        """Age the entries of the previous searches so they are replaced first"""
+        self.generation = (self.generation + 1) & 0xFF
+
+    def probe(self, key):
+        """(best move, depth, flag, score) or None"""
+        index = (key & self.mask) << 1
+        data = self.data[index]
+        if self.keys[index] ^ data ^ self.scoreBits[index] != key or not data:
+            index += 1
+            data = self.data[index]
+            if self.keys[index] ^ data ^ self.scoreBits[index] != key or not data:
+                return None
+        return data & 0x1FFFF, (data >> self.DEPTH_SHIFT) & 0xFF, (data >> self.FLAG_SHIFT) & 3, self.scores[index]
+
+    def store(self, key, depth, flag, score, move):
+        index = (key & self.mask) << 1
+        keys = self.keys
+        data = self.data
+        scoreBits = self.scoreBits
+        first = data[index]
+        if keys[index] ^ first ^ scoreBits[index] != key:
+            if keys[index + 1] ^ data[index + 1] ^ scoreBits[index + 1] == key:
+                index += 1  # already in the second slot, update it there
+            elif (first and (first >> self.GENERATION_SHIFT) & 0xFF == self.generation and
+                  (first >> self.DEPTH_SHIFT) & 0xFF > depth):
+                index += 1  # the first slot holds a deeper entry of this search
+        old = data[index]
+        if not move and old and keys[index] ^ old ^ scoreBits[index] == key:
+            move = old & 0x1FFFF  # keep the old best move for ordering
+        packed = (self.USED | self.generation << self.GENERATION_SHIFT | flag << self.FLAG_SHIFT |
+                  min(depth, 0xFF) << self.DEPTH_SHIFT | move)
+        self.scores[index] = score
+        data[index] = packed
+        keys[index] = key ^ packed ^ scoreBits[index]
+
+    def hashfull(self):
+        """Permille of the first 1000 slots holding an entry from the current search, as UCI reports it"""
+        slots = min(1000, len(self.data))
+        used = sum(1 for data in self.data[:slots]
+                   if data and (data >> self.GENERATION_SHIFT) & 0xFF == self.generation)
+        return used * 1000 // slots
+
+    def save(self, path):
+        """
+        Write the table to a file that load() can map back. It goes to a temporary file first and then replaces
+        path, so a table mapped from path (or a crash halfway) never sees a half-written file.
+        """
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            header = TT_HEADER.pack(TT_MAGIC, TT_VERSION, self.SLOT_BYTES, ZOBRIST_SEED, self.buckets, self.generation)
+            f.write(header.ljust(TT_HEADER_BYTES, b"\0"))
+            f.write(self.view)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        A table memory-mapped from a file written by save(), without reading it through. The mapping is
+        copy-on-write: the search updates its own pages and the file stays as it was until the next save().
+        Raises ValueError for a file of another format, version or set of Zobrist keys.
+        """
+        with open(path, "rb") as f:
+            header = f.read(TT_HEADER_BYTES)
+            if len(header) < TT_HEADER.size:
+                raise ValueError("%s is not a transposition table file" % path)
+            magic, version, slotBytes, seed, buckets, generation = TT_HEADER.unpack_from(header)
+            if magic != TT_MAGIC:
+                raise ValueError("%s is not a transposition table file" % path)
+            if version != TT_VERSION or slotBytes != cls.SLOT_BYTES:
+                raise ValueError("%s has table format %d, expected %d" % (path, version, TT_VERSION))
+            if seed != ZOBRIST_SEED:
+                raise ValueError("%s was saved with other Zobrist keys" % path)
+            if buckets & (buckets - 1) or f.seek(0, 2) != TT_HEADER_BYTES + cls.bufferSize(buckets):
+                raise ValueError("%s is truncated or corrupt" % path)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        table = cls.__new__(cls)
+        table.attach(memoryview(mapped)[TT_HEADER_BYTES:], buckets, generation)
+        return table
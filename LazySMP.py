@@ -0,0 +1,108 @@
+### Lazy SMP: helper processes search the same root as the main search, each on its own, and share the
+### transposition table through a shared memory block. The helpers never report moves, they only fill the table
+### with results the main search then finds; the main process reports its own best move.
+### Processes rather than threads, so the searches are not serialised by the GIL.
+
+import multiprocessing
+import random
+import time
+from multiprocessing import shared_memory
+
+import SmartMoveFinder
+from ChessEngine import GameState
+from HashTables import TranspositionTable
+
+
+def shared_table(buffer, buckets, generation=0):
+    table = TranspositionTable.__new__(TranspositionTable)
+    table.attach(buffer, buckets, generation)
+    return table
+
+
+def helper_main(index, name, buckets, backend, connection, stop):
+    """Helper process: search every position it is sent until the time is up or the main search sets stop"""
+    block = shared_memory.SharedMemory(name=name)  # the helpers share the main process' resource tracker
+    finder = SmartMoveFinder.SmartMoveFinder
+    table = finder.transposition_table = shared_table(block.buf, buckets)
+    SmartMoveFinder.stop_event = stop
+    rng = random.Random(index)
+    gs = backend()
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        fen, endTime, maxDepth, generation = task
+        gs.load_fen(fen)
+        validMoves = gs.getValidMoves()
+        rng.shuffle(validMoves)  # every helper tries the root moves in its own order
+        table.generation = generation
+        SmartMoveFinder.endTime = endTime
+        SmartMoveFinder.counter = 0
+        SmartMoveFinder.nextMove = None
+        finder.clear_search_data()
+        # half the helpers start a ply deeper, so they spread over two depths instead of following the main search
+        finder.iterative_deepening(gs, validMoves, 1 + index % 2, maxDepth)
+        connection.send(SmartMoveFinder.counter)
+    table.release()
+    block.close()
+
+
+class LazySMP:
+    """
+    threads - 1 helper processes around the main search. While it exists, SmartMoveFinder.transposition_table is
+    a shared table of the same size, starting with a copy of the old table's entries. close() stops the helpers
+    and puts a private copy back.
+    """
+
+    def __init__(self, threads, backend=GameState):
+        finder = SmartMoveFinder.SmartMoveFinder
+        previous = finder.transposition_table
+        buckets = previous.buckets
+        self.block = shared_memory.SharedMemory(create=True, size=TranspositionTable.bufferSize(buckets))
+        self.table = shared_table(self.block.buf, buckets, previous.generation)
+        self.table.view[:] = previous.view
+        finder.transposition_table = self.table
+
+        self.nodes = 0
+        self.stop = multiprocessing.Event()
+        self.helpers = []
+        for index in range(threads - 1):
+            connection, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=helper_main, daemon=True,
+                                              args=(index, self.block.name, buckets, backend, child, self.stop))
+            process.start()
+            self.helpers.append((process, connection))
+
+    def findBestMove(self, gs, validMoves, maxDepth=None, timeManager=None):
+        """SmartMoveFinder.findBestMove with the helpers searching alongside. Leaves the total nodes in self.nodes."""
+        generation = (self.table.generation + 1) & 0xFF  # what findBestMove's newSearch will make it
+        if timeManager is None:
+            endTime = time.time() + SmartMoveFinder.THINK_TIME
+        else:
+            endTime = timeManager.hardDeadline
+            if timeManager.depth is not None:
+                maxDepth = timeManager.depth
+        fen = gs.to_fen()
+        for process, connection in self.helpers:
+            connection.send((fen, endTime, maxDepth, generation))
+        try:
+            move = SmartMoveFinder.SmartMoveFinder.findBestMove(gs, validMoves, maxDepth, timeManager)
+        finally:
+            self.stop.set()
+            self.nodes = SmartMoveFinder.counter + sum(connection.recv() for process, connection in self.helpers)
+            self.stop.clear()
+        return move
+
+    def close(self):
+        for process, connection in self.helpers:
+            connection.send(None)
+        for process, connection in self.helpers:
+            process.join()
+            connection.close()
+        self.helpers = []
+        # the search goes on with a private copy of everything the table learned
+        SmartMoveFinder.SmartMoveFinder.transposition_table = shared_table(bytearray(self.table.view),
+                                                                          self.table.buckets, self.table.generation)
+        self.table.release()
+        self.block.close()
+        self.block.unlink()
@@ -0,0 +1,193 @@
+### Root splitting: the root moves are shared out over a pool of worker processes, each searching its moves on its
+### own copy of the position with its own tables. What the parent shares is the bound: within an iteration every
+### move goes out with the best score known by then as alpha, and between iterations the previous score sets the
+### aspiration window of the next one's first move. Used instead of Lazy SMP with the UCI option RootSplit.
+
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import SmartMoveFinder
+from ChessEngine import GameState
+
+POLL_SECONDS = 0.05  # how often the parent looks for a stop while it waits for the workers
+
+worker_state = None  # [game state, search number] in each worker process
+
+
+def init_worker(backend, stop):
+    global worker_state
+    worker_state = [backend(), None]
+    SmartMoveFinder.stop_event = stop
+
+
+def search_root_move(search, fen, moveID, depth, alpha, beta, endTime, nodeLimit):
+    """Worker: (score of one root move searched to depth or None when a limit ended it, nodes visited)"""
+    finder = SmartMoveFinder.SmartMoveFinder
+    gs = worker_state[0]
+    if worker_state[1] != search:  # killers, history and the table age belong to one search
+        worker_state[1] = search
+        finder.clear_search_data()
+        finder.transposition_table.newSearch()
+    gs.load_fen(fen)
+    turnMultiplier = 1 if gs.whiteToMove else -1
+    gs.makeMove(gs.getLegalMove(moveID))
+    SmartMoveFinder.endTime = endTime
+    SmartMoveFinder.nodeLimit = nodeLimit
+    SmartMoveFinder.counter = 0
+    try:
+        score = -finder.findMoveNegaMaxAlphaBeta(gs, None, depth - 1, -beta, -alpha, -turnMultiplier, depth)
+    except TimeoutError:
+        score = None
+    return score, SmartMoveFinder.counter
+
+
+class RootSplit:
+    """
+    A pool of worker processes searching the root moves of findBestMove between them. It takes the same
+    TimeManager as SmartMoveFinder.findBestMove; a node limit is shared out so the workers together stay within it.
+    """
+
+    def __init__(self, workers, backend=GameState):
+        self.workers = workers
+        # the pool starts its workers as it needs them, which may be from the UCI search thread, where fork is unsafe
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self.stop = context.Event()
+        self.pool = ProcessPoolExecutor(workers, context, init_worker, (backend, self.stop))
+        self.searches = 0
+        self.nodes = 0
+        self.budget = float("inf")
+        self.timeManager = None
+        self.endTime = 0
+
+    def findBestMove(self, gs, validMoves, maxDepth=None, timeManager=None):
+        """Iterative deepening like SmartMoveFinder.findBestMove. Leaves the total nodes in self.nodes."""
+        self.searches += 1
+        self.nodes = 0
+        self.budget = float("inf")
+        self.timeManager = timeManager
+        self.endTime = time.time() + SmartMoveFinder.THINK_TIME
+        if timeManager is not None:
+            if timeManager.depth is not None:
+                maxDepth = timeManager.depth
+            if timeManager.nodes is not None:
+                self.budget = timeManager.nodes
+        fen = gs.to_fen()
+        moves = list(validMoves)
+        bestMove = moves[0] if moves else None
+        score = None
+        depth = 1
+        try:
+            while moves and (maxDepth is None or depth <= maxDepth):
+                if self.stopped():
+                    break
+                move, score, finished = self.search_depth(fen, moves, depth, score)
+                if move is not None:
+                    bestMove = move
+                # If we found mate, no need to search deeper
+                if not finished or abs(score) >= SmartMoveFinder.CHECKMATE - 100:
+                    break
+                # Not enough time left for another depth
+                if timeManager is not None and timeManager.stop_early(bestMove):
+                    break
+                depth += 1
+        finally:
+            self.stop.clear()
+        return bestMove
+
+    def deadline(self):
+        """The hard limit, which a ponderhit may move while the search runs"""
+        return self.endTime if self.timeManager is None else self.timeManager.hardDeadline
+
+    def stopped(self):
+        """Whether the search was told to stop (UCI stop) or the hard limit passed, passing it on to the workers"""
+        if (time.time() >= self.deadline() or
+                SmartMoveFinder.stop_event is not None and SmartMoveFinder.stop_event.is_set()):
+            self.stop.set()
+        return self.stop.is_set()
+
+    def submit(self, fen, move, depth, alpha, beta, pending, slots):
+        """Send a move out with a share of the node budget left for slots moves, False when there is none to give"""
+        share = self.budget
+        if share != float("inf"):
+            share //= slots
+            if share <= 0:
+                return False
+            self.budget -= share
+        pending[self.pool.submit(search_root_move, self.searches, fen, move.moveID, depth, alpha, beta,
+                                 self.deadline(), share)] = (move, share)
+        return True
+
+    def collect(self, pending):
+        """Wait for at least one worker: [(move, score or None)] of the moves it finished"""
+        done = ()
+        while not done:
+            done, _ = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+            self.stopped()
+        results = []
+        for future in done:
+            move, share = pending.pop(future)
+            score, nodes = future.result()
+            self.nodes += nodes
+            if share != float("inf"):
+                self.budget += share - nodes  # what the worker did not use goes back
+            results.append((move, score))
+        return results
+
+    def search_depth(self, fen, moves, depth, guess=None):
+        """
+        One iteration: the first move (the best of the last iteration) alone, in an aspiration window around guess
+        when there is one, then the others in parallel, each sent out with the best score known by then as alpha.
+        Returns (best move, score, finished), the move being None when not even the first one finished.
+        Reorders moves best first for the next iteration.
+        """
+        CHECKMATE = SmartMoveFinder.CHECKMATE
+        pending = {}
+        alpha, beta = -CHECKMATE, CHECKMATE
+        delta = SmartMoveFinder.ASPIRATION_WINDOW
+        if SmartMoveFinder.ASPIRATION and guess is not None:
+            alpha, beta = guess - delta, guess + delta
+        while True:
+            if not self.submit(fen, moves[0], depth, alpha, beta, pending, 1):
+                return None, None, False
+            [(best, score)] = self.collect(pending)
+            if score is None:
+                return None, None, False
+            delta *= 2
+            if score <= alpha and alpha > -CHECKMATE:
+                alpha = max(score - delta, -CHECKMATE)
+            elif score >= beta and beta < CHECKMATE:
+                beta = min(score + delta, CHECKMATE)
+            else:
+                break
+
+        alpha = score
+        scores = {best: score}
+        remaining = iter(moves[1:])
+        finished = True
+        while True:
+            # only as many moves out as there are workers, so every move gets the latest alpha
+            while finished and len(pending) < self.workers:
+                move = next(remaining, None)
+                if move is None:
+                    break
+                if not self.submit(fen, move, depth, alpha, CHECKMATE, pending, self.workers - len(pending)):
+                    finished = False
+            if not pending:
+                break
+            for move, score in self.collect(pending):
+                if score is None:
+                    finished = False
+                    continue
+                scores[move] = score  # an upper bound when it failed low, good enough for ordering
+                if score > alpha:
+                    best, alpha = move, score
+
+        moves.sort(key=lambda move: scores.get(move, -CHECKMATE), reverse=True)
+        moves.remove(best)
+        moves.insert(0, best)
+        return best, alpha, finished
+
+    def close(self):
+        self.pool.shutdown()
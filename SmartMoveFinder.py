@@ -1,11 +1,24 @@
+import json
+import os
 import random
 import time
 
+from AttackTables import (ADJACENT_FILE_MASKS, BACKWARD_SUPPORT_MASKS, CONNECTED_MASKS, FILE_MASKS, FORWARD_SPAN_MASKS,
+                          PASSED_PAWN_MASKS, PAWN_ATTACKS)
+from HashTables import EvalCache, PawnHashTable, TranspositionTable
+
 pieceScore = {"K": 0, "Q": 9, "R": 5, "B": 3, "N": 3, "p": 1}
+# game phase weight of each piece type, 24 with all pieces on the board
+phaseWeight = {"K": 0, "Q": 4, "R": 2, "B": 1, "N": 1, "p": 0}
+TOTAL_PHASE = 24
 CHECKMATE = 1000
 STALEMATE = 0
-DEPTH = 6
+THINK_TIME = 5.0  # seconds per move when there is no time manager, increased from 2.0 for stronger play
 endTime = 0
+nodeLimit = float("inf")  # the search stops after this many nodes (go nodes)
+time_manager = None  # the TimeManager of the current search, if it has one
+stop_event = None  # an Event that ends the search early: UCI stop, or the end of the main search for Lazy SMP helpers
+TIME_CHECK_NODES = 256  # nodes between two looks at the clock and stop_event
 
 # Zobrist keys
 zobrist_table = [[[random.getrandbits(64) for _ in range(8)] for _ in range(8)] for _ in range(12)]
@@ -113,45 +126,157 @@ piecePositionScores = {"N": knightScores, "Q": queenScores, "K": kingScores, "B"
                        "wp": whitePawnScores, "bp": blackPawnScores}
 
 
+def buildPieceSquareValues(kingTable):
+    """
+    Material plus position score of every piece on every square (index row * 8 + col), the same numbers scoreBoard
+    used to add up, in hundredths of a pawn with white positive. GameState keeps running sums of these.
+    """
+    values = {}
+    for piece in piece_map:
+        piece_color, piece_type = piece
+        if piece_type == 'K':
+            pos_table = kingTable
+        else:
+            pos_table = piecePositionScores[piece if piece_type == 'p' else piece_type]
+        sign = 1 if piece_color == 'w' else -1
+        squares = []
+        for row in range(8):
+            for col in range(8):
+                if piece_type == 'p' or piece_color == 'b':
+                    position_score = pos_table[row][col]
+                else:
+                    position_score = pos_table[7 - row][col]
+                squares.append(sign * round(pieceScore[piece_type] * 100 + position_score * 10))
+        values[piece] = squares
+    return values
+
+
+# middlegame and endgame values only differ in the king table
+PIECE_SQUARE_MG = buildPieceSquareValues(kingScores)
+PIECE_SQUARE_EG = buildPieceSquareValues(kingScores_eg)
+
+# Pawn structure terms, in pawns. Rank bonuses are indexed by rank counted from the pawn's own side.
+PASSED_PAWN_BONUS = [0, 0.2, 0.3, 0.5, 0.8, 1.2, 2.0, 3.5]
+CANDIDATE_PAWN_BONUS = [0, 0.05, 0.1, 0.15, 0.25, 0.35, 0.4, 0]
+DOUBLED_ISOLATED_PENALTY = 0.6
+DOUBLED_PENALTY = 0.3
+ISOLATED_PENALTY = 0.25
+ISOLATED_PENALTY_EG = 0.35
+BACKWARD_PENALTY = 0.2
+PAWN_PARAMS = ("PASSED_PAWN_BONUS", "CANDIDATE_PAWN_BONUS", "DOUBLED_ISOLATED_PENALTY", "DOUBLED_PENALTY",
+               "ISOLATED_PENALTY", "ISOLATED_PENALTY_EG", "BACKWARD_PENALTY")
+
+# Tuned values written by Tuner.py, loaded at startup when the file exists
+EVAL_PARAMS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eval_params.json")
+
+
+def eval_params():
+    """
+    The tunable evaluation values as eval_params.json stores them: the white piece-square values by piece type
+    (material included, hundredths of a pawn, index row * 8 + col) and the pawn structure terms by name.
+    """
+    params = {"pieceSquareMg": {piece[1]: PIECE_SQUARE_MG[piece][:] for piece in piece_map if piece[0] == 'w'},
+              "pieceSquareEg": {piece[1]: PIECE_SQUARE_EG[piece][:] for piece in piece_map if piece[0] == 'w'}}
+    for name in PAWN_PARAMS:
+        params[name] = globals()[name]
+    return params
+
+
+def load_eval_params(path=EVAL_PARAMS_FILE):
+    """
+    Replace the tunable evaluation values with the ones in an eval_params.json file, black tables being the white
+    ones mirrored. Values missing from the file are left alone. GameStates set up before this keep their old sums
+    until load_fen.
+    """
+    with open(path) as f:
+        params = json.load(f)
+    for key, tables in (("pieceSquareMg", PIECE_SQUARE_MG), ("pieceSquareEg", PIECE_SQUARE_EG)):
+        for pieceType, values in params.get(key, {}).items():
+            tables['w' + pieceType][:] = [round(value) for value in values]
+            tables['b' + pieceType][:] = [-round(values[sq ^ 56]) for sq in range(64)]
+    for name in PAWN_PARAMS:
+        if name in params:
+            globals()[name] = params[name]
+    SmartMoveFinder.pawn_table.clear()
+    SmartMoveFinder.eval_cache.clear()
+
+# Set to check the incremental material/position sums against a full recompute on every evaluation
+DEBUG_EVAL = False
+
+# Lazy evaluation: scoreBoard skips the pawn structure terms when the rest of the score is already more than
+# LAZY_MARGIN outside the search window. scoreBoard holds the pawn terms within PAWN_TERMS_LIMIT pawns (they go
+# past it in about 1% of positions), so with that as the margin the skipped score is on the same side of the window.
+LAZY_EVAL = True
+PAWN_TERMS_LIMIT = 3.0
+LAZY_MARGIN = PAWN_TERMS_LIMIT
+
+# Size of the evaluation cache (full scoreBoard results by Zobrist hash) in megabytes
+EVAL_CACHE_MB = 8
+
+# Size of the transposition table in megabytes (UCI option Hash)
+HASH_MB = 16
+
+# Principal variation search: every move after the first is tried with a null window of NULL_WINDOW pawns and only
+# searched again with the full window when it lands inside it. Without it only LMR scouts, with a one pawn window.
+PVS = True
+NULL_WINDOW = 0.01
+
+# Aspiration windows: each iteration after the first searches the root in a window of ASPIRATION_WINDOW pawns either
+# side of the last score, doubled on the side that fails until the score falls inside
+ASPIRATION = True
+ASPIRATION_WINDOW = 1.0
+
+
+def out_of_time():
+    """The hard limit has passed or the search was told to stop. A ponderhit moves the time manager's deadline."""
+    deadline = endTime if time_manager is None else time_manager.hardDeadline
+    return time.time() >= deadline or (stop_event is not None and stop_event.is_set())
+
+
 class SmartMoveFinder:
-    # Transposition Table
-    transposition_table = {}
+    # Transposition Table, fixed size and kept between searches
+    transposition_table = TranspositionTable(HASH_MB)
     HASH_EXACT = 0
     HASH_ALPHA = 1
     HASH_BETA = 2
 
+    # Killers, history and the TT keep moves in their packed form (Move.moveID)
+
     # NEW: Killer Moves - stores 2 killer moves per depth
-    killer_moves = [[None, None] for _ in range(100)]
+    killer_moves = [[0, 0] for _ in range(100)]
+
+    # NEW: History Heuristic - stores how good moves have been historically, indexed by from/to squares
+    history_table = [0] * 4096
 
-    # NEW: History Heuristic - stores how good moves have been historically
-    history_table = {}
+    # Pawn structure terms by pawn hash, kept between searches
+    pawn_table = PawnHashTable()
+
+    # Exact scoreBoard results by position hash, kept between searches
+    eval_cache = EvalCache(EVAL_CACHE_MB)
 
     @staticmethod
     def clear_search_data():
         """Clear killer moves and history between searches"""
-        SmartMoveFinder.killer_moves = [[None, None] for _ in range(100)]
-        SmartMoveFinder.history_table = {}
+        SmartMoveFinder.killer_moves = [[0, 0] for _ in range(100)]
+        SmartMoveFinder.history_table = [0] * 4096
 
     @staticmethod
     def store_killer(move, depth):
         """Store a killer move at this depth"""
-        if SmartMoveFinder.killer_moves[depth][0] != move:
-            SmartMoveFinder.killer_moves[depth][1] = SmartMoveFinder.killer_moves[depth][0]
-            SmartMoveFinder.killer_moves[depth][0] = move
+        killers = SmartMoveFinder.killer_moves[depth]
+        if killers[0] != move.moveID:
+            killers[1] = killers[0]
+            killers[0] = move.moveID
 
     @staticmethod
     def update_history(move, depth):
         """Update history heuristic - good moves get higher scores"""
-        move_key = (move.startRow, move.startCol, move.endRow, move.endCol)
-        if move_key not in SmartMoveFinder.history_table:
-            SmartMoveFinder.history_table[move_key] = 0
-        SmartMoveFinder.history_table[move_key] += depth * depth  # Depth squared bonus
+        SmartMoveFinder.history_table[move.moveID & 4095] += depth * depth  # Depth squared bonus
 
     @staticmethod
     def get_history_score(move):
         """Get history score for move ordering"""
-        move_key = (move.startRow, move.startCol, move.endRow, move.endCol)
-        return SmartMoveFinder.history_table.get(move_key, 0)
+        return SmartMoveFinder.history_table[move.moveID & 4095]
 
     @staticmethod
     def findRandomMove(validMoves):
@@ -162,45 +287,80 @@ class SmartMoveFinder:
     @staticmethod
     def is_endgame(gs):
         """Don't use null move in endgames - zugzwang is common"""
-        piece_count = 0
-        for row in gs.board:
-            for square in row:
-                if square != "--" and square[1] != 'K':
-                    piece_count += 1
-        return piece_count <= 6
+        return gs.pieceCount <= 6
 
     @staticmethod
-    def findBestMove(gs, validMoves):
-        global nextMove, counter, endTime
+    def static_eval_reaches(gs, beta, turnMultiplier):
+        """Whether the side to move's static score is at least beta, the null move condition"""
+        # scoreBoard's window is from white's point of view
+        return turnMultiplier * SmartMoveFinder.scoreBoard(gs, turnMultiplier * beta, turnMultiplier * beta) >= beta
+
+    @staticmethod
+    def findBestMove(gs, validMoves, maxDepth=None, timeManager=None):
+        """
+        The best move found in THINK_TIME seconds, or within the limits of timeManager (its depth replacing
+        maxDepth when it has one). The first of validMoves when the limits end the search before any move scored.
+        """
+        global nextMove, counter, endTime, nodeLimit, time_manager
         nextMove = None
         random.shuffle(validMoves)
         counter = 0
-        THINK_TIME = 5.0  # Increased from 2.0 for stronger play
-        endTime = time.time() + THINK_TIME
+        time_manager = timeManager
+        if timeManager is None:
+            endTime = time.time() + THINK_TIME
+            nodeLimit = float("inf")
+        else:
+            endTime = timeManager.hardDeadline
+            nodeLimit = float("inf") if timeManager.nodes is None else timeManager.nodes
+            if timeManager.depth is not None:
+                maxDepth = timeManager.depth
 
         # Clear search data at start of new search
         SmartMoveFinder.clear_search_data()
+        SmartMoveFinder.transposition_table.newSearch()
+
+        try:
+            SmartMoveFinder.iterative_deepening(gs, validMoves, 1, maxDepth)
+        finally:
+            nodeLimit = float("inf")
+            time_manager = None
+        if nextMove is None and validMoves:
+            return validMoves[0]
+        return nextMove
 
-        current_depth = 1
-        best_score = -CHECKMATE
+    @staticmethod
+    def iterative_deepening(gs, validMoves, startDepth=1, maxDepth=None):
+        """
+        Search the root one depth deeper at a time until the time runs out, a mate is found or maxDepth is done.
+        The best move so far is left in nextMove. Returns the last depth searched to the end.
+        """
+        current_depth = startDepth
+        completed_depth = 0
+        score = None
 
-        while True:
-            if time.time() >= endTime:
+        while maxDepth is None or current_depth <= maxDepth:
+            if out_of_time():
                 break
             # print(f"--- Depth {current_depth} ---")
             try:
-                score = SmartMoveFinder.findMoveNegaMaxAlphaBeta(
-                    gs, validMoves, current_depth, -CHECKMATE, CHECKMATE,
-                    1 if gs.whiteToMove else -1, current_depth
-                )
-
-                best_score = score
+                if ASPIRATION and score is not None:
+                    score = SmartMoveFinder.aspiration_search(gs, validMoves, current_depth, score)
+                else:
+                    score = SmartMoveFinder.findMoveNegaMaxAlphaBeta(
+                        gs, validMoves, current_depth, -CHECKMATE, CHECKMATE,
+                        1 if gs.whiteToMove else -1, current_depth
+                    )
+                completed_depth = current_depth
 
                 # If we found mate, no need to search deeper
                 if abs(score) >= CHECKMATE - 100:
                     # print(f"Mate found at depth {current_depth}")
                     break
 
+                # Not enough time left for another depth
+                if time_manager is not None and time_manager.stop_early(nextMove):
+                    break
+
                 current_depth += 1
 
                 # Move ordering: put best move first for next iteration
@@ -212,41 +372,76 @@ class SmartMoveFinder:
                 # print(f"Time's up! Stopped at depth {current_depth}")
                 break
 
-        # print(f"Final depth: {current_depth}, Score: {best_score}, Positions: {counter}")
-        return nextMove
+        # print(f"Final depth: {completed_depth}, Positions: {counter}")
+        return completed_depth
+
+    @staticmethod
+    def aspiration_search(gs, validMoves, depth, guess):
+        """Root search in a window around guess, widened on the side that fails until the score is inside it"""
+        global nextMove
+        turnMultiplier = 1 if gs.whiteToMove else -1
+        delta = ASPIRATION_WINDOW
+        alpha, beta = guess - delta, guess + delta
+        bestMove = nextMove
+        while True:
+            score = SmartMoveFinder.findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier, depth)
+            delta *= 2
+            if score <= alpha and alpha > -CHECKMATE:
+                nextMove = bestMove  # a root that failed low only knows that every move is worse than alpha
+                alpha = max(score - delta, -CHECKMATE)
+            elif score >= beta and beta < CHECKMATE:
+                bestMove = nextMove  # the move that failed high is better than the old best
+                beta = min(score + delta, CHECKMATE)
+            else:
+                return score
+
+    @staticmethod
+    def horizonSearch(gs, alpha, beta, turnMultiplier):
+        """
+        Depth 0 of the main search. The staged picker never calls getValidMoves, so a mate or stalemate on the last
+        ply is found here. In check there is no stand pat: every evasion is searched, then quiescence takes over.
+        """
+        found, checks = gs.hasLegalMove()
+        if not found:
+            return -CHECKMATE if checks else STALEMATE
+        if not checks:
+            return SmartMoveFinder.quiescenceSearch(gs, alpha, beta, turnMultiplier)
+
+        for move in gs.generateLegalMoves()[0]:
+            gs.makeMove(move)
+            score = -SmartMoveFinder.quiescenceSearch(gs, -beta, -alpha, -turnMultiplier)
+            gs.undoMove()
+
+            if score >= beta:
+                return beta
+            if score > alpha:
+                alpha = score
+
+        return alpha
 
     @staticmethod
     def quiescenceSearch(gs, alpha, beta, turnMultiplier):
         """Quiescence search with delta pruning"""
-        stand_pat = turnMultiplier * SmartMoveFinder.scoreBoard(gs)
+        BIG_DELTA = 9  # Queen value
+
+        # The stand pat only matters against beta and against alpha - BIG_DELTA, so that is the window for lazy eval
+        if turnMultiplier == 1:
+            stand_pat = SmartMoveFinder.scoreBoard(gs, alpha - BIG_DELTA, beta)
+        else:
+            stand_pat = -SmartMoveFinder.scoreBoard(gs, -beta, -alpha + BIG_DELTA)
 
         if stand_pat >= beta:
             return beta
 
         # Delta pruning
-        BIG_DELTA = 9  # Queen value
         if stand_pat < alpha - BIG_DELTA:
             return alpha
 
         if stand_pat > alpha:
             alpha = stand_pat
 
-        validMoves = gs.getValidMoves()
-
-        # Only search captures and promotions
-        capture_moves = [m for m in validMoves if m.pieceCaptured != '--' or m.isPawnPromotion]
-
-        # MVV-LVA ordering
-        def mvv_lva_score(move):
-            if move.isPawnPromotion:
-                return 100
-            if move.pieceCaptured != '--':
-                victim = pieceScore.get(move.pieceCaptured[1], 0)
-                attacker = pieceScore.get(move.pieceMoved[1], 0)
-                return 10 * victim - attacker
-            return 0
-
-        capture_moves.sort(key=mvv_lva_score, reverse=True)
+        # Only search captures and promotions, already in MVV-LVA order
+        capture_moves = gs.getCaptureMoves()
 
         for move in capture_moves:
             gs.makeMove(move)
@@ -271,12 +466,14 @@ class SmartMoveFinder:
         5. Other moves
         """
         scored_moves = []
+        killer1, killer2 = SmartMoveFinder.killer_moves[depth]
 
         for move in validMoves:
             score = 0
+            packed = move.moveID
 
             # 1. TT move gets highest priority
-            if move == tt_best_move:
+            if packed == tt_best_move:
                 score = 10000
 
             # 2. Captures (MVV-LVA)
@@ -290,9 +487,9 @@ class SmartMoveFinder:
                 score = 90
 
             # 4. Killer moves
-            elif move == SmartMoveFinder.killer_moves[depth][0]:
+            elif packed == killer1:
                 score = 80
-            elif move == SmartMoveFinder.killer_moves[depth][1]:
+            elif packed == killer2:
                 score = 70
 
             # 5. History heuristic
@@ -305,28 +502,71 @@ class SmartMoveFinder:
         scored_moves.sort(reverse=True, key=lambda x: x[0])
         return [move for score, move in scored_moves]
 
+    @staticmethod
+    def pick_moves(gs, tt_best_move, depth):
+        """
+        Staged move picker for the nodes below the root. Each stage is only built once the one before it is used up,
+        so a cutoff early on never pays for generating or sorting the rest:
+        1. TT move, checked for legality without generating anything
+        2. Winning and equal captures and promotions (MVV-LVA)
+        3. Killer moves, checked the same way as the TT move
+        4. Quiet moves by history score
+        5. Losing captures, a more valuable piece taking a defended one
+        """
+        tried = []
+        if tt_best_move:
+            move = gs.getLegalMove(tt_best_move)
+            if move is not None:
+                tried.append(tt_best_move)
+                yield move
+
+        losing_captures = []
+        for move in gs.getCaptureMoves():
+            if move.moveID in tried:
+                continue
+            # a more valuable piece taking a defended one waits until after the quiet moves
+            if (not move.isPawnPromotion and pieceScore[move.pieceCaptured[1]] < pieceScore[move.pieceMoved[1]]
+                    and gs.squareUnderAttack(move.endRow, move.endCol)):
+                losing_captures.append(move)
+                continue
+            yield move
+
+        for killer in SmartMoveFinder.killer_moves[depth]:
+            if killer and killer not in tried:
+                move = gs.getLegalMove(killer)
+                if move is not None and move.pieceCaptured == '--' and not move.isPawnPromotion:
+                    tried.append(killer)
+                    yield move
+
+        moves, checks = gs.generateLegalMoves()
+        quiet_moves = [move for move in moves
+                       if move.pieceCaptured == '--' and not move.isPawnPromotion and move.moveID not in tried]
+        quiet_moves.sort(key=SmartMoveFinder.get_history_score, reverse=True)
+        yield from quiet_moves
+        yield from losing_captures
+
     @staticmethod
     def findMoveNegaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, turnMultiplier, rootDepth):
+        """validMoves is only given at the root, other nodes pick their moves in stages as they go"""
         global nextMove, counter, endTime
+        if counter >= nodeLimit:
+            raise TimeoutError("Node Limit")
         counter += 1
 
         # Time check
-        if counter % 2000 == 0:
-            if time.time() >= endTime:
+        if counter % TIME_CHECK_NODES == 0:
+            if out_of_time():
                 raise TimeoutError("Time Limit")
 
         # TT Probe
         board_hash = gs.current_zobrist_hash
-        tt_best_move = None
+        tt_best_move = 0
 
-        if board_hash in SmartMoveFinder.transposition_table:
-            entry = SmartMoveFinder.transposition_table[board_hash]
-            tt_best_move = entry.get('best_move')
-
-            if entry['depth'] >= depth:
-                score = entry['score']
-                flag = entry['flag']
+        entry = SmartMoveFinder.transposition_table.probe(board_hash)
+        if entry is not None:
+            tt_best_move, entry_depth, flag, score = entry
 
+            if entry_depth >= depth and validMoves is None:  # the root always searches, to set nextMove
                 if flag == SmartMoveFinder.HASH_EXACT:
                     return score
                 elif flag == SmartMoveFinder.HASH_ALPHA and score <= alpha:
@@ -336,7 +576,7 @@ class SmartMoveFinder:
 
         # Quiescence search at leaf nodes
         if depth == 0:
-            return SmartMoveFinder.quiescenceSearch(gs, alpha, beta, turnMultiplier)
+            return SmartMoveFinder.horizonSearch(gs, alpha, beta, turnMultiplier)
 
         # Checkmate/Stalemate detection
         # Extend depth to ensure we find the escape or mate.
@@ -345,24 +585,26 @@ class SmartMoveFinder:
             depth += 1
 
         # NULL MOVE PRUNING (improved)
-        # Only in non-endgame, non-check positions, at sufficient depth
-        if (depth >= 3 and
+        # Only in non-endgame, non-check positions, at sufficient depth, and never at the root, which has to set
+        # nextMove even when an aspiration window lets it fail high
+        if (validMoves is None and
+                depth >= 3 and
                 not gs.inCheck() and
                 not SmartMoveFinder.is_endgame(gs) and
-                turnMultiplier * SmartMoveFinder.scoreBoard(gs) >= beta):
+                SmartMoveFinder.static_eval_reaches(gs, beta, turnMultiplier)):
 
             # Make null move
-            gs.whiteToMove = not gs.whiteToMove
+            enPassant = gs.makeNullMove()
 
             # Adaptive reduction: deeper searches get bigger reductions
             R = 3 if depth >= 6 else 2
 
             score = -SmartMoveFinder.findMoveNegaMaxAlphaBeta(
-                gs, gs.getValidMoves(), depth - 1 - R, -beta, -beta + 1,
+                gs, None, depth - 1 - R, -beta, -beta + 1,
                 -turnMultiplier, rootDepth
             )
 
-            gs.whiteToMove = not gs.whiteToMove
+            gs.undoNullMove(enPassant)
 
             if score >= beta:
                 # Verification search for deep nodes
@@ -377,7 +619,10 @@ class SmartMoveFinder:
                     return beta
 
         # MOVE ORDERING
-        ordered_moves = SmartMoveFinder.order_moves(validMoves, tt_best_move, depth)
+        if validMoves is None:
+            ordered_moves = SmartMoveFinder.pick_moves(gs, tt_best_move, depth)
+        else:
+            ordered_moves = SmartMoveFinder.order_moves(validMoves, tt_best_move, depth)
 
         # Main search loop
         original_alpha = alpha
@@ -391,46 +636,52 @@ class SmartMoveFinder:
 
         for move in ordered_moves:
             gs.makeMove(move)
-            nextMoves = gs.getValidMoves()
 
             # Default score if something goes wrong
             score = -CHECKMATE
 
             try:
                 # LATE MOVE REDUCTIONS (LMR) Logic
-                if (moves_searched >= 4 and
-                        depth >= 3 and
-                        not in_check and
-                        move.pieceCaptured == '--' and
-                        not move.isPawnPromotion and
-                        not move.isCastleMove):
-
-                    # 1. Reduced Depth Search
-                    reduction = 1 if depth >= 6 else 0
-                    if moves_searched >= 8:
-                        reduction += 1
-
-                    # FIX 1: Use 'score =' instead of 'return'
+                lmr = (moves_searched >= 4 and
+                       depth >= 3 and
+                       not in_check and
+                       move.pieceCaptured == '--' and
+                       not move.isPawnPromotion and
+                       not move.isCastleMove)
+
+                if moves_searched == 0 or not (lmr or PVS):
+                    # Normal Full Depth Search
                     score = -SmartMoveFinder.findMoveNegaMaxAlphaBeta(
-                        gs, nextMoves, depth - 1 - reduction, -alpha - 1, -alpha,
+                        gs, None, depth - 1, -beta, -alpha,
                         -turnMultiplier, rootDepth
                     )
-
-                    # 2. Re-search if the move was too good (Fail High)
-                    if score > alpha:
-                        # FIX 2: Use 'score =' instead of 'return'
-                        score = -SmartMoveFinder.findMoveNegaMaxAlphaBeta(
-                            gs, nextMoves, depth - 1, -beta, -alpha,
-                            -turnMultiplier, rootDepth
-                        )
                 else:
-                    # Normal Full Depth Search
-                    # FIX 3: Use 'score =' instead of 'return'
+                    # 1. Scout search, reduced for late quiet moves
+                    reduction = 0
+                    if lmr:
+                        reduction = 1 if depth >= 6 else 0
+                        if moves_searched >= 8:
+                            reduction += 1
+                    window = NULL_WINDOW if PVS else 1
                     score = -SmartMoveFinder.findMoveNegaMaxAlphaBeta(
-                        gs, nextMoves, depth - 1, -beta, -alpha,
+                        gs, None, depth - 1 - reduction, -alpha - window, -alpha,
                         -turnMultiplier, rootDepth
                     )
 
+                    # 2. A reduced move that beats alpha is scouted again at full depth
+                    if PVS and reduction and score > alpha:
+                        score = -SmartMoveFinder.findMoveNegaMaxAlphaBeta(
+                            gs, None, depth - 1, -alpha - window, -alpha,
+                            -turnMultiplier, rootDepth
+                        )
+
+                    # 3. Re-search with the full window if the move was too good (Fail High)
+                    if score > alpha and (score < beta or not PVS):
+                        score = -SmartMoveFinder.findMoveNegaMaxAlphaBeta(
+                            gs, None, depth - 1, -beta, -alpha,
+                            -turnMultiplier, rootDepth
+                        )
+
             finally:
                 gs.undoMove()
                 # FIX 4: Increment move count here so it always happens
@@ -441,7 +692,7 @@ class SmartMoveFinder:
             if score > maxScore:
                 maxScore = score
                 best_move_local = move
-                if depth == rootDepth:
+                if validMoves is not None:  # the root is the only node given its moves
                     nextMove = move
 
             if maxScore > alpha:
@@ -454,6 +705,10 @@ class SmartMoveFinder:
                     SmartMoveFinder.update_history(move, depth)
                 break
 
+        # No legal moves: checkmate or stalemate
+        if moves_searched == 0:
+            return -CHECKMATE if in_check else STALEMATE
+
         # TT Store
         if maxScore <= original_alpha:
             flag = SmartMoveFinder.HASH_ALPHA
@@ -463,12 +718,8 @@ class SmartMoveFinder:
             flag = SmartMoveFinder.HASH_EXACT
 
         if abs(maxScore) < CHECKMATE - 100:
-            SmartMoveFinder.transposition_table[board_hash] = {
-                'score': maxScore,
-                'depth': depth,
-                'flag': flag,
-                'best_move': best_move_local
-            }
+            SmartMoveFinder.transposition_table.store(board_hash, depth, flag, maxScore,
+                                                      best_move_local.moveID if best_move_local else 0)
 
         return maxScore
 
@@ -486,17 +737,9 @@ class SmartMoveFinder:
             start_row = row + 1
             end_row = 8
 
-        files_to_check = []
-        if col > 0:
-            files_to_check.append(col - 1)
-        files_to_check.append(col)
-        if col < 7:
-            files_to_check.append(col + 1)
-
-        for check_row in range(start_row, end_row):
-            for check_col in files_to_check:
-                if gs.board[check_row][check_col] == enemy:
-                    return False
+        for check_row, check_col in gs.pieceSquares[enemy]:
+            if start_row <= check_row < end_row and abs(check_col - col) <= 1:
+                return False
 
         return True
 
@@ -504,10 +747,10 @@ class SmartMoveFinder:
     def passed_pawn_value(gs, row, col, color):
         if color == 'w':
             rank = 7 - row
-            rank_bonus = [0, 0.2, 0.3, 0.5, 0.8, 1.2, 2.0, 3.5][rank]
+            rank_bonus = PASSED_PAWN_BONUS[rank]
         else:
             rank = row
-            rank_bonus = [0, 0.2, 0.3, 0.5, 0.8, 1.2, 2.0, 3.5][rank]
+            rank_bonus = PASSED_PAWN_BONUS[rank]
 
         bonus = rank_bonus
 
@@ -532,34 +775,24 @@ class SmartMoveFinder:
         if supported:
             bonus *= 1.3
 
-        if SmartMoveFinder.is_endgame(gs):
-            white_king_pos = None
-            black_king_pos = None
-
-            for r in range(8):
-                for c in range(8):
-                    if gs.board[r][c] == 'wK':
-                        white_king_pos = (r, c)
-                    elif gs.board[r][c] == 'bK':
-                        black_king_pos = (r, c)
-
-            if white_king_pos and black_king_pos:
-                if color == 'w':
-                    promo_square = (0, col)
-                    friendly_king = white_king_pos
-                    enemy_king = black_king_pos
-                else:
-                    promo_square = (7, col)
-                    friendly_king = black_king_pos
-                    enemy_king = white_king_pos
+        endgame = SmartMoveFinder.is_endgame(gs)
+        if endgame:
+            if color == 'w':
+                promo_square = (0, col)
+                friendly_king = gs.whiteKingPosition
+                enemy_king = gs.blackKingPosition
+            else:
+                promo_square = (7, col)
+                friendly_king = gs.blackKingPosition
+                enemy_king = gs.whiteKingPosition
 
-                friendly_dist = max(abs(friendly_king[0] - promo_square[0]),
-                                    abs(friendly_king[1] - promo_square[1]))
-                enemy_dist = max(abs(enemy_king[0] - promo_square[0]),
-                                 abs(enemy_king[1] - promo_square[1]))
+            friendly_dist = max(abs(friendly_king[0] - promo_square[0]),
+                                abs(friendly_king[1] - promo_square[1]))
+            enemy_dist = max(abs(enemy_king[0] - promo_square[0]),
+                             abs(enemy_king[1] - promo_square[1]))
 
-                king_diff = enemy_dist - friendly_dist
-                bonus += king_diff * 0.15
+            king_diff = enemy_dist - friendly_dist
+            bonus += king_diff * 0.15
 
         if color == 'w':
             block_row = row - 1
@@ -575,7 +808,7 @@ class SmartMoveFinder:
         if SmartMoveFinder.has_connected_passer(gs, row, col, color):
             bonus *= 1.5
 
-        if SmartMoveFinder.is_endgame(gs):
+        if endgame:
             if col <= 2 or col >= 5:
                 bonus *= 1.2
 
@@ -585,47 +818,32 @@ class SmartMoveFinder:
     def has_connected_passer(cls, gs, row, col, color):
         friendly_pawn = 'wp' if color == 'w' else 'bp'
 
-        if col > 0:
-            for check_row in range(8):
-                if gs.board[check_row][col - 1] == friendly_pawn:
-                    if cls.is_passed_pawn(gs, check_row, col - 1, color):
-                        if abs(check_row - row) <= 2:
-                            return True
-
-        if col < 7:
-            for check_row in range(8):
-                if gs.board[check_row][col + 1] == friendly_pawn:
-                    if cls.is_passed_pawn(gs, check_row, col + 1, color):
-                        if abs(check_row - row) <= 2:
-                            return True
+        for check_row, check_col in gs.pieceSquares[friendly_pawn]:
+            if abs(check_col - col) == 1 and abs(check_row - row) <= 2:
+                if cls.is_passed_pawn(gs, check_row, check_col, color):
+                    return True
 
         return False
 
     @classmethod
     def is_doubled_pawn(cls, gs, row, col, color):
         friendly_pawn = 'wp' if color == 'w' else 'bp'
-        for check_row in range(8):
-            if check_row == row:
-                continue
-            if gs.board[check_row][col] == friendly_pawn:
+        for check_row, check_col in gs.pieceSquares[friendly_pawn]:
+            if check_col == col and check_row != row:
                 return True
         return False
 
     @classmethod
     def is_isolated_pawn(cls, gs, row, col, color):
         friendly_pawn = 'wp' if color == 'w' else 'bp'
-        if col > 0:
-            for check_row in range(8):
-                if gs.board[check_row][col - 1] == friendly_pawn:
-                    return False
-        if col < 7:
-            for check_row in range(8):
-                if gs.board[check_row][col + 1] == friendly_pawn:
-                    return False
+        for check_row, check_col in gs.pieceSquares[friendly_pawn]:
+            if abs(check_col - col) == 1:
+                return False
         return True
 
     @classmethod
-    def is_backward_pawn(cls, gs, row, col, color):
+    def is_backward_pawn(cls, gs, row, col, color, check_blocked=True):
+        """check_blocked=False leaves out the square in front, the only part that looks at pieces other than pawns"""
         friendly_pawn = 'wp' if color == 'w' else 'bp'
         enemy_pawn = 'bp' if color == 'w' else 'wp'
 
@@ -633,7 +851,7 @@ class SmartMoveFinder:
             target_square = row - 1
             if target_square < 0:
                 return False
-            if gs.board[target_square][col] != '--':
+            if check_blocked and gs.board[target_square][col] != '--':
                 return False
 
             can_advance_safely = True
@@ -650,7 +868,7 @@ class SmartMoveFinder:
             target_square = row + 1
             if target_square >= 8:
                 return False
-            if gs.board[target_square][col] != '--':
+            if check_blocked and gs.board[target_square][col] != '--':
                 return False
 
             can_advance_safely = True
@@ -667,53 +885,41 @@ class SmartMoveFinder:
         has_neighbors = False
         all_neighbors_ahead = True
 
-        if col > 0:
-            for check_row in range(8):
-                if gs.board[check_row][col - 1] == friendly_pawn:
-                    has_neighbors = True
-                    if color == 'w' and check_row >= row:
-                        all_neighbors_ahead = False
-                    elif color == 'b' and check_row <= row:
-                        all_neighbors_ahead = False
-
-        if col < 7:
-            for check_row in range(8):
-                if gs.board[check_row][col + 1] == friendly_pawn:
-                    has_neighbors = True
-                    if color == 'w' and check_row >= row:
-                        all_neighbors_ahead = False
-                    elif color == 'b' and check_row <= row:
-                        all_neighbors_ahead = False
+        for check_row, check_col in gs.pieceSquares[friendly_pawn]:
+            if abs(check_col - col) == 1:
+                has_neighbors = True
+                if color == 'w' and check_row >= row:
+                    all_neighbors_ahead = False
+                elif color == 'b' and check_row <= row:
+                    all_neighbors_ahead = False
 
         return has_neighbors and all_neighbors_ahead
 
     @classmethod
     def evaluate_pawn_weaknesses(cls, gs):
         penalty = 0
-        for row in range(8):
-            for col in range(8):
-                square = gs.board[row][col]
-                if square in ['wp', 'bp']:
-                    color = 'w' if square == 'wp' else 'b'
-                    pawn_penalty = 0
-
-                    is_doubled = cls.is_doubled_pawn(gs, row, col, color)
-                    is_isolated = cls.is_isolated_pawn(gs, row, col, color)
-                    is_backward = cls.is_backward_pawn(gs, row, col, color)
-
-                    if is_doubled and is_isolated:
-                        pawn_penalty = 0.6
-                    elif is_doubled:
-                        pawn_penalty = 0.3
-                    elif is_isolated:
-                        pawn_penalty = 0.35 if cls.is_endgame(gs) else 0.25
-                    elif is_backward:
-                        pawn_penalty = 0.2
-
-                    if color == 'w':
-                        penalty -= pawn_penalty
-                    else:
-                        penalty += pawn_penalty
+        for square in ('wp', 'bp'):
+            color = square[0]
+            for row, col in gs.pieceSquares[square]:
+                pawn_penalty = 0
+
+                is_doubled = cls.is_doubled_pawn(gs, row, col, color)
+                is_isolated = cls.is_isolated_pawn(gs, row, col, color)
+                is_backward = cls.is_backward_pawn(gs, row, col, color)
+
+                if is_doubled and is_isolated:
+                    pawn_penalty = DOUBLED_ISOLATED_PENALTY
+                elif is_doubled:
+                    pawn_penalty = DOUBLED_PENALTY
+                elif is_isolated:
+                    pawn_penalty = ISOLATED_PENALTY_EG if cls.is_endgame(gs) else ISOLATED_PENALTY
+                elif is_backward:
+                    pawn_penalty = BACKWARD_PENALTY
+
+                if color == 'w':
+                    penalty -= pawn_penalty
+                else:
+                    penalty += pawn_penalty
         return penalty
 
     @classmethod
@@ -727,13 +933,6 @@ class SmartMoveFinder:
         friendly_count = 0
         enemy_count = 0
 
-        files_to_check = []
-        if col > 0:
-            files_to_check.append(col - 1)
-        files_to_check.append(col)
-        if col < 7:
-            files_to_check.append(col + 1)
-
         if color == 'w':
             start_row = 0
             end_row = row + 1
@@ -741,13 +940,12 @@ class SmartMoveFinder:
             start_row = row
             end_row = 8
 
-        for check_col in files_to_check:
-            for check_row in range(start_row, end_row):
-                square = gs.board[check_row][check_col]
-                if square == friendly_pawn:
-                    friendly_count += 1
-                elif square == enemy_pawn:
-                    enemy_count += 1
+        for check_row, check_col in gs.pieceSquares[friendly_pawn]:
+            if start_row <= check_row < end_row and abs(check_col - col) <= 1:
+                friendly_count += 1
+        for check_row, check_col in gs.pieceSquares[enemy_pawn]:
+            if start_row <= check_row < end_row and abs(check_col - col) <= 1:
+                enemy_count += 1
 
         return friendly_count >= enemy_count
 
@@ -755,23 +953,16 @@ class SmartMoveFinder:
     def candidate_passed_pawn_value(cls, gs, row, col, color):
         if color == 'w':
             rank = 7 - row
-            rank_bonus = [0, 0.05, 0.1, 0.15, 0.25, 0.35, 0.4, 0][rank]
+            rank_bonus = CANDIDATE_PAWN_BONUS[rank]
         else:
             rank = row
-            rank_bonus = [0, 0.05, 0.1, 0.15, 0.25, 0.35, 0.4, 0][rank]
+            rank_bonus = CANDIDATE_PAWN_BONUS[rank]
 
         bonus = rank_bonus
 
         friendly_pawn = 'wp' if color == 'w' else 'bp'
         enemy_pawn = 'bp' if color == 'w' else 'wp'
 
-        files_to_check = []
-        if col > 0:
-            files_to_check.append(col - 1)
-        files_to_check.append(col)
-        if col < 7:
-            files_to_check.append(col + 1)
-
         if color == 'w':
             start_row = 0
             end_row = row + 1
@@ -782,13 +973,12 @@ class SmartMoveFinder:
         friendly_count = 0
         enemy_count = 0
 
-        for check_col in files_to_check:
-            for check_row in range(start_row, end_row):
-                square = gs.board[check_row][check_col]
-                if square == friendly_pawn:
-                    friendly_count += 1
-                elif square == enemy_pawn:
-                    enemy_count += 1
+        for check_row, check_col in gs.pieceSquares[friendly_pawn]:
+            if start_row <= check_row < end_row and abs(check_col - col) <= 1:
+                friendly_count += 1
+        for check_row, check_col in gs.pieceSquares[enemy_pawn]:
+            if start_row <= check_row < end_row and abs(check_col - col) <= 1:
+                enemy_count += 1
 
         pawn_advantage = friendly_count - enemy_count
         if pawn_advantage >= 2:
@@ -806,27 +996,147 @@ class SmartMoveFinder:
     @staticmethod
     def evaluate_passed_pawns(gs):
         score = 0
-        for row in range(8):
-            for col in range(8):
-                square = gs.board[row][col]
-                if square == 'wp':
-                    if SmartMoveFinder.is_passed_pawn(gs, row, col, 'w'):
-                        bonus = SmartMoveFinder.passed_pawn_value(gs, row, col, 'w')
-                        score += bonus
-                    elif SmartMoveFinder.is_candidate_passed_pawn(gs, row, col, 'w'):
-                        bonus = SmartMoveFinder.candidate_passed_pawn_value(gs, row, col, 'w')
-                        score += bonus
-                elif square == 'bp':
-                    if SmartMoveFinder.is_passed_pawn(gs, row, col, 'b'):
-                        bonus = SmartMoveFinder.passed_pawn_value(gs, row, col, 'b')
-                        score -= bonus
-                    elif SmartMoveFinder.is_candidate_passed_pawn(gs, row, col, 'b'):
-                        bonus = SmartMoveFinder.candidate_passed_pawn_value(gs, row, col, 'b')
-                        score -= bonus
+        for row, col in gs.pieceSquares['wp']:
+            if SmartMoveFinder.is_passed_pawn(gs, row, col, 'w'):
+                bonus = SmartMoveFinder.passed_pawn_value(gs, row, col, 'w')
+                score += bonus
+            elif SmartMoveFinder.is_candidate_passed_pawn(gs, row, col, 'w'):
+                bonus = SmartMoveFinder.candidate_passed_pawn_value(gs, row, col, 'w')
+                score += bonus
+        for row, col in gs.pieceSquares['bp']:
+            if SmartMoveFinder.is_passed_pawn(gs, row, col, 'b'):
+                bonus = SmartMoveFinder.passed_pawn_value(gs, row, col, 'b')
+                score -= bonus
+            elif SmartMoveFinder.is_candidate_passed_pawn(gs, row, col, 'b'):
+                bonus = SmartMoveFinder.candidate_passed_pawn_value(gs, row, col, 'b')
+                score -= bonus
         return score
 
     @staticmethod
-    def scoreBoard(gs):
+    def pawn_structure_entry(gs):
+        """
+        The parts of evaluate_passed_pawns and evaluate_pawn_weaknesses that only depend on the pawns:
+        (fixed score, isolated pawn count with black positive, backward pawns, passed pawns).
+        Backward pawns still need an empty square in front, passed pawns keep (row, col, color, bonus so far, connected)
+        for the king, blocker and endgame adjustments.
+        Works on pawn bitmasks, every test is the same as the matching is_*_pawn helper.
+        """
+        pawns = {'w': 0, 'b': 0}
+        for color in pawns:
+            for row, col in gs.pieceSquares[color + 'p']:
+                pawns[color] |= 1 << (row * 8 + col)
+
+        fixed = 0
+        isolated = 0
+        backward = []
+        passers = []
+        for color, enemy_color, sign in (('w', 'b', 1), ('b', 'w', -1)):
+            friendly = pawns[color]
+            enemies = pawns[enemy_color]
+            passed_masks = PASSED_PAWN_MASKS[color]
+            for row, col in gs.pieceSquares[color + 'p']:
+                sq = row * 8 + col
+                is_doubled = friendly & FILE_MASKS[col] & ~(1 << sq) != 0
+                is_isolated = friendly & ADJACENT_FILE_MASKS[col] == 0
+                if is_doubled and is_isolated:
+                    fixed -= sign * DOUBLED_ISOLATED_PENALTY
+                elif is_doubled:
+                    fixed -= sign * DOUBLED_PENALTY
+                elif is_isolated:
+                    isolated -= sign
+                elif 0 <= row - sign < 8:
+                    # backward: the square in front is covered by an enemy pawn and every neighbour is further up
+                    if (enemies & PAWN_ATTACKS[color][sq - sign * 8] and
+                            friendly & BACKWARD_SUPPORT_MASKS[color][sq] == 0):
+                        backward.append((row - sign, col, sign))
+
+                if enemies & passed_masks[sq] == 0:
+                    rank = 7 - row if color == 'w' else row
+                    bonus = PASSED_PAWN_BONUS[rank]
+                    if friendly & PAWN_ATTACKS[enemy_color][sq]:  # defended by a pawn
+                        bonus *= 1.3
+                    connected = False
+                    neighbours = friendly & CONNECTED_MASKS[sq]
+                    while neighbours:
+                        low = neighbours & -neighbours
+                        if enemies & passed_masks[low.bit_length() - 1] == 0:
+                            connected = True
+                            break
+                        neighbours ^= low
+                    passers.append((row, col, color, bonus, connected))
+                else:
+                    span = FORWARD_SPAN_MASKS[color][sq]
+                    pawn_advantage = (friendly & span).bit_count() - (enemies & span).bit_count()
+                    if pawn_advantage >= 0:  # candidate passed pawn
+                        rank = 7 - row if color == 'w' else row
+                        bonus = CANDIDATE_PAWN_BONUS[rank]
+                        if pawn_advantage >= 2:
+                            bonus *= 1.5
+                        elif pawn_advantage == 1:
+                            bonus *= 1.2
+                        if (color == 'w' and row <= 2) or (color == 'b' and row >= 5):
+                            bonus *= 1.3
+                        fixed += sign * bonus
+        return fixed, isolated, backward, passers
+
+    @classmethod
+    def evaluate_pawns(cls, gs):
+        """evaluate_passed_pawns + evaluate_pawn_weaknesses, with the pawn-only parts from the pawn hash table"""
+        entry = cls.pawn_table.probe(gs.pawn_zobrist_hash)
+        if entry is None:
+            entry = cls.pawn_structure_entry(gs)
+            cls.pawn_table.store(gs.pawn_zobrist_hash, entry)
+        fixed, isolated, backward, passers = entry
+
+        endgame = cls.is_endgame(gs)
+        score = fixed + isolated * (ISOLATED_PENALTY_EG if endgame else ISOLATED_PENALTY)
+        for front_row, col, sign in backward:
+            if gs.board[front_row][col] == '--':
+                score -= sign * BACKWARD_PENALTY
+
+        for row, col, color, bonus, connected in passers:
+            # same steps, in the same order, as passed_pawn_value
+            if endgame:
+                if color == 'w':
+                    promo_square = (0, col)
+                    friendly_king = gs.whiteKingPosition
+                    enemy_king = gs.blackKingPosition
+                else:
+                    promo_square = (7, col)
+                    friendly_king = gs.blackKingPosition
+                    enemy_king = gs.whiteKingPosition
+
+                friendly_dist = max(abs(friendly_king[0] - promo_square[0]),
+                                    abs(friendly_king[1] - promo_square[1]))
+                enemy_dist = max(abs(enemy_king[0] - promo_square[0]),
+                                 abs(enemy_king[1] - promo_square[1]))
+                bonus += (enemy_dist - friendly_dist) * 0.15
+
+            block_row = row - 1 if color == 'w' else row + 1
+            if 0 <= block_row < 8 and gs.board[block_row][col][0] == ('b' if color == 'w' else 'w'):
+                bonus *= 0.6
+
+            if connected:
+                bonus *= 1.5
+
+            if endgame and (col <= 2 or col >= 5):
+                bonus *= 1.2
+
+            score += bonus if color == 'w' else -bonus
+        return score
+
+    @staticmethod
+    def tapered_material(gs):
+        """Material + position, blending the middlegame and endgame sums by how much material is left"""
+        phase = min(gs.phase, TOTAL_PHASE)  # promotions can push it past the starting material
+        return (gs.evalMg * phase + gs.evalEg * (TOTAL_PHASE - phase)) / (100 * TOTAL_PHASE)
+
+    @staticmethod
+    def scoreBoard(gs, lower=-CHECKMATE, upper=CHECKMATE):
+        """
+        Score from white's point of view. lower/upper is the search window, also from white's point of view:
+        once the score is clearly outside it, the exact value no longer matters and the pawn terms are skipped.
+        """
         if gs.checkMate:
             if gs.whiteToMove:
                 return -CHECKMATE
@@ -835,39 +1145,24 @@ class SmartMoveFinder:
         elif gs.staleMate:
             return STALEMATE
 
+        if DEBUG_EVAL:
+            assert (gs.evalMg, gs.evalEg) == gs.computeEvalSums(), "incremental evaluation out of sync"
+            assert (gs.pieceCount, gs.phase) == gs.computeMaterialCounters(), "piece counters out of sync"
+
+        cached = SmartMoveFinder.eval_cache.probe(gs.current_zobrist_hash)
+        if cached is not None:
+            return cached
+
         score = 0
 
+        endgame = gs.pieceCount <= 6  # is_endgame
+
         # Tempo bonus only in middlegame
-        if not SmartMoveFinder.is_endgame(gs):
+        if not endgame:
             score += 0.12 if gs.whiteToMove else -0.12
 
-        # Material + Position
-        for row in range(len(gs.board)):
-            for col in range(len(gs.board[row])):
-                square = gs.board[row][col]
-                if square != "--":
-                    piece_type = square[1]
-                    piece_color = square[0]
-
-                    if piece_type == 'K':
-                        pos_table = kingScores_eg if SmartMoveFinder.is_endgame(gs) else piecePositionScores["K"]
-                    else:
-                        pos_table = piecePositionScores.get(square if piece_type == 'p' else piece_type, [])
-
-                    if piece_type == 'p':
-                        position_score = pos_table[row][col]
-                    else:
-                        if piece_color == 'w':
-                            position_score = pos_table[7 - row][col]
-                        else:
-                            position_score = pos_table[row][col]
-
-                    material_score = pieceScore[piece_type]
-
-                    if piece_color == 'w':
-                        score += material_score + (position_score * 0.1)
-                    elif piece_color == 'b':
-                        score -= (material_score + (position_score * 0.1))
+        # Material + Position, kept up to date by makeMove/undoMove
+        score += SmartMoveFinder.tapered_material(gs)
 
         # Castling evaluation
         if gs.board[7][6] == 'wK' and gs.board[7][5] == 'wR':
@@ -886,10 +1181,15 @@ class SmartMoveFinder:
             if not gs.currentCastlingRights.bks and not gs.currentCastlingRights.bqs:
                 score += 0.35
 
-        # Passed pawns
-        score += SmartMoveFinder.evaluate_passed_pawns(gs)
+        if LAZY_EVAL and (score - LAZY_MARGIN >= upper or score + LAZY_MARGIN <= lower):
+            return score
+
+        # Passed pawns and pawn weaknesses, held within the lazy margin
+        score += min(max(SmartMoveFinder.evaluate_pawns(gs), -PAWN_TERMS_LIMIT), PAWN_TERMS_LIMIT)
+
+        SmartMoveFinder.eval_cache.store(gs.current_zobrist_hash, score)
+        return score
 
-        # Pawn weaknesses
-        score += SmartMoveFinder.evaluate_pawn_weaknesses(gs)
 
-        return score
\ No newline at end of file
+if os.path.exists(EVAL_PARAMS_FILE):
+    load_eval_params(EVAL_PARAMS_FILE)
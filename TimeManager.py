@@ -0,0 +1,70 @@
+### Time management for the UCI go command: how long to think about one move given the limits it was sent
+
+import time
+
+MOVE_OVERHEAD = 0.05  # seconds kept back on every move for the GUI and the pipe
+MOVES_TO_GO = 30  # moves the remaining clock is shared over when the GUI does not say (sudden death)
+HARD_FACTOR = 3  # the hard limit, in soft limits
+MAX_CLOCK_SHARE = 0.8  # never more of the remaining clock than this on one move
+STABLE_SAVING = 0.1  # soft limit saved for every depth the best move held, up to STABLE_DEPTHS of them
+STABLE_DEPTHS = 5
+
+
+class TimeManager:
+    """
+    Limits for one search, from the go arguments with the times in milliseconds as UCI sends them.
+    Iterative deepening starts no new depth past the soft limit, which shrinks while the best move stays the same,
+    and the search stops wherever it is at the hard limit. depth and nodes are passed on to the search as they are.
+    movetime is a hard limit only, so the whole of it is used. While pondering there is no limit; ponderhit()
+    then shares out the clock from that moment. thinkTime (seconds) is used when go sets no limit at all.
+    """
+
+    def __init__(self, whiteToMove, wtime=None, btime=None, winc=0, binc=0, movestogo=None, movetime=None,
+                 depth=None, nodes=None, infinite=False, thinkTime=5.0, ponder=False):
+        self.depth = depth
+        self.nodes = nodes
+        self.infinite = infinite
+        self.pondering = ponder
+        self.clock = wtime if whiteToMove else btime
+        self.increment = winc if whiteToMove else binc
+        self.movestogo = movestogo
+        self.movetime = movetime
+        self.thinkTime = thinkTime
+        self.bestMove = None
+        self.stableDepths = 0
+        self.allocate()
+
+    def allocate(self):
+        """Soft and hard limits counted from now"""
+        self.start = time.time()
+        if self.infinite or self.pondering:
+            self.soft = self.hard = float("inf")
+        elif self.movetime is not None:
+            self.soft = float("inf")
+            self.hard = max(self.movetime / 1000 - MOVE_OVERHEAD, 0.0)
+        elif self.clock is not None:
+            available = max(self.clock / 1000 - MOVE_OVERHEAD, 0.0)
+            base = available / max(self.movestogo or MOVES_TO_GO, 1) + 0.75 * self.increment / 1000
+            self.soft = min(base, MAX_CLOCK_SHARE * available)
+            self.hard = min(HARD_FACTOR * base, MAX_CLOCK_SHARE * available)
+        elif self.depth is not None or self.nodes is not None:
+            self.soft = self.hard = float("inf")
+        else:
+            self.soft = self.hard = self.thinkTime
+        self.hardDeadline = self.start + self.hard
+
+    def ponderhit(self):
+        """The pondered move was played: from now on the search runs on the clock it was given"""
+        self.pondering = False
+        self.allocate()
+
+    def stop_early(self, bestMove):
+        """Called after every finished depth: True when there is no time for another"""
+        if bestMove == self.bestMove:
+            self.stableDepths += 1
+        else:
+            self.bestMove = bestMove
+            self.stableDepths = 0
+        # a best move that has held for a few depths is unlikely to change, so it gets less time
+        soft = self.soft * (1.0 - STABLE_SAVING * min(self.stableDepths, STABLE_DEPTHS))
+        return time.time() - self.start >= soft
@@ -0,0 +1,261 @@
+### Texel tuning of the piece-square values and pawn structure terms against game results.
+###
+###     python Tuner.py positions.epd [--output eval_params.json] [--epochs 200] [--workers 4]
+###
+### Every line of the input holds a position and the result of the game it came from, either as an EPD
+### c9 "1-0" opcode or as a trailing [1.0] / [0.5] / [0.0], always from white's point of view.
+### The file is read in chunks and a process pool turns every chunk into a shard of .npy files in a work directory.
+### The evaluation is linear in the tuned values, so a shard only keeps the packed pieces, the phase, the untuned
+### part of the score and the pawn terms. Every epoch the pool sums the error gradient over the shards and the main
+### process takes an Adam step. SmartMoveFinder loads the result from eval_params.json at startup.
+
+import argparse
+import itertools
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import BatchEval
+import SmartMoveFinder
+
+PIECE_TYPES = "pNBRQK"
+PAWN_OFFSET = 2 * 6 * 64  # mg and eg tables come first
+PARAM_COUNT = PAWN_OFFSET + 8 + 8 + len(BatchEval.WEAKNESSES)
+PASSED_OFFSET = PAWN_OFFSET
+CANDIDATE_OFFSET = PAWN_OFFSET + 8
+WEAKNESS_OFFSET = PAWN_OFFSET + 16
+CHUNK_SIZE = 100000
+RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+RESULT_PATTERN = re.compile(r'"(1-0|0-1|1/2-1/2)"|\[([01](?:\.\d+)?)\]')
+SHARD_ARRAYS = ("pieces", "phase", "result", "fixed", "pawnRow", "pawnCol", "pawnValue")
+
+
+def parse_line(line):
+    """(fen, result) from one line of the input, None for a line without a result"""
+    match = RESULT_PATTERN.search(line)
+    if match is None:
+        return None
+    result = RESULTS[match.group(1)] if match.group(1) else float(match.group(2))
+    return " ".join(line.split()[:4]), result
+
+
+def read_positions(path):
+    """Stream (fen, result) pairs from the input file"""
+    with open(path) as f:
+        for line in f:
+            position = parse_line(line)
+            if position is not None:
+                yield position
+
+
+def initial_params():
+    """SmartMoveFinder's current values as one vector, laid out the way shards index them"""
+    params = np.zeros(PARAM_COUNT)
+    for t, pieceType in enumerate(PIECE_TYPES):
+        params[t * 64:(t + 1) * 64] = SmartMoveFinder.PIECE_SQUARE_MG['w' + pieceType]
+        params[(6 + t) * 64:(7 + t) * 64] = SmartMoveFinder.PIECE_SQUARE_EG['w' + pieceType]
+    params[PASSED_OFFSET:PASSED_OFFSET + 8] = SmartMoveFinder.PASSED_PAWN_BONUS
+    params[CANDIDATE_OFFSET:CANDIDATE_OFFSET + 8] = SmartMoveFinder.CANDIDATE_PAWN_BONUS
+    params[WEAKNESS_OFFSET:] = [getattr(SmartMoveFinder, name) for name in BatchEval.WEAKNESSES]
+    return params
+
+
+def params_to_json(params):
+    """The eval_params.json layout of a parameter vector (see SmartMoveFinder.eval_params)"""
+    out = {"pieceSquareMg": {}, "pieceSquareEg": {}}
+    for t, pieceType in enumerate(PIECE_TYPES):
+        out["pieceSquareMg"][pieceType] = [int(round(v)) for v in params[t * 64:(t + 1) * 64]]
+        out["pieceSquareEg"][pieceType] = [int(round(v)) for v in params[(6 + t) * 64:(7 + t) * 64]]
+    out["PASSED_PAWN_BONUS"] = [round(float(v), 4) for v in params[PASSED_OFFSET:PASSED_OFFSET + 8]]
+    out["CANDIDATE_PAWN_BONUS"] = [round(float(v), 4) for v in params[CANDIDATE_OFFSET:CANDIDATE_OFFSET + 8]]
+    for i, name in enumerate(BatchEval.WEAKNESSES):
+        out[name] = round(float(params[WEAKNESS_OFFSET + i]), 4)
+    return out
+
+
+def piece_square_tables(params, offset):
+    """[piece index, square] table for BatchEval.material from the white tables at params[offset:], black mirrored"""
+    white = params[offset:offset + 6 * 64].reshape(6, 64)
+    table = np.zeros((BatchEval.EMPTY + 1, 64))
+    table[:6] = white
+    table[6:12] = -white[:, BatchEval.SQUARES ^ 56]
+    return table
+
+
+def build_shard(positions, prefix):
+    """Features of a list of (fen, result) pairs, saved as prefix-<name>.npy. Returns (prefix, position count)."""
+    fens = [fen for fen, result in positions]
+    pieces, phase, endgame, kings, fixed = BatchEval.position_terms(BatchEval.pack_fens(fens))
+    n, sign, weakness, rank, passed, passedScale, passedExtra, candidateScale = \
+        BatchEval.pawn_terms(pieces, endgame, kings)
+    fixed = fixed + np.bincount(n, weights=np.where(passed, sign * passedExtra, 0.0), minlength=len(fens))
+
+    # one (position, parameter, coefficient) entry per rank bonus and per weakness
+    isCandidate = ~passed & (candidateScale != 0)
+    isWeak = weakness >= 0
+    arrays = {
+        "pieces": pieces,
+        "phase": phase.astype(np.int8),
+        "result": np.array([result for fen, result in positions], dtype=np.float32),
+        "fixed": fixed,
+        "pawnRow": np.concatenate([n[passed], n[isCandidate], n[isWeak]]).astype(np.int32),
+        "pawnCol": np.concatenate([PASSED_OFFSET + rank[passed], CANDIDATE_OFFSET + rank[isCandidate],
+                                   WEAKNESS_OFFSET + weakness[isWeak]]).astype(np.int16),
+        "pawnValue": np.concatenate([sign[passed] * passedScale[passed], sign[isCandidate] * candidateScale[isCandidate],
+                                     -sign[isWeak]]).astype(np.float64),
+    }
+    for name, array in arrays.items():
+        np.save("%s-%s.npy" % (prefix, name), array)
+    return prefix, len(fens)
+
+
+def load_shard(prefix):
+    return {name: np.load("%s-%s.npy" % (prefix, name), mmap_mode='r') for name in SHARD_ARRAYS}
+
+
+def pawn_sums(shard, params):
+    """The pawn terms of every position of a shard, before scoreBoard holds them within PAWN_TERMS_LIMIT"""
+    return np.bincount(shard["pawnRow"], weights=shard["pawnValue"] * params[shard["pawnCol"]],
+                       minlength=len(shard["phase"]))
+
+
+def predict(shard, params):
+    """Evaluation of every position of a shard with the given parameters, the same as BatchEval.evaluate"""
+    pieces = np.asarray(shard["pieces"])
+    phase = np.asarray(shard["phase"], dtype=np.float64)
+    score = shard["fixed"] + BatchEval.material(pieces, phase, piece_square_tables(params, 0),
+                                                piece_square_tables(params, 6 * 64))
+    limit = SmartMoveFinder.PAWN_TERMS_LIMIT
+    return score + np.clip(pawn_sums(shard, params), -limit, limit)
+
+
+def sigmoid(score, k):
+    """Expected result from white's point of view for a score in pawns"""
+    return 1.0 / (1.0 + 10.0 ** (-k * score / 4.0))
+
+
+def shard_errors(prefix, params, ks):
+    """Sum of squared errors of one shard for every scaling constant in ks"""
+    shard = load_shard(prefix)
+    score = predict(shard, params)
+    return np.array([((shard["result"] - sigmoid(score, k)) ** 2).sum() for k in ks])
+
+
+def shard_gradient(prefix, params, k):
+    """(sum of squared errors, gradient of that sum over params) for one shard"""
+    shard = load_shard(prefix)
+    pieces = np.asarray(shard["pieces"])
+    phase = np.asarray(shard["phase"], dtype=np.float64)
+    expected = sigmoid(predict(shard, params), k)
+    error = shard["result"] - expected
+    slope = -2.0 * error * expected * (1.0 - expected) * np.log(10.0) * k / 4.0  # d error / d score
+
+    gradient = np.zeros(PARAM_COUNT)
+    cells = (pieces.astype(np.intp) * 64 + BatchEval.SQUARES).ravel()
+    for offset, weight in ((0, phase), (6 * 64, BatchEval.TOTAL_PHASE - phase)):
+        table = np.bincount(cells, weights=np.repeat(slope * weight / (100 * BatchEval.TOTAL_PHASE), 64),
+                            minlength=(BatchEval.EMPTY + 1) * 64).reshape(BatchEval.EMPTY + 1, 64)
+        gradient[offset:offset + 6 * 64] = (table[:6] - table[6:12][:, BatchEval.SQUARES ^ 56]).ravel()
+    # the pawn values only move the score of positions whose pawn terms are inside the limit
+    pawnSlope = np.where(np.abs(pawn_sums(shard, params)) < SmartMoveFinder.PAWN_TERMS_LIMIT, slope, 0.0)
+    gradient += np.bincount(shard["pawnCol"], weights=shard["pawnValue"] * pawnSlope[shard["pawnRow"]],
+                            minlength=PARAM_COUNT)
+    return (error ** 2).sum(), gradient
+
+
+def build_shards(path, workdir, pool, workers):
+    """Read the input in chunks and build one shard per chunk in the pool. Returns (shard prefixes, positions)."""
+    positions = read_positions(path)
+    pending = []
+    shards = []
+    total = 0
+    for index in itertools.count():
+        chunk = list(itertools.islice(positions, CHUNK_SIZE))
+        if not chunk:
+            break
+        pending.append(pool.submit(build_shard, chunk, os.path.join(workdir, "shard%05d" % index)))
+        while len(pending) >= 2 * workers:  # keep the chunks in flight bounded
+            prefix, count = pending.pop(0).result()
+            shards.append(prefix)
+            total += count
+    for future in pending:
+        prefix, count = future.result()
+        shards.append(prefix)
+        total += count
+    return shards, total
+
+
+def fit_k(shards, params, total, pool):
+    """The sigmoid scaling constant that best fits the starting parameters"""
+    ks = np.arange(0.05, 3.0, 0.05)
+    for _ in range(2):
+        errors = sum(pool.map(shard_errors, shards, itertools.repeat(params), itertools.repeat(ks)))
+        best = ks[int(np.argmin(errors))]
+        ks = np.linspace(max(best - 0.05, 0.01), best + 0.05, 21)
+    errors = sum(pool.map(shard_errors, shards, itertools.repeat(params), itertools.repeat(ks)))
+    return float(ks[int(np.argmin(errors))]), float(errors.min()) / total
+
+
+def tune(path, output=SmartMoveFinder.EVAL_PARAMS_FILE, epochs=200, workers=None, workdir=None, log=sys.stdout):
+    """Fit the evaluation to the results in path and write eval_params.json. Returns (error before, error after)."""
+    workers = workers or os.cpu_count()
+    ownWorkdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="tuner")
+    # step sizes: piece-square values are in hundredths of a pawn, pawn terms in pawns
+    rate = np.where(np.arange(PARAM_COUNT) < PAWN_OFFSET, 1.0, 0.01)
+    params = initial_params()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            start = time.perf_counter()
+            shards, total = build_shards(path, workdir, pool, workers)
+            k, startError = fit_k(shards, params, total, pool)
+            print("%d positions in %d shards, %.1fs, K %.2f, error %.6f"
+                  % (total, len(shards), time.perf_counter() - start, k, startError), file=log)
+
+            # Adam over the full data set
+            moment = np.zeros(PARAM_COUNT)
+            velocity = np.zeros(PARAM_COUNT)
+            error = startError
+            for epoch in range(1, epochs + 1):
+                error = gradient = 0
+                for shardError, shardGradient in pool.map(shard_gradient, shards, itertools.repeat(params),
+                                                          itertools.repeat(k)):
+                    error += shardError
+                    gradient = gradient + shardGradient
+                error /= total
+                gradient /= total
+                moment = 0.9 * moment + 0.1 * gradient
+                velocity = 0.999 * velocity + 0.001 * gradient ** 2
+                step = (moment / (1 - 0.9 ** epoch)) / (np.sqrt(velocity / (1 - 0.999 ** epoch)) + 1e-12)
+                params -= rate * step
+                if epoch % 10 == 0 or epoch == epochs:
+                    print("epoch %d error %.6f %.1fs" % (epoch, error, time.perf_counter() - start), file=log)
+    finally:
+        if ownWorkdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(output, "w") as f:
+        json.dump(params_to_json(params), f, indent=1)
+    return startError, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Texel tuning of the evaluation against game results")
+    parser.add_argument("positions", help="EPD or labelled position file")
+    parser.add_argument("--output", default=SmartMoveFinder.EVAL_PARAMS_FILE)
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--workdir", default=None, help="keep the shards here instead of a temporary directory")
+    args = parser.parse_args()
+    tune(args.positions, args.output, args.epochs, args.workers, args.workdir)
+
+
+if __name__ == "__main__":
+    main()
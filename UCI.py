@@ -1,12 +1,30 @@
+import os
 import sys
 import threading
+import time
+import SmartMoveFinder as search
 from ChessEngine import GameState, Move
+from BitboardEngine import BitboardGameState
 from SmartMoveFinder import SmartMoveFinder
+from HashTables import EvalCache, TranspositionTable
+from LazySMP import LazySMP
+from RootSplit import RootSplit
+from TimeManager import TimeManager
+
+# Board backends selectable with "setoption name Backend value ...". Mailbox is the faster one, see BitboardEngine.
+BACKENDS = {"mailbox": GameState, "bitboard": BitboardGameState}
 
 # Global engine state
 gs = GameState()
+hash_file = None  # transposition table file, loaded when set and saved on quit
 search_thread = None
-stop_search = False
+stop_event = threading.Event()  # "stop": ends the search, which then answers with its best move so far
+search.stop_event = stop_event
+release = threading.Event()  # "stop" or "ponderhit": an infinite or ponder search may answer once it is done
+time_manager = None  # the TimeManager of the last go, which ponderhit puts on the clock
+threads = 1
+root_split = False  # RootSplit option: Threads > 1 splits the root moves over a process pool instead of Lazy SMP
+smp = None  # the Lazy SMP helpers or the root split pool while Threads > 1
 
 
 # -----------------------------
@@ -30,7 +48,7 @@ def parse_uci_move(gs, uci):
     start_row = Move.ranksToRows[uci[1]]
     end_col = Move.filesToCols[uci[2]]
     end_row = Move.ranksToRows[uci[3]]
-    promo = uci[4].upper() if len(uci) == 5 else None
+    promo = uci[4].upper() if len(uci) == 5 else 'Q'
 
     for move in gs.getValidMoves():
         if (move.startRow == start_row and
@@ -38,59 +56,12 @@ def parse_uci_move(gs, uci):
             move.endRow == end_row and
             move.endCol == end_col):
 
-            if move.isPawnPromotion and promo:
-                move.promotedPiece = promo
+            if move.isPawnPromotion and move.promotedPiece != promo:
+                continue
             return move
     return None
 
 
-# -----------------------------
-# FEN Loader
-# -----------------------------
-
-def load_fen(gs, fen):
-    parts = fen.split()
-    board_part, turn, castling, ep = parts[:4]
-
-    gs.board = [["--"] * 8 for _ in range(8)]
-    rows = board_part.split("/")
-
-    for r in range(8):
-        c = 0
-        for ch in rows[r]:
-            if ch.isdigit():
-                c += int(ch)
-            else:
-                color = 'w' if ch.isupper() else 'b'
-                piece = ch.upper()
-                if piece == 'P':
-                    piece = 'p'
-                gs.board[r][c] = color + piece
-                if piece == 'K':
-                    if color == 'w':
-                        gs.whiteKingPosition = (r, c)
-                    else:
-                        gs.blackKingPosition = (r, c)
-                c += 1
-
-    gs.whiteToMove = (turn == 'w')
-
-    gs.currentCastlingRights.wks = 'K' in castling
-    gs.currentCastlingRights.wqs = 'Q' in castling
-    gs.currentCastlingRights.bks = 'k' in castling
-    gs.currentCastlingRights.bqs = 'q' in castling
-
-    gs.enPassantPossible = ()
-    if ep != '-':
-        col = Move.filesToCols[ep[0]]
-        row = Move.ranksToRows[ep[1]]
-        gs.enPassantPossible = (row, col)
-
-    gs.moveLog = []
-    gs.current_zobrist_hash = gs.generate_initial_hash()
-    gs.zobrist_log = [gs.current_zobrist_hash]
-
-
 # -----------------------------
 # UCI Command Handlers
 # -----------------------------
@@ -103,7 +74,7 @@ def handle_position(cmd):
         idx = 2
     else:
         fen = " ".join(tokens[2:8])
-        load_fen(gs, fen)
+        gs.load_fen(fen)
         idx = 8
 
     if idx < len(tokens) and tokens[idx] == "moves":
@@ -113,36 +84,170 @@ def handle_position(cmd):
                 gs.makeMove(move)
 
 
-def search_and_play():
-    global stop_search
+def stop_helpers():
+    # Lazy SMP puts a private transposition table back, with everything the shared one learned
+    global smp
+    if smp is not None:
+        smp.close()
+        smp = None
+
+
+def start_helpers():
+    # the helpers hold the table and the backend they were started with, so they follow every change to either
+    global smp
+    stop_helpers()
+    if threads > 1:
+        smp = RootSplit(threads, type(gs)) if root_split else LazySMP(threads, type(gs))
+
+
+def handle_setoption(cmd):
+    global gs, hash_file, threads, root_split
+    # setoption name <id> [value <x>]
+    tokens = cmd.split()
+    if "name" not in tokens:
+        return
+    name_idx = tokens.index("name") + 1
+    value_idx = tokens.index("value") if "value" in tokens else len(tokens)
+    name = " ".join(tokens[name_idx:value_idx]).lower()
+    value = " ".join(tokens[value_idx + 1:])
+
+    if name == "backend" and value.lower() in BACKENDS:
+        gs = BACKENDS[value.lower()]()
+        start_helpers()
+    elif name == "evalcache" and value.isdigit():
+        SmartMoveFinder.eval_cache = EvalCache(int(value))
+    elif name == "threads" and value.isdigit():
+        threads = max(1, int(value))
+        start_helpers()
+    elif name == "rootsplit" and value.lower() in ("true", "false"):
+        root_split = value.lower() == "true"
+        start_helpers()
+    elif name == "hash" and value.isdigit():
+        stop_helpers()
+        SmartMoveFinder.transposition_table.resize(max(1, int(value)))
+        start_helpers()
+    elif name == "hashfile":
+        hash_file = value if value and value != "<empty>" else None
+        if hash_file and os.path.exists(hash_file):
+            try:
+                table = TranspositionTable.load(hash_file)
+            except ValueError as error:
+                print(f"info string {error}")
+                sys.stdout.flush()
+            else:
+                stop_helpers()
+                SmartMoveFinder.transposition_table = table
+                start_helpers()
+
+
+def handle_savehash(cmd):
+    # savehash [path]: write the transposition table, to the HashFile option when no path is given
+    tokens = cmd.split(maxsplit=1)
+    path = tokens[1] if len(tokens) > 1 else hash_file
+    if path:
+        SmartMoveFinder.transposition_table.save(path)
+
+
+def handle_perft(cmd):
+    # perft <depth> or go perft <depth>: nodes per root move, then the total and the speed
+    tokens = cmd.split()
+    depth = int(tokens[tokens.index("perft") + 1])
+    start = time.perf_counter()
+    total = 0
+    for move, nodes in gs.divide(depth):
+        print(f"{move_to_uci(move)}: {nodes}")
+        total += nodes
+    elapsed = time.perf_counter() - start
+    print()
+    print(f"Nodes searched: {total}")
+    print(f"Time: {elapsed * 1000:.0f} ms")
+    print(f"Nodes/second: {total / elapsed if elapsed > 0 else 0:.0f}")
+    sys.stdout.flush()
+
+
+# go arguments: the ones followed by a number, the flags, and searchmoves followed by moves up to the end
+GO_NUMBERS = ("wtime", "btime", "winc", "binc", "movestogo", "movetime", "depth", "nodes", "mate")
+GO_FLAGS = ("infinite", "ponder")
+
+
+def parse_go(cmd):
+    # go [wtime <ms>] [btime <ms>] ... [infinite] [ponder] [searchmoves <move> ...] -> {argument: value}
+    tokens = cmd.split()[1:]
+    limits = {}
+    idx = 0
+    while idx < len(tokens):
+        token = tokens[idx]
+        if token in GO_NUMBERS and idx + 1 < len(tokens):
+            try:
+                limits[token] = int(tokens[idx + 1])
+            except ValueError:
+                pass
+            idx += 2
+        elif token in GO_FLAGS:
+            limits[token] = True
+            idx += 1
+        elif token == "searchmoves":
+            limits[token] = tokens[idx + 1:]
+            break
+        else:
+            idx += 1
+    return limits
+
 
+def search_and_play(limits, time_manager):
+    started = time.time()
     valid_moves = gs.getValidMoves()
+    if "searchmoves" in limits:
+        allowed = set(limits["searchmoves"])
+        valid_moves = [move for move in valid_moves if move_to_uci(move) in allowed] or valid_moves
     if not valid_moves:
         print("bestmove 0000")
         sys.stdout.flush()
         return
 
-    best_move = SmartMoveFinder.findBestMove(gs, valid_moves)
+    best_move = (smp or SmartMoveFinder).findBestMove(gs, valid_moves, timeManager=time_manager)
+    nodes = smp.nodes if smp else search.counter
 
-    if stop_search:
-        return
+    # infinite and ponder searches answer only once they are told to stop, or the pondered move is played
+    if "infinite" in limits or time_manager.pondering:
+        release.wait()
 
-    uci = move_to_uci(best_move)
-    print(f"bestmove {uci}")
+    elapsed = time.time() - started
+    print(f"info nodes {nodes} time {elapsed * 1000:.0f} nps {nodes / elapsed if elapsed > 0 else 0:.0f} "
+          f"hashfull {SmartMoveFinder.transposition_table.hashfull()}")
+    print(f"bestmove {move_to_uci(best_move)}")
     sys.stdout.flush()
 
 
-def handle_go():
-    global search_thread, stop_search
-    stop_search = False
+def handle_go(cmd):
+    global search_thread, time_manager
+    handle_stop()
+    stop_event.clear()
+    release.clear()
 
-    search_thread = threading.Thread(target=search_and_play)
+    limits = parse_go(cmd)
+    # mate <n> is searched as n moves deep, which is where a mate in n shows up
+    depth = limits.get("depth", 2 * limits["mate"] - 1 if "mate" in limits else None)
+    time_manager = TimeManager(gs.whiteToMove, limits.get("wtime"), limits.get("btime"), limits.get("winc", 0),
+                               limits.get("binc", 0), limits.get("movestogo"), limits.get("movetime"), depth,
+                               limits.get("nodes"), "infinite" in limits, search.THINK_TIME, "ponder" in limits)
+    search_thread = threading.Thread(target=search_and_play, args=(limits, time_manager))
     search_thread.start()
 
 
 def handle_stop():
-    global stop_search
-    stop_search = True
+    # ends the running search, if any, and waits for its bestmove
+    if search_thread is not None and search_thread.is_alive():
+        stop_event.set()
+        release.set()
+        search_thread.join()
+
+
+def handle_ponderhit():
+    # the pondered move was played: the search goes on, now on the clock values go ponder was sent with
+    if search_thread is not None and search_thread.is_alive() and time_manager.pondering:
+        time_manager.ponderhit()
+        release.set()
 
 
 # -----------------------------
@@ -160,6 +265,12 @@ def uci_loop():
         if cmd == "uci":
             print("id name PythonChessEngine")
             print("id author You")
+            print("option name Backend type combo default mailbox var mailbox var bitboard")
+            print("option name Hash type spin default 16 min 1 max 1024")
+            print("option name HashFile type string default <empty>")
+            print("option name EvalCache type spin default 8 min 0 max 1024")
+            print("option name Threads type spin default 1 min 1 max 64")
+            print("option name RootSplit type check default false")
             print("uciok")
             sys.stdout.flush()
 
@@ -169,17 +280,33 @@ def uci_loop():
 
         elif cmd == "ucinewgame":
             gs.__init__()
+            SmartMoveFinder.transposition_table.clear()
+
+        elif cmd.startswith("setoption"):
+            handle_setoption(cmd)
 
         elif cmd.startswith("position"):
             handle_position(cmd)
 
+        elif cmd.startswith("perft") or cmd.startswith("go perft"):
+            handle_perft(cmd)
+
         elif cmd.startswith("go"):
-            handle_go()
+            handle_go(cmd)
 
         elif cmd == "stop":
             handle_stop()
 
+        elif cmd == "ponderhit":
+            handle_ponderhit()
+
+        elif cmd.startswith("savehash"):
+            handle_savehash(cmd)
+
         elif cmd == "quit":
+            handle_stop()
+            handle_savehash("savehash")
+            stop_helpers()
             break
 
 
@@ -0,0 +1,273 @@
+### Micro benchmarks for the engine. Run "python bench.py" for all of them or "python bench.py <name> ..."
+
+import random
+import sys
+import time
+
+import ChessEngine
+import SmartMoveFinder
+from BitboardEngine import BitboardGameState
+
+BENCH_FENS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+]
+
+
+def load(fen, backend=ChessEngine.GameState):
+    gs = backend()
+    gs.load_fen(fen)
+    return gs
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return time.perf_counter() - start
+
+
+def bench_generators(repeat=2000):
+    """Time each piece generator over every piece of the side to move in the benchmark positions"""
+    states = [load(fen) for fen in BENCH_FENS]
+    print("%-16s %12s" % ("generator", "calls/s"))
+    for piece, name in (('p', 'getPawnMoves'), ('N', 'getKnightMoves'), ('B', 'getBishopMoves'),
+                        ('R', 'getRookMoves'), ('Q', 'getQueenMoves'), ('K', 'getKingMoves')):
+        calls = []
+        for gs in states:
+            color = 'w' if gs.whiteToMove else 'b'
+            generator = getattr(gs, name)
+            calls.extend((generator, r, c) for r in range(8) for c in range(8) if gs.board[r][c] == color + piece)
+
+        def run():
+            moves = []
+            for generator, r, c in calls:
+                generator(r, c, moves)
+
+        elapsed = timed(run, repeat)
+        print("%-16s %12.0f" % (name, repeat * len(calls) / elapsed))
+
+    calls = [(gs, r, c) for gs in states for r in range(8) for c in range(8)]
+
+    def run():
+        for gs, r, c in calls:
+            gs.squareUnderAttack(r, c)
+
+    elapsed = timed(run, repeat // 10)
+    print("%-16s %12.0f" % ("squareUnderAttack", repeat // 10 * len(calls) / elapsed))
+
+
+def bench_make_unmake(repeat=500):
+    """Make and undo every legal move of the benchmark positions"""
+    print("%-16s %12s" % ("backend", "pairs/s"))
+    for backend in (ChessEngine.GameState, BitboardGameState):
+        states = [load(fen, backend) for fen in BENCH_FENS]
+        calls = [(gs, gs.getValidMoves()) for gs in states]
+
+        def run():
+            for gs, moves in calls:
+                for move in moves:
+                    gs.makeMove(move)
+                    gs.undoMove()
+
+        elapsed = timed(run, repeat)
+        print("%-16s %12.0f" % (backend.__name__, repeat * sum(len(moves) for gs, moves in calls) / elapsed))
+
+
+def bench_perft(depth=3):
+    """Perft nodes per second over the benchmark positions"""
+    print("%-16s %12s %12s" % ("backend", "nodes", "nodes/s"))
+    for backend in (ChessEngine.GameState, BitboardGameState):
+        states = [load(fen, backend) for fen in BENCH_FENS]
+        start = time.perf_counter()
+        nodes = sum(gs.perft(depth) for gs in states)
+        print("%-16s %12d %12.0f" % (backend.__name__, nodes, nodes / (time.perf_counter() - start)))
+
+
+def search(gs, depth):
+    """Iterative deepening to a fixed depth from a cold table, returns the nodes visited"""
+    finder = SmartMoveFinder.SmartMoveFinder
+    finder.transposition_table.clear()
+    finder.pawn_table.clear()
+    finder.eval_cache.clear()
+    finder.clear_search_data()
+    SmartMoveFinder.endTime = float("inf")
+    SmartMoveFinder.counter = 0
+    finder.transposition_table.newSearch()
+    finder.iterative_deepening(gs, gs.getValidMoves(), 1, depth)
+    return SmartMoveFinder.counter
+
+
+def bench_search(depth=3):
+    """Fixed depth search over the benchmark positions"""
+    pawn_table = SmartMoveFinder.SmartMoveFinder.pawn_table
+    print("%-16s %12s %12s %12s %12s" % ("backend", "nodes", "seconds", "nodes/s", "pawn hits"))
+    for backend in (ChessEngine.GameState, BitboardGameState):
+        states = [load(fen, backend) for fen in BENCH_FENS]
+        nodes = hits = lookups = 0
+        start = time.perf_counter()
+        for gs in states:
+            nodes += search(gs, depth)
+            hits += pawn_table.hits
+            lookups += pawn_table.hits + pawn_table.misses
+        elapsed = time.perf_counter() - start
+        print("%-16s %12d %12.2f %12.0f %11.1f%%" % (backend.__name__, nodes, elapsed, nodes / elapsed,
+                                                    100.0 * hits / lookups))
+
+
+def bench_pawns(repeat=2000):
+    """Pawn structure evaluation without the pawn hash table: square-by-square helpers against the bitmask version"""
+    finder = SmartMoveFinder.SmartMoveFinder
+    states = [load(fen) for fen in BENCH_FENS]
+
+    def helpers():
+        for gs in states:
+            finder.evaluate_passed_pawns(gs)
+            finder.evaluate_pawn_weaknesses(gs)
+
+    def bitmasks():
+        for gs in states:
+            finder.pawn_structure_entry(gs)
+
+    print("%-16s %12s" % ("evaluator", "positions/s"))
+    for name, function in (("helpers", helpers), ("bitmasks", bitmasks)):
+        print("%-16s %12.0f" % (name, repeat * len(states) / timed(function, repeat)))
+
+
+def bench_lazy(depth=3):
+    """Fixed depth search with and without lazy evaluation"""
+    print("%-16s %12s %12s" % ("lazy eval", "nodes", "seconds"))
+    saved = SmartMoveFinder.LAZY_EVAL
+    for lazy in (False, True):
+        SmartMoveFinder.LAZY_EVAL = lazy
+        states = [load(fen) for fen in BENCH_FENS]
+        start = time.perf_counter()
+        nodes = sum(search(gs, depth) for gs in states)
+        print("%-16s %12d %12.2f" % ("on" if lazy else "off", nodes, time.perf_counter() - start))
+    SmartMoveFinder.LAZY_EVAL = saved
+
+
+def bench_pvs(depth=5):
+    """Nodes to reach each depth from a cold table with PVS and aspiration windows switched on and off"""
+    saved = SmartMoveFinder.PVS, SmartMoveFinder.ASPIRATION
+    print("%-16s" % "pvs/aspiration" + "".join("%10s" % ("depth %d" % d) for d in range(1, depth + 1)) + "%10s" % "seconds")
+    for pvs, aspiration in ((False, False), (True, False), (False, True), (True, True)):
+        SmartMoveFinder.PVS, SmartMoveFinder.ASPIRATION = pvs, aspiration
+        nodes = [0] * depth
+        start = time.perf_counter()
+        for fen in BENCH_FENS:
+            for d in range(1, depth + 1):
+                nodes[d - 1] += search(load(fen), d)
+        print("%-16s" % ("%s/%s" % ("on" if pvs else "off", "on" if aspiration else "off")) +
+              "".join("%10d" % n for n in nodes) + "%10.2f" % (time.perf_counter() - start))
+    SmartMoveFinder.PVS, SmartMoveFinder.ASPIRATION = saved
+
+
+def bench_evalcache(depth=3):
+    """Fixed depth search with evaluation caches of different sizes, 0 MB being a single slot"""
+    finder = SmartMoveFinder.SmartMoveFinder
+    saved = finder.eval_cache
+    print("%-16s %12s %12s %12s" % ("cache MB", "nodes", "seconds", "eval hits"))
+    for megabytes in (0, 1, 8, 32):
+        finder.eval_cache = SmartMoveFinder.EvalCache(megabytes)
+        states = [load(fen) for fen in BENCH_FENS]
+        nodes = hits = lookups = 0
+        start = time.perf_counter()
+        for gs in states:
+            nodes += search(gs, depth)
+            hits += finder.eval_cache.hits
+            lookups += finder.eval_cache.hits + finder.eval_cache.misses
+        print("%-16d %12d %12.2f %11.1f%%" % (megabytes, nodes, time.perf_counter() - start, 100.0 * hits / lookups))
+    finder.eval_cache = saved
+
+
+def bench_batch(count=2000):
+    """Positions per second for scoreBoard one position at a time against BatchEval (needs numpy)"""
+    import BatchEval
+    finder = SmartMoveFinder.SmartMoveFinder
+    rng = random.Random(1)
+    states = []
+    while len(states) < count:
+        gs = load(rng.choice(BENCH_FENS))
+        for _ in range(rng.randrange(1, 40)):
+            moves = gs.getValidMoves()
+            if not moves:
+                break
+            gs.makeMove(rng.choice(moves))
+        states.append(gs)
+
+    def scalar():
+        finder.pawn_table.clear()
+        finder.eval_cache.clear()
+        for gs in states:
+            finder.scoreBoard(gs)
+
+    packed = BatchEval.pack_states(states)
+    print("%-16s %12s" % ("evaluator", "positions/s"))
+    print("%-16s %12.0f" % ("scoreBoard", count / timed(scalar, 1)))
+    print("%-16s %12.0f" % ("BatchEval", count / timed(lambda: BatchEval.evaluate(packed), 1)))
+    print("%-16s %12.0f" % ("BatchEval+pack", count / timed(lambda: BatchEval.evaluate(BatchEval.pack_states(states)), 1)))
+
+
+def bench_smp(depth=4):
+    """Time to a fixed depth with Lazy SMP helper processes, one process being the plain search"""
+    from LazySMP import LazySMP
+    finder = SmartMoveFinder.SmartMoveFinder
+    saved = SmartMoveFinder.THINK_TIME
+    SmartMoveFinder.THINK_TIME = float("inf")
+    print("%-16s %12s %12s %12s" % ("processes", "nodes", "seconds", "speedup"))
+    baseline = None
+    for processes in (1, 2, 4):
+        smp = LazySMP(processes)
+        nodes = 0
+        elapsed = 0.0
+        for fen in BENCH_FENS:
+            gs = load(fen)
+            finder.transposition_table.clear()
+            finder.pawn_table.clear()
+            finder.eval_cache.clear()
+            start = time.perf_counter()
+            smp.findBestMove(gs, gs.getValidMoves(), depth)
+            elapsed += time.perf_counter() - start
+            nodes += smp.nodes
+        smp.close()
+        baseline = baseline or elapsed
+        print("%-16d %12d %12.2f %11.2fx" % (processes, nodes, elapsed, baseline / elapsed))
+    SmartMoveFinder.THINK_TIME = saved
+
+
+def bench_rootsplit(depth=4):
+    """Time to a fixed depth with the root moves split over 1/2/4 worker processes"""
+    from RootSplit import RootSplit
+    saved = SmartMoveFinder.THINK_TIME
+    SmartMoveFinder.THINK_TIME = float("inf")
+    print("%-16s %12s %12s %12s" % ("workers", "nodes", "seconds", "speedup"))
+    baseline = None
+    for workers in (1, 2, 4):
+        split = RootSplit(workers)
+        split.findBestMove(load(BENCH_FENS[0]), load(BENCH_FENS[0]).getValidMoves(), 1)  # start the workers
+        nodes = 0
+        elapsed = 0.0
+        for fen in BENCH_FENS:
+            gs = load(fen)
+            start = time.perf_counter()
+            split.findBestMove(gs, gs.getValidMoves(), depth)
+            elapsed += time.perf_counter() - start
+            nodes += split.nodes
+        split.close()
+        baseline = baseline or elapsed
+        print("%-16d %12d %12.2f %11.2fx" % (workers, nodes, elapsed, baseline / elapsed))
+    SmartMoveFinder.THINK_TIME = saved
+
+
+BENCHMARKS = {"generators": bench_generators, "makeunmake": bench_make_unmake, "perft": bench_perft, "search": bench_search, "pawns": bench_pawns, "lazy": bench_lazy,
+              "pvs": bench_pvs, "evalcache": bench_evalcache, "batch": bench_batch, "smp": bench_smp,
+              "rootsplit": bench_rootsplit}
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        print("== %s ==" % name)
+        BENCHMARKS[name]()
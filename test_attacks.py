@@ -0,0 +1,30 @@
+import random
+
+import ChessEngine
+from BitboardEngine import BitboardGameState
+from test_perft import POSITIONS, random_game
+
+
+def attacked_squares(gs):
+    return [(r, c) for r in range(8) for c in range(8) if gs.squareUnderAttack(r, c)]
+
+
+def test_square_under_attack_matches_bitboards():
+    rng = random.Random(7)
+    for fen, _ in POSITIONS.values():
+        mailbox = ChessEngine.GameState()
+        bitboard = BitboardGameState()
+        mailbox.load_fen(fen)
+        for _ in random_game(mailbox, rng, 20):
+            bitboard.load_fen(mailbox.to_fen())
+            assert attacked_squares(mailbox) == attacked_squares(bitboard)
+
+
+def test_square_under_attack_is_blocked_by_pieces():
+    gs = ChessEngine.GameState()
+    gs.load_fen("4k3/8/8/8/8/8/4P3/r3K2R w K - 0 1")
+    assert gs.squareUnderAttack(7, 3)  # rook on a1 sees d1
+    assert gs.squareUnderAttack(7, 4)  # and the king on e1
+    assert not gs.squareUnderAttack(7, 5)  # but not through it
+    assert not gs.squareUnderAttack(5, 4)  # nothing reaches e3 past the pawn on e2
+    assert gs.inCheck()
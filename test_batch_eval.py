@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+import SmartMoveFinder
+from test_eval import PAWN_REGRESSION
+from test_perft import BACKENDS, POSITIONS, random_game
+
+np = pytest.importorskip("numpy")
+BatchEval = pytest.importorskip("BatchEval")
+
+FENS = [fen for fen, _ in PAWN_REGRESSION + list(POSITIONS.values())]
+
+
+def test_batch_scores_fens_like_score_board():
+    expected = []
+    for fen in FENS:
+        gs = BACKENDS[0]()
+        gs.load_fen(fen)
+        expected.append(SmartMoveFinder.SmartMoveFinder.scoreBoard(gs))
+    assert BatchEval.evaluate(FENS) == pytest.approx(expected, abs=1e-9)
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+def test_batch_scores_game_positions_like_score_board(backend, monkeypatch):
+    monkeypatch.setattr(SmartMoveFinder, "LAZY_EVAL", False)
+    rng = random.Random(17)
+    packed = []
+    expected = []
+    for fen in FENS:
+        gs = backend()
+        gs.load_fen(fen)
+        for _ in random_game(gs, rng, 30):
+            packed.append(BatchEval.pack_states([gs]))
+            expected.append(SmartMoveFinder.SmartMoveFinder.scoreBoard(gs))
+    positions = tuple(np.concatenate(column) for column in zip(*packed))
+    assert BatchEval.evaluate(positions) == pytest.approx(expected, abs=1e-9)
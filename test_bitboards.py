@@ -0,0 +1,78 @@
+import random
+import time
+
+import ChessEngine
+import SmartMoveFinder
+from BitboardEngine import BitboardGameState
+
+FENS = [
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+]
+
+
+def move_keys(moves):
+    return sorted((m.moveID, m.isEnPassantMove, m.isCastleMove) for m in moves)
+
+
+def assert_same_position(mailbox, bitboard):
+    assert mailbox.board == bitboard.board
+    assert mailbox.whiteToMove == bitboard.whiteToMove
+    assert move_keys(mailbox.getValidMoves()) == move_keys(bitboard.getValidMoves())
+    assert mailbox.inCheck() == bitboard.inCheck()
+
+
+def random_playout(mailbox, bitboard, plies, rng):
+    played = 0
+    for _ in range(plies):
+        assert_same_position(mailbox, bitboard)
+        moves = mailbox.getValidMoves()
+        if not moves:
+            break
+        move = rng.choice(moves)
+        mailbox.makeMove(move)
+        bitboard.makeMove(ChessEngine.Move((move.startRow, move.startCol), (move.endRow, move.endCol), bitboard.board,
+                                           isEnPassantMove=move.isEnPassantMove, isCastleMove=move.isCastleMove,
+                                           promotedPiece=move.promotedPiece))
+        played += 1
+    for _ in range(played):
+        mailbox.undoMove()
+        bitboard.undoMove()
+        assert mailbox.board == bitboard.board
+
+
+def test_bitboards_match_board_after_make_and_undo():
+    rng = random.Random(2024)
+    for fen in [None] + FENS:
+        mailbox = ChessEngine.GameState()
+        bitboard = BitboardGameState()
+        if fen:
+            mailbox.load_fen(fen)
+            bitboard.load_fen(fen)
+        before = dict(bitboard.bitboards)
+        random_playout(mailbox, bitboard, 30, rng)
+        assert bitboard.bitboards == before
+
+
+def test_search_runs_on_bitboard_backend():
+    gs = BitboardGameState()
+    gs.load_fen(FENS[0])
+    valid_moves = gs.getValidMoves()
+    SmartMoveFinder.endTime = time.time() + 60
+    SmartMoveFinder.counter = 0
+    SmartMoveFinder.nextMove = None
+    SmartMoveFinder.SmartMoveFinder.clear_search_data()
+    SmartMoveFinder.SmartMoveFinder.findMoveNegaMaxAlphaBeta(gs, valid_moves, 2, -SmartMoveFinder.CHECKMATE,
+                                                             SmartMoveFinder.CHECKMATE, 1, 2)
+    assert SmartMoveFinder.nextMove in valid_moves
+
+
+def test_all_possible_moves_takes_captures_only_on_both_backends():
+    for backend in (ChessEngine.GameState, BitboardGameState):
+        for fen in FENS:
+            gs = backend()
+            gs.load_fen(fen)
+            expected = [m for m in gs.getAllPossibleMoves() if m.pieceCaptured != '--' or m.isPawnPromotion]
+            assert move_keys(gs.getAllPossibleMoves(capturesOnly=True)) == move_keys(expected), backend.__name__
@@ -0,0 +1,32 @@
+import random
+
+import pytest
+
+import ChessEngine
+from BitboardEngine import BitboardGameState
+from test_perft import BACKENDS, POSITIONS, random_game
+
+
+def capture_keys(moves):
+    return sorted((m.moveID, m.isEnPassantMove) for m in moves)
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+def test_capture_moves_match_filtered_valid_moves(backend):
+    rng = random.Random(11)
+    for fen, _ in POSITIONS.values():
+        gs = backend()
+        gs.load_fen(fen)
+        for valid_moves in random_game(gs, rng, 15):
+            expected = [m for m in valid_moves if m.pieceCaptured != '--' or m.isPawnPromotion]
+            captures = gs.getCaptureMoves()
+            assert capture_keys(captures) == capture_keys(expected)
+            scores = [ChessEngine.mvvLvaScore(m) for m in captures]
+            assert scores == sorted(scores, reverse=True)
+
+
+def test_capture_moves_order_victims_first():
+    gs = BitboardGameState()
+    gs.load_fen("4k3/8/8/3q1r2/4P3/8/8/4K3 w - - 0 1")
+    captures = gs.getCaptureMoves()
+    assert [m.pieceCaptured for m in captures] == ['bQ', 'bR']
@@ -0,0 +1,199 @@
+import random
+
+import pytest
+
+import SmartMoveFinder
+from HashTables import EvalCache
+from test_perft import BACKENDS, POSITIONS, random_game
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+def test_incremental_eval_sums_match_recompute(backend):
+    rng = random.Random(4)
+    for fen, _ in POSITIONS.values():
+        gs = backend()
+        gs.load_fen(fen)
+        for moves in random_game(gs, rng, 40):
+            for move in moves:
+                gs.makeMove(move)
+                assert (gs.evalMg, gs.evalEg) == gs.computeEvalSums(), move.getChessNotation()
+                assert gs.pawn_zobrist_hash == gs.generate_pawn_hash(), move.getChessNotation()
+                assert (gs.pieceCount, gs.phase) == gs.computeMaterialCounters(), move.getChessNotation()
+                gs.undoMove()
+        while gs.ply:
+            gs.undoMove()
+            assert (gs.evalMg, gs.evalEg) == gs.computeEvalSums()
+            assert gs.pawn_zobrist_hash == gs.generate_pawn_hash()
+            assert (gs.pieceCount, gs.phase) == gs.computeMaterialCounters()
+
+
+def test_cached_pawn_terms_match_full_evaluation():
+    finder = SmartMoveFinder.SmartMoveFinder
+    finder.pawn_table.clear()
+    rng = random.Random(8)
+    for fen, _ in POSITIONS.values():
+        gs = BACKENDS[0]()
+        gs.load_fen(fen)
+        for _ in random_game(gs, rng, 60):
+            expected = finder.evaluate_passed_pawns(gs) + finder.evaluate_pawn_weaknesses(gs)
+            assert finder.evaluate_pawns(gs) == pytest.approx(expected, abs=1e-9)
+            assert finder.evaluate_pawns(gs) == pytest.approx(expected, abs=1e-9)  # from the table
+    assert finder.pawn_table.hits > 0 and finder.pawn_table.misses > 0
+
+
+def test_phase_counts_pieces():
+    gs = BACKENDS[0]()
+    assert (gs.pieceCount, gs.phase) == (30, 24)
+    gs.load_fen("4k3/P7/8/8/8/8/8/4K2R w K - 0 1")
+    assert (gs.pieceCount, gs.phase) == (2, 2)
+    gs.makeMove(gs.parse_uci_move("a7a8q"))
+    assert (gs.pieceCount, gs.phase) == (2, 6)
+    gs.undoMove()
+    assert (gs.pieceCount, gs.phase) == (2, 2)
+
+
+def test_material_tapers_from_middlegame_to_endgame():
+    finder = SmartMoveFinder.SmartMoveFinder
+    gs = BACKENDS[0]()
+    assert finder.tapered_material(gs) == gs.evalMg / 100
+    gs.load_fen("4k3/pppp4/8/8/8/8/4PPPP/4K3 w - - 0 1")
+    assert finder.tapered_material(gs) == gs.evalEg / 100
+    gs.load_fen("r3k3/pppp4/8/8/8/8/4PPPP/R3K3 w - - 0 1")
+    assert gs.phase == 4
+    assert finder.tapered_material(gs) == pytest.approx((4 * gs.evalMg + 20 * gs.evalEg) / 2400)
+
+
+def test_debug_eval_checks_sums(monkeypatch):
+    monkeypatch.setattr(SmartMoveFinder, "DEBUG_EVAL", True)
+    gs = BACKENDS[0]()
+    SmartMoveFinder.SmartMoveFinder.scoreBoard(gs)
+    gs.evalMg += 1
+    with pytest.raises(AssertionError):
+        SmartMoveFinder.SmartMoveFinder.scoreBoard(gs)
+
+
+# (fen, evaluate_passed_pawns + evaluate_pawn_weaknesses) recorded from the square-by-square helpers
+PAWN_REGRESSION = [
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", 0.0),
+    ("r1bqkb1r/pp3ppp/2n1pn2/2pp4/3P4/2PBPN2/PP3PPP/RNBQK2R w KQkq - 0 6", 0.0),
+    ("4k3/pp3p1p/2p3p1/8/3P4/2P1P3/P4PPP/4K3 w - - 0 1", 0.11),
+    ("8/5k2/1p6/pP1p4/P2P4/6K1/8/8 w - - 0 1", 0.05),
+    ("8/2k5/3p4/p1pP4/P1P5/1K6/8/8 b - - 0 1", 0.05),
+    ("6k1/5ppp/8/1P6/P7/8/5PPP/6K1 w - - 0 1", 2.31),
+    ("r4rk1/pp3ppp/3p4/2pP4/2P1P3/8/PP4PP/R4RK1 w - - 0 1", -0.16),
+    ("8/P7/8/8/8/8/1k4pK/8 w - - 0 1", 0.54),
+    ("2r3k1/1p3pp1/p3p2p/3pP3/3P4/P4N2/1P3PPP/2R3K1 b - - 0 1", 0.2),
+    ("8/8/4k3/3pPp2/3P1P2/4K3/8/8 w - - 0 1", 1.414),
+]
+
+
+@pytest.mark.parametrize("fen, score", PAWN_REGRESSION)
+def test_pawn_evaluation_regression(fen, score):
+    finder = SmartMoveFinder.SmartMoveFinder
+    finder.pawn_table.clear()
+    gs = BACKENDS[0]()
+    gs.load_fen(fen)
+    assert finder.evaluate_pawns(gs) == pytest.approx(score, abs=1e-6)
+    assert finder.evaluate_passed_pawns(gs) + finder.evaluate_pawn_weaknesses(gs) == pytest.approx(score, abs=1e-6)
+
+
+def helper_pawn_features(gs):
+    finder = SmartMoveFinder.SmartMoveFinder
+    features = {}
+    for color in 'wb':
+        for row, col in gs.pieceSquares[color + 'p']:
+            features[row, col] = (finder.is_doubled_pawn(gs, row, col, color),
+                                  finder.is_isolated_pawn(gs, row, col, color),
+                                  finder.is_backward_pawn(gs, row, col, color, check_blocked=False),
+                                  finder.is_passed_pawn(gs, row, col, color),
+                                  finder.is_passed_pawn(gs, row, col, color) and
+                                  finder.has_connected_passer(gs, row, col, color))
+    return features
+
+
+def test_pawn_bitmasks_agree_with_helpers():
+    finder = SmartMoveFinder.SmartMoveFinder
+    rng = random.Random(13)
+    for fen, _ in PAWN_REGRESSION + list(POSITIONS.values()):
+        gs = BACKENDS[0]()
+        gs.load_fen(fen)
+        for _ in random_game(gs, rng, 40):
+            features = helper_pawn_features(gs)
+            fixed, isolated, backward, passers = finder.pawn_structure_entry(gs)
+            signs = {(row, col): 1 if gs.board[row][col][0] == 'b' else -1 for row, col in features}
+            assert isolated == sum(signs[square] for square, f in features.items() if f[1] and not f[0])
+            assert {(front_row + sign, col) for front_row, col, sign in backward} == \
+                   {square for square, f in features.items() if f[2] and not f[0] and not f[1]}
+            assert {(row, col, connected) for row, col, color, bonus, connected in passers} == \
+                   {square + (f[4],) for square, f in features.items() if f[3]}
+
+
+def test_lazy_eval_only_skips_scores_outside_the_window(monkeypatch):
+    monkeypatch.setattr(SmartMoveFinder, "LAZY_EVAL", True)
+    finder = SmartMoveFinder.SmartMoveFinder
+    margin = SmartMoveFinder.LAZY_MARGIN
+    for fen, _ in PAWN_REGRESSION:
+        gs = BACKENDS[0]()
+        gs.load_fen(fen)
+        exact = finder.scoreBoard(gs)
+        assert finder.scoreBoard(gs, exact - 0.5, exact + 0.5) == exact
+        assert finder.scoreBoard(gs, exact + 2 * margin, exact + 3 * margin) <= exact + 2 * margin
+        assert finder.scoreBoard(gs, exact - 3 * margin, exact - 2 * margin) >= exact - 2 * margin
+
+
+@pytest.mark.parametrize("fen", ["4k3/PPP5/8/8/8/8/8/4K3 w - - 0 1", "4k3/8/8/8/8/8/ppp1p3/4K3 b - - 0 1",
+                                 "r3k3/pppp4/8/8/8/8/4PPPP/R3K3 b - - 0 1"])
+def test_lazy_and_full_eval_put_the_score_on_the_same_side_of_the_window(fen, monkeypatch):
+    finder = SmartMoveFinder.SmartMoveFinder
+    gs = BACKENDS[0]()
+    gs.load_fen(fen)
+    monkeypatch.setattr(SmartMoveFinder, "LAZY_EVAL", False)
+    finder.eval_cache.clear()
+    exact = finder.scoreBoard(gs)
+    monkeypatch.setattr(SmartMoveFinder, "LAZY_EVAL", True)
+    for offset in (-12.0, -8.0, -5.0, -3.0, -1.0, 0.0, 1.0, 3.0, 5.0, 8.0, 12.0):
+        lower, upper = exact + offset - 0.5, exact + offset + 0.5
+        finder.eval_cache.clear()
+        lazy = finder.scoreBoard(gs, lower, upper)
+        assert (lazy <= lower, lazy >= upper) == (exact <= lower, exact >= upper), offset
+
+
+def test_eval_cache_keeps_only_exact_scores():
+    finder = SmartMoveFinder.SmartMoveFinder
+    cache = finder.eval_cache
+    margin = SmartMoveFinder.LAZY_MARGIN
+    rng = random.Random(21)
+    for fen, _ in PAWN_REGRESSION + list(POSITIONS.values()):
+        gs = BACKENDS[0]()
+        gs.load_fen(fen)
+        for _ in random_game(gs, rng, 20):
+            cache.clear()
+            exact = finder.scoreBoard(gs)
+            assert finder.scoreBoard(gs) == exact and cache.hits == 1
+            cache.clear()
+            finder.scoreBoard(gs, exact + 2 * margin, exact + 3 * margin)
+            assert cache.probe(gs.current_zobrist_hash) in (None, exact)
+
+
+def test_eval_cache_verifies_keys():
+    cache = EvalCache(1)
+    assert cache.size == 65536
+    cache.store(12345, 1.5)
+    assert cache.probe(12345) == 1.5
+    assert cache.probe(12345 + cache.size) is None
+    assert cache.hitRate() == 0.5
+
+
+@pytest.mark.parametrize("fen", ["4k3/8/8/8/8/8/PPP5/4K3 b - - 0 1", "4k3/8/8/8/8/8/PPP5/4K3 w - - 0 1",
+                                 "r3k3/pppp4/8/8/8/8/4PPPP/R3K3 b - - 0 1"])
+def test_null_move_guard_agrees_with_the_full_evaluation(fen, monkeypatch):
+    monkeypatch.setattr(SmartMoveFinder, "LAZY_EVAL", True)
+    finder = SmartMoveFinder.SmartMoveFinder
+    gs = BACKENDS[0]()
+    gs.load_fen(fen)
+    turnMultiplier = 1 if gs.whiteToMove else -1
+    finder.eval_cache.clear()
+    exact = turnMultiplier * finder.scoreBoard(gs)
+    for beta in (-8.0, -5.0, -2.0, -1.0, exact, 1.0, 2.0, 5.0, 8.0):
+        finder.eval_cache.clear()
+        assert finder.static_eval_reaches(gs, beta, turnMultiplier) == (exact >= beta), beta
@@ -0,0 +1,30 @@
+import pytest
+
+import SmartMoveFinder
+from HashTables import TranspositionTable
+from LazySMP import LazySMP
+from test_perft import BACKENDS, POSITIONS
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+def test_helpers_share_the_table_and_the_main_search_moves(backend, monkeypatch):
+    finder = SmartMoveFinder.SmartMoveFinder
+    monkeypatch.setattr(finder, "transposition_table", TranspositionTable(1))
+    monkeypatch.setattr(SmartMoveFinder, "THINK_TIME", float("inf"))
+    finder.transposition_table.store(77, 5, finder.HASH_EXACT, 0.5, 0x1ABCD)
+    smp = LazySMP(2, backend)
+    try:
+        assert finder.transposition_table is smp.table
+        assert smp.table.probe(77) == (0x1ABCD, 5, finder.HASH_EXACT, 0.5)  # what the table knew is kept
+        for name in ("kiwipete", "position4"):
+            gs = backend()
+            gs.load_fen(POSITIONS[name][0])
+            moves = gs.getValidMoves()
+            move = smp.findBestMove(gs, moves, 3)
+            assert move in moves
+            assert smp.nodes > SmartMoveFinder.counter  # the helper searched too
+        learned = bytes(smp.table.view)
+    finally:
+        smp.close()
+    assert finder.transposition_table is not smp.table
+    assert bytes(finder.transposition_table.view) == learned
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+import ChessEngine
+import SmartMoveFinder
+from test_perft import BACKENDS, POSITIONS
+
+finder = SmartMoveFinder.SmartMoveFinder
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+def test_get_legal_move_accepts_exactly_the_legal_moves(backend):
+    packed_ids = set()
+    states = []
+    for fen, _ in POSITIONS.values():
+        gs = backend()
+        gs.load_fen(fen)
+        states.append(gs)
+        packed_ids.update(move.moveID for move in gs.getValidMoves())
+    for gs in states:
+        legal = {move.moveID: move for move in gs.getValidMoves()}
+        for packed in packed_ids:
+            move = gs.getLegalMove(packed)
+            assert (move.moveID if move is not None else None) == (packed if packed in legal else None)
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+def test_pick_moves_yields_every_legal_move_once(backend):
+    rng = random.Random(3)
+    for fen, _ in POSITIONS.values():
+        gs = backend()
+        gs.load_fen(fen)
+        moves = gs.getValidMoves()
+        if not moves:
+            continue
+        finder.clear_search_data()
+        tt_move = rng.choice(moves).moveID
+        finder.killer_moves[2] = [rng.choice(moves).moveID, rng.choice(moves).moveID]
+        picked = list(finder.pick_moves(gs, tt_move, 2))
+        assert picked[0].moveID == tt_move
+        assert sorted(move.moveID for move in picked) == sorted(move.moveID for move in moves)
+
+
+@pytest.mark.parametrize("fen, score", [("k1Q5/8/1K6/8/8/8/8/8 b - - 0 1", -SmartMoveFinder.CHECKMATE),
+                                        ("k7/8/1QK5/8/8/8/8/8 b - - 0 1", SmartMoveFinder.STALEMATE)])
+def test_search_scores_positions_without_moves(fen, score):
+    gs = ChessEngine.GameState()
+    gs.load_fen(fen)
+    finder.transposition_table.clear()
+    finder.clear_search_data()
+    SmartMoveFinder.endTime = float("inf")
+    SmartMoveFinder.counter = 0
+    assert finder.findMoveNegaMaxAlphaBeta(gs, None, 2, -SmartMoveFinder.CHECKMATE, SmartMoveFinder.CHECKMATE,
+                                           -1, 2) == score
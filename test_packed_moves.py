@@ -0,0 +1,36 @@
+import ChessEngine
+from test_perft import POSITIONS
+
+
+def test_packed_moves_round_trip():
+    for fen, _ in POSITIONS.values():
+        gs = ChessEngine.GameState()
+        gs.load_fen(fen)
+        moves = gs.getValidMoves()
+        assert len({move.moveID for move in moves}) == len(moves)
+        for move in moves:
+            copy = ChessEngine.Move.fromPacked(move.moveID, gs.board)
+            assert copy == move and hash(copy) == hash(move)
+            assert (copy.pieceMoved, copy.pieceCaptured, copy.promotedPiece if copy.isPawnPromotion else None) == \
+                   (move.pieceMoved, move.pieceCaptured, move.promotedPiece if move.isPawnPromotion else None)
+
+
+def test_promotions_are_distinct_moves():
+    gs = ChessEngine.GameState()
+    gs.load_fen("8/P1k5/K7/8/8/8/8/8 w - - 0 1")
+    assert gs.parse_uci_move("a7a8n").promotedPiece == 'N'
+    assert gs.parse_uci_move("a7a8").promotedPiece == 'Q'
+    assert ChessEngine.Move((1, 0), (0, 0), gs.board) != ChessEngine.Move((1, 0), (0, 0), gs.board, promotedPiece='R')
+    assert ChessEngine.Move((1, 0), (0, 0), gs.board) != None
+
+
+def test_moves_built_from_two_squares_match_the_generated_ones():
+    gs = ChessEngine.GameState()
+    gs.load_fen("r3k2r/8/8/3pP3/8/8/8/R3K2R w KQkq d6 0 1")
+    moves = gs.getValidMoves()
+    for start, end in (((7, 4), (7, 6)), ((7, 4), (7, 2)), ((3, 4), (2, 3))):
+        move = ChessEngine.Move(start, end, gs.board)  # as ChessMain builds it from the clicks
+        assert move in moves
+        assert moves[moves.index(move)].pieceCaptured == move.pieceCaptured
+    assert ChessEngine.Move((3, 4), (2, 3), gs.board).isEnPassantMove
+    assert ChessEngine.Move((7, 4), (7, 6), gs.board).isCastleMove
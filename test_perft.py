@@ -0,0 +1,77 @@
+import pytest
+
+import ChessEngine
+from BitboardEngine import BitboardGameState
+
+# (fen, {depth: nodes}) with node counts from the standard perft tables
+POSITIONS = {
+    "startpos": ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", {1: 20, 2: 400, 3: 8902, 4: 197281}),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", {1: 48, 2: 2039, 3: 97862}),
+    "position3": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", {1: 14, 2: 191, 3: 2812, 4: 43238}),
+    "position4": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", {1: 6, 2: 264, 3: 9467}),
+    "position5": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", {1: 44, 2: 1486, 3: 62379}),
+    "ep_discovered_rank": ("8/8/8/KPp4r/8/8/8/4k3 w - c6 0 2", {1: 4, 2: 68, 3: 317}),
+    "ep_horizontal_pin": ("3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1", {1: 18, 2: 92, 3: 1670}),
+    "ep_capture_checker": ("8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1", {1: 9, 2: 50, 3: 379}),
+    "ep_diagonal_pin": ("8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1", {1: 15, 2: 126, 3: 1928}),
+    "castle_through_check": ("r3k2r/8/8/8/8/8/8/R3K1R1 b Qkq - 0 1", {1: 25, 2: 560, 3: 13607}),
+    "castle_rook_capture": ("r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1", {1: 26, 2: 1141, 3: 27826}),
+    "promotion_check": ("8/P1k5/K7/8/8/8/8/8 w - - 0 1", {1: 6, 2: 27, 3: 273}),
+    "underpromotion": ("K1k5/8/P7/8/8/8/8/8 w - - 0 1", {1: 2, 2: 6, 3: 13}),
+    "self_stalemate": ("8/k1P5/8/1K6/8/8/8/8 w - - 0 1", {1: 10, 2: 25, 3: 268}),
+    "double_check": ("8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1", {1: 37, 2: 183, 3: 6559}),
+    "promote_out_of_check": ("8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1", {1: 29, 2: 165, 3: 5160}),
+    "position6": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", {1: 46, 2: 2079, 3: 89890}),
+    "promotions": ("n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1", {1: 24, 2: 496, 3: 9483}),
+    "ep_bishop_guard": ("8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1", {1: 13, 2: 102, 3: 1266, 4: 10276}),
+    "ep_discovered_check": ("8/8/1k6/8/2pP4/8/5BK1/8 b - d3 0 1", {1: 8, 2: 104, 3: 736, 4: 9287}),
+    "castle_gives_check_short": ("5k2/8/8/8/8/8/8/4K2R w K - 0 1", {1: 15, 2: 66, 3: 1198, 4: 6399}),
+    "castle_gives_check_long": ("3k4/8/8/8/8/8/8/R3K3 w Q - 0 1", {1: 16, 2: 71, 3: 1286, 4: 7418}),
+    "promote_out_of_check_white": ("2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1", {1: 11, 2: 133, 3: 1442, 4: 19174}),
+    "promote_gives_check": ("4k3/1P6/8/8/8/8/K7/8 w - - 0 1", {1: 9, 2: 40, 3: 472, 4: 2661}),
+}
+
+BACKENDS = [ChessEngine.GameState, BitboardGameState]
+
+
+def random_game(gs, rng, plies):
+    """
+    Plays up to plies random moves on gs, yielding the legal moves of each position before its move is made.
+    The moves come from generateLegalMoves, which leaves the mate and draw flags of getValidMoves alone.
+    """
+    for _ in range(plies):
+        moves, checks = gs.generateLegalMoves()
+        if not moves:
+            return
+        yield moves
+        gs.makeMove(rng.choice(moves))
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+@pytest.mark.parametrize("name", sorted(POSITIONS))
+def test_perft(name, backend):
+    fen, expected = POSITIONS[name]
+    gs = backend()
+    gs.load_fen(fen)
+    for depth, nodes in sorted(expected.items()):
+        assert gs.perft(depth) == nodes, "%s depth %d" % (name, depth)
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+def test_divide_sums_to_perft(backend):
+    gs = backend()
+    gs.load_fen(POSITIONS["kiwipete"][0])
+    counts = gs.divide(2)
+    assert len(counts) == 48
+    assert sum(nodes for move, nodes in counts) == 2039
+    assert dict((ChessEngine.GameState.move_to_uci(move), nodes) for move, nodes in counts)["e1g1"] == 43
+
+
+def test_perft_restores_position():
+    gs = ChessEngine.GameState()
+    gs.load_fen(POSITIONS["kiwipete"][0])
+    board = [row[:] for row in gs.board]
+    zobrist_hash = gs.current_zobrist_hash
+    gs.perft(3)
+    assert gs.board == board
+    assert gs.current_zobrist_hash == zobrist_hash
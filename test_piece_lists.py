@@ -0,0 +1,31 @@
+import random
+
+import pytest
+
+from test_perft import BACKENDS, POSITIONS, random_game
+
+
+def board_piece_lists(gs):
+    pieces = {piece: set() for piece in gs.piece_map}
+    for r in range(8):
+        for c in range(8):
+            if gs.board[r][c] != "--":
+                pieces[gs.board[r][c]].add((r, c))
+    return pieces
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+def test_piece_lists_follow_make_and_undo(backend):
+    rng = random.Random(9)
+    for fen, _ in POSITIONS.values():
+        gs = backend()
+        gs.load_fen(fen)
+        for moves in random_game(gs, rng, 40):
+            for move in moves:
+                gs.makeMove(move)
+                assert gs.pieceSquares == board_piece_lists(gs), move.getChessNotation()
+                gs.undoMove()
+            assert gs.pieceSquares == board_piece_lists(gs)
+        while gs.ply:
+            gs.undoMove()
+        assert gs.pieceSquares == board_piece_lists(gs)
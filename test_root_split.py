@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+import SmartMoveFinder
+from RootSplit import RootSplit
+from TimeManager import TimeManager
+from test_perft import BACKENDS, POSITIONS
+
+
+@pytest.fixture(scope="module")
+def split():
+    split = RootSplit(2)
+    yield split
+    split.close()
+
+
+def test_root_split_finds_mate_in_one(split, monkeypatch):
+    monkeypatch.setattr(SmartMoveFinder, "THINK_TIME", float("inf"))
+    gs = BACKENDS[0]()
+    gs.load_fen("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    move = split.findBestMove(gs, gs.getValidMoves(), 3)
+    assert move == gs.parse_uci_move("a1a8")
+
+
+def test_root_split_returns_a_legal_move(split, monkeypatch):
+    monkeypatch.setattr(SmartMoveFinder, "THINK_TIME", float("inf"))
+    for name in ("kiwipete", "position4"):
+        gs = BACKENDS[0]()
+        gs.load_fen(POSITIONS[name][0])
+        moves = gs.getValidMoves()
+        assert split.findBestMove(gs, moves, 2) in moves
+        assert split.nodes > len(moves)
+
+
+def test_root_split_stops_on_time(split, monkeypatch):
+    monkeypatch.setattr(SmartMoveFinder, "THINK_TIME", 0.5)
+    gs = BACKENDS[0]()
+    gs.load_fen(POSITIONS["kiwipete"][0])
+    moves = gs.getValidMoves()
+    assert split.findBestMove(gs, moves) in moves
+
+
+@pytest.mark.parametrize("nodes", [1, 300, 2000])
+def test_root_split_keeps_the_node_limit(split, nodes):
+    gs = BACKENDS[0]()
+    gs.load_fen(POSITIONS["kiwipete"][0])
+    moves = gs.getValidMoves()
+    assert split.findBestMove(gs, moves, timeManager=TimeManager(True, nodes=nodes)) in moves
+    assert 0 < split.nodes <= nodes
+
+
+def test_root_split_stops_on_the_stop_event(split, monkeypatch):
+    stop = threading.Event()
+    monkeypatch.setattr(SmartMoveFinder, "stop_event", stop)
+    gs = BACKENDS[0]()
+    gs.load_fen(POSITIONS["kiwipete"][0])
+    moves = gs.getValidMoves()
+    threading.Timer(0.5, stop.set).start()
+    start = time.time()
+    assert split.findBestMove(gs, moves, timeManager=TimeManager(True, infinite=True)) in moves
+    assert time.time() - start < 3
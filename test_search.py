@@ -0,0 +1,161 @@
+import random
+import time
+
+import pytest
+
+import SmartMoveFinder
+from TimeManager import MAX_CLOCK_SHARE, MOVE_OVERHEAD, MOVES_TO_GO, TimeManager
+from test_perft import BACKENDS, POSITIONS, random_game
+
+finder = SmartMoveFinder.SmartMoveFinder
+
+TOGGLES = [(False, False), (True, False), (False, True), (True, True)]
+
+
+def best_move(gs, depth):
+    finder.transposition_table.clear()
+    finder.clear_search_data()
+    SmartMoveFinder.endTime = float("inf")
+    SmartMoveFinder.counter = 0
+    SmartMoveFinder.nextMove = None
+    finder.iterative_deepening(gs, gs.getValidMoves(), 1, depth)
+    return SmartMoveFinder.nextMove
+
+
+@pytest.mark.parametrize("pvs, aspiration", TOGGLES)
+@pytest.mark.parametrize("fen, uci", [("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", "a1a8"),
+                                      ("4k3/8/8/3q4/8/8/3R4/3RK3 w - - 0 1", "d2d5"),
+                                      ("4k3/8/8/8/3q4/8/8/3QK3 w - - 0 1", "d1d4")])
+def test_toggles_find_the_same_tactics(pvs, aspiration, fen, uci, monkeypatch):
+    monkeypatch.setattr(SmartMoveFinder, "PVS", pvs)
+    monkeypatch.setattr(SmartMoveFinder, "ASPIRATION", aspiration)
+    gs = BACKENDS[0]()
+    gs.load_fen(fen)
+    assert best_move(gs, 3) == gs.parse_uci_move(uci)
+
+
+@pytest.mark.parametrize("guess", [-20.0, -1.0, 0.0, 1.0, 20.0])
+def test_aspiration_search_widens_until_the_score_is_inside(guess):
+    gs = BACKENDS[0]()
+    gs.load_fen(POSITIONS["kiwipete"][0])
+    moves = gs.getValidMoves()
+    finder.clear_search_data()
+    finder.transposition_table.clear()
+    SmartMoveFinder.endTime = float("inf")
+    SmartMoveFinder.counter = 0
+    full = finder.findMoveNegaMaxAlphaBeta(gs, moves, 2, -SmartMoveFinder.CHECKMATE, SmartMoveFinder.CHECKMATE, 1, 2)
+    finder.transposition_table.clear()
+    SmartMoveFinder.nextMove = moves[0]
+    score = finder.aspiration_search(gs, moves, 2, guess)
+    assert score == pytest.approx(full)
+    assert SmartMoveFinder.nextMove in moves
+
+
+def test_time_manager_shares_the_clock():
+    tm = TimeManager(True, wtime=60000, btime=1000, winc=1000, binc=0)
+    assert tm.soft == pytest.approx((60 - MOVE_OVERHEAD) / MOVES_TO_GO + 0.75)
+    assert tm.soft < tm.hard < 60
+    tm = TimeManager(False, wtime=60000, btime=1000, movestogo=1)
+    assert tm.soft == tm.hard == pytest.approx(MAX_CLOCK_SHARE * (1 - MOVE_OVERHEAD))
+    tm = TimeManager(True, movetime=2000, wtime=60000)
+    assert tm.soft == float("inf")
+    assert tm.hard == pytest.approx(2 - MOVE_OVERHEAD)
+    assert TimeManager(True, depth=3).hard == TimeManager(True, infinite=True, wtime=10).hard == float("inf")
+    assert TimeManager(True, thinkTime=1.5).hard == 1.5
+
+
+def test_time_manager_stops_sooner_when_the_best_move_holds():
+    tm = TimeManager(True, wtime=300000)
+    tm.start -= 0.8 * tm.soft
+    assert not tm.stop_early("e2e4")
+    assert not tm.stop_early("d2d4")
+    assert not tm.stop_early("d2d4")
+    assert tm.stop_early("d2d4")
+
+
+def test_movetime_is_used_up_however_stable_the_best_move():
+    tm = TimeManager(True, movetime=10000)
+    tm.start -= 9
+    assert not any(tm.stop_early("e2e4") for _ in range(10))
+    gs = BACKENDS[0]()
+    gs.load_fen("4k3/8/8/3q4/8/8/3R4/4K3 w - -")  # Rxd5 is best from the first depth on
+    started = time.time()
+    assert finder.findBestMove(gs, gs.getValidMoves(), timeManager=TimeManager(True, movetime=600)).getChessNotation() == "Rd2d5"
+    assert time.time() - started >= 0.5
+
+
+def test_ponderhit_puts_the_search_on_the_clock():
+    tm = TimeManager(False, wtime=1000, btime=60000, binc=1000, ponder=True)
+    assert tm.soft == tm.hardDeadline == float("inf")
+    tm.ponderhit()
+    assert not tm.pondering
+    assert tm.soft == pytest.approx((60 - MOVE_OVERHEAD) / MOVES_TO_GO + 0.75)
+    assert tm.hardDeadline == pytest.approx(tm.start + tm.hard)
+    assert tm.hardDeadline < time.time() + 60
+
+
+@pytest.mark.parametrize("nodes", [1, 50, 777, 3000])
+def test_node_limit_is_exact(nodes):
+    gs = BACKENDS[0]()
+    gs.load_fen(POSITIONS["kiwipete"][0])
+    moves = gs.getValidMoves()
+    assert finder.findBestMove(gs, moves, timeManager=TimeManager(True, nodes=nodes)) in moves
+    assert SmartMoveFinder.counter == nodes
+    assert SmartMoveFinder.nodeLimit == float("inf")
+
+
+def test_depth_limit_is_kept():
+    gs = BACKENDS[0]()
+    finder.transposition_table.clear()
+    finder.findBestMove(gs, gs.getValidMoves(), timeManager=TimeManager(True, depth=3))
+    assert finder.transposition_table.probe(gs.current_zobrist_hash)[1] == 3  # the root entry of the last depth
+
+
+def test_a_root_that_fails_high_still_picks_a_move():
+    for name in ("startpos", "kiwipete", "position6"):
+        gs = BACKENDS[0]()
+        gs.load_fen(POSITIONS[name][0])
+        moves = gs.getValidMoves()
+        finder.transposition_table.clear()
+        finder.clear_search_data()
+        SmartMoveFinder.endTime = float("inf")
+        SmartMoveFinder.counter = 0
+        SmartMoveFinder.nextMove = None
+        turnMultiplier = 1 if gs.whiteToMove else -1
+        score = finder.findMoveNegaMaxAlphaBeta(gs, moves, 3, -60.0, -50.0, turnMultiplier, 3)
+        assert score >= -50.0
+        assert SmartMoveFinder.nextMove in moves
+
+
+def assert_has_legal_move_agrees(gs):
+    moves, checks = gs.generateLegalMoves()
+    found, inCheck = gs.hasLegalMove()
+    assert (found, bool(inCheck)) == (bool(moves), bool(checks))
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+def test_has_legal_move_agrees_with_the_generator(backend):
+    rng = random.Random(5)
+    for fen in [fen for fen, _ in POSITIONS.values()] + ["6kR/5ppp/8/8/8/8/8/6K1 b - -", "7k/8/5KQ1/8/8/8/8/8 b - -"]:
+        gs = backend()
+        gs.load_fen(fen)
+        for _ in random_game(gs, rng, 10):
+            assert_has_legal_move_agrees(gs)
+        assert_has_legal_move_agrees(gs)  # the position the game ended in
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=lambda backend: backend.__name__)
+def test_mate_and_stalemate_on_the_last_ply(backend):
+    gs = backend()
+    gs.load_fen("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    finder.transposition_table.clear()
+    move = finder.findBestMove(gs, gs.getValidMoves(), 1)
+    assert move.getChessNotation() == "Ra1a8"
+    # Qg6 would leave black nothing to move: a draw, not a queen up
+    gs.load_fen("7k/8/5K2/8/8/8/8/6Q1 w - - 0 1")
+    stalemate = gs.parse_uci_move("g1g6")
+    finder.transposition_table.clear()
+    SmartMoveFinder.endTime = float("inf")
+    SmartMoveFinder.counter = 0
+    assert finder.findMoveNegaMaxAlphaBeta(gs, [stalemate], 1, -SmartMoveFinder.CHECKMATE, SmartMoveFinder.CHECKMATE, 1,
+                                          1) == SmartMoveFinder.STALEMATE
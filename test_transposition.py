@@ -0,0 +1,131 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import SmartMoveFinder
+from HashTables import TranspositionTable
+from test_perft import BACKENDS, POSITIONS
+
+
+def test_entries_round_trip():
+    tt = TranspositionTable(1)
+    assert tt.probe(77) is None
+    tt.store(77, 5, SmartMoveFinder.SmartMoveFinder.HASH_BETA, -1.25, 0x1ABCD)
+    assert tt.probe(77) == (0x1ABCD, 5, SmartMoveFinder.SmartMoveFinder.HASH_BETA, -1.25)
+    assert tt.probe(77 + tt.buckets) is None
+
+
+def test_size_follows_the_memory_budget():
+    for megabytes in (1, 16, 64):
+        tt = TranspositionTable(megabytes)
+        assert len(tt.keys) * tt.SLOT_BYTES <= megabytes * 1024 * 1024 < 2 * len(tt.keys) * tt.SLOT_BYTES
+
+
+def test_depth_preferred_and_always_replace_slots():
+    tt = TranspositionTable(1)
+    deep, shallow, other = 5, 5 + tt.buckets, 5 + 2 * tt.buckets  # all in one bucket
+    tt.store(deep, 8, 0, 1.0, 11)
+    tt.store(shallow, 2, 0, 2.0, 12)
+    assert tt.probe(deep)[1] == 8 and tt.probe(shallow)[1] == 2
+    tt.store(other, 3, 0, 3.0, 13)  # a shallow entry only replaces the second slot
+    assert tt.probe(deep)[1] == 8 and tt.probe(shallow) is None and tt.probe(other)[1] == 3
+    tt.store(deep, 4, 0, 4.0, 0)  # the same position always updates, keeping its best move
+    assert tt.probe(deep) == (11, 4, 0, 4.0)
+
+
+def test_older_generations_are_replaced_first():
+    tt = TranspositionTable(1)
+    old, new = 9, 9 + tt.buckets
+    tt.store(old, 10, 0, 1.0, 1)
+    tt.newSearch()
+    tt.store(new, 1, 0, 2.0, 2)
+    assert tt.probe(old) is None and tt.probe(new)[1] == 1
+
+
+def test_hashfull_counts_the_current_search():
+    tt = TranspositionTable(1)
+    assert tt.hashfull() == 0
+    for key in range(250):
+        tt.store(key, 1, 0, 0.0, 0)
+    assert tt.hashfull() == 250
+    tt.newSearch()
+    assert tt.hashfull() == 0
+
+
+def test_torn_entries_are_rejected():
+    # another process may have written only part of a slot: each word alone must fail the key check
+    tt = TranspositionTable(1)
+    tt.store(77, 5, SmartMoveFinder.SmartMoveFinder.HASH_EXACT, 0.5, 0x1ABCD)
+    index = (77 & tt.mask) << 1
+    for words, torn in ((tt.data, tt.data[index] ^ 1), (tt.scores, 9.75)):
+        saved = words[index]
+        words[index] = torn
+        assert tt.probe(77) is None
+        words[index] = saved
+    assert tt.probe(77) == (0x1ABCD, 5, SmartMoveFinder.SmartMoveFinder.HASH_EXACT, 0.5)
+
+
+def test_search_with_a_tiny_table_finds_legal_moves():
+    finder = SmartMoveFinder.SmartMoveFinder
+    saved = finder.transposition_table
+    finder.transposition_table = TranspositionTable(0)
+    try:
+        for name in ("kiwipete", "position4", "promotions"):
+            gs = BACKENDS[0]()
+            gs.load_fen(POSITIONS[name][0])
+            moves = gs.getValidMoves()
+            finder.clear_search_data()
+            SmartMoveFinder.endTime = float("inf")
+            SmartMoveFinder.nextMove = None
+            SmartMoveFinder.counter = 0
+            for depth in (1, 2, 3):
+                finder.findMoveNegaMaxAlphaBeta(gs, moves, depth, -SmartMoveFinder.CHECKMATE,
+                                                SmartMoveFinder.CHECKMATE, 1 if gs.whiteToMove else -1, depth)
+            assert SmartMoveFinder.nextMove in moves
+        assert len(finder.transposition_table.keys) == 2
+    finally:
+        finder.transposition_table = saved
+
+
+def test_saved_table_maps_back(tmp_path):
+    path = str(tmp_path / "table.tt")
+    tt = TranspositionTable(1)
+    for key in range(1, 500):
+        tt.store(key * 7919, key % 20, key % 3, key / 8, key)
+    tt.newSearch()
+    tt.save(path)
+    loaded = TranspositionTable.load(path)
+    assert loaded.buckets == tt.buckets and loaded.generation == tt.generation
+    for key in range(1, 500):
+        assert loaded.probe(key * 7919) == tt.probe(key * 7919)
+
+    # the mapping is copy-on-write: stores change the table, not the file, until it is saved again
+    loaded.store(123456789, 9, 0, 1.5, 42)
+    assert TranspositionTable.load(path).probe(123456789) is None
+    loaded.save(path)
+    assert loaded.probe(123456789) == (42, 9, 0, 1.5)
+    assert TranspositionTable.load(path).probe(123456789) == (42, 9, 0, 1.5)
+
+
+def test_incompatible_files_are_rejected(tmp_path):
+    path = tmp_path / "table.tt"
+    TranspositionTable(1).save(str(path))
+    good = path.read_bytes()
+    for bad in (b"not a table", good[:100], b"X" + good[1:], good[:8] + b"\x07" + good[9:],
+                good[:16] + b"\x00" + good[17:]):
+        path.write_bytes(bad)
+        with pytest.raises(ValueError):
+            TranspositionTable.load(str(path))
+
+
+def test_zobrist_keys_are_the_same_in_every_process():
+    fen = POSITIONS["kiwipete"][0]
+    gs = BACKENDS[0]()
+    gs.load_fen(fen)
+    assert BACKENDS[1]().current_zobrist_hash == BACKENDS[0]().current_zobrist_hash
+    script = "import ChessEngine; gs = ChessEngine.GameState(); gs.load_fen(%r); print(gs.current_zobrist_hash)" % fen
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    assert int(output) == gs.current_zobrist_hash
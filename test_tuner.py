@@ -0,0 +1,79 @@
+import io
+import json
+import random
+
+import pytest
+
+import SmartMoveFinder
+from test_eval import PAWN_REGRESSION
+from test_perft import BACKENDS, POSITIONS, random_game
+
+np = pytest.importorskip("numpy")
+BatchEval = pytest.importorskip("BatchEval")
+Tuner = pytest.importorskip("Tuner")
+
+
+def labelled_positions(count):
+    """Positions from random games, labelled by who is ahead in material with some noise"""
+    rng = random.Random(3)
+    lines = []
+    fens = [fen for fen, _ in PAWN_REGRESSION + list(POSITIONS.values())]
+    while len(lines) < count:
+        gs = BACKENDS[0]()
+        gs.load_fen(rng.choice(fens))
+        for _ in random_game(gs, rng, rng.randrange(1, 20)):
+            pass
+        material = (gs.evalMg + gs.evalEg) / 200 + rng.gauss(0, 1)
+        result = "1-0" if material > 1 else "0-1" if material < -1 else "1/2-1/2"
+        lines.append('%s c9 "%s";' % (gs.to_fen(), result))
+    return lines
+
+
+def test_parse_line_reads_both_result_formats():
+    fen = "4k3/8/8/8/8/8/4P3/4K3 w - -"
+    assert Tuner.parse_line('%s c9 "1-0";' % fen) == (fen, 1.0)
+    assert Tuner.parse_line('%s c9 "1/2-1/2";' % fen) == (fen, 0.5)
+    assert Tuner.parse_line("%s 0 1 [0.0]" % fen) == (fen, 0.0)
+    assert Tuner.parse_line(fen) is None
+
+
+def test_shard_features_match_batch_eval(tmp_path):
+    positions = [Tuner.parse_line(line) for line in labelled_positions(300)]
+    prefix, count = Tuner.build_shard(positions, str(tmp_path / "shard"))
+    assert count == 300
+    expected = BatchEval.evaluate([fen for fen, result in positions])
+    assert Tuner.predict(Tuner.load_shard(prefix), Tuner.initial_params()) == pytest.approx(expected, abs=1e-9)
+
+
+def test_gradient_matches_finite_differences(tmp_path):
+    positions = [Tuner.parse_line(line) for line in labelled_positions(200)]
+    prefix, count = Tuner.build_shard(positions, str(tmp_path / "shard"))
+    params = Tuner.initial_params()
+    error, gradient = Tuner.shard_gradient(prefix, params, 1.0)
+    for index in (1 * 64 + 36, 6 * 64 + 5 * 64 + 60, 0 * 64 + 12, Tuner.PASSED_OFFSET + 4,
+                  Tuner.CANDIDATE_OFFSET + 3, Tuner.WEAKNESS_OFFSET + 1):
+        step = np.zeros(Tuner.PARAM_COUNT)
+        step[index] = 1e-4
+        up = Tuner.shard_errors(prefix, params + step, [1.0])[0]
+        down = Tuner.shard_errors(prefix, params - step, [1.0])[0]
+        assert gradient[index] == pytest.approx((up - down) / 2e-4, rel=1e-4, abs=1e-7)
+
+
+def test_tune_lowers_the_error_and_writes_loadable_params(tmp_path):
+    data = tmp_path / "positions.epd"
+    data.write_text("\n".join(labelled_positions(400)) + "\n")
+    output = tmp_path / "eval_params.json"
+    before, after = Tuner.tune(str(data), str(output), epochs=20, workers=2, log=io.StringIO())
+    assert after < before
+
+    saved = tmp_path / "saved.json"
+    saved.write_text(json.dumps(SmartMoveFinder.eval_params()))
+    try:
+        SmartMoveFinder.load_eval_params(str(output))
+        tuned = json.loads(output.read_text())
+        assert SmartMoveFinder.PIECE_SQUARE_MG["wN"] == tuned["pieceSquareMg"]["N"]
+        assert SmartMoveFinder.PIECE_SQUARE_MG["bN"][0] == -tuned["pieceSquareMg"]["N"][56]
+        assert SmartMoveFinder.DOUBLED_PENALTY == tuned["DOUBLED_PENALTY"]
+    finally:
+        SmartMoveFinder.load_eval_params(str(saved))
+    assert SmartMoveFinder.eval_params() == json.loads(saved.read_text())
@@ -0,0 +1,66 @@
+import time
+
+import UCI
+
+
+def test_parse_go():
+    assert UCI.parse_go("go") == {}
+    assert UCI.parse_go("go wtime 300000 btime 290000 winc 2000 binc 2000 movestogo 12") == \
+        {"wtime": 300000, "btime": 290000, "winc": 2000, "binc": 2000, "movestogo": 12}
+    assert UCI.parse_go("go depth 5 nodes 1000 movetime 250") == {"depth": 5, "nodes": 1000, "movetime": 250}
+    assert UCI.parse_go("go infinite searchmoves e2e4 d2d4") == {"infinite": True, "searchmoves": ["e2e4", "d2d4"]}
+    assert UCI.parse_go("go ponder wtime x btime 10") == {"ponder": True, "btime": 10}
+
+
+def run(capsys, *commands):
+    for cmd in commands:
+        if cmd.startswith("position"):
+            UCI.handle_position(cmd)
+        elif cmd.startswith("go"):
+            UCI.handle_go(cmd)
+        elif cmd == "ponderhit":
+            UCI.handle_ponderhit()
+        else:
+            UCI.handle_stop()
+    UCI.search_thread.join()
+    return capsys.readouterr().out.split()
+
+
+def test_go_nodes_reports_exactly_that_many(capsys):
+    out = run(capsys, "position startpos moves e2e4", "go nodes 400")
+    assert out[out.index("nodes") + 1] == "400"
+    assert out[-2] == "bestmove"
+
+
+def test_go_searchmoves_restricts_the_root(capsys):
+    out = run(capsys, "position startpos", "go depth 2 searchmoves a2a3 h2h4")
+    assert out[-1] in ("a2a3", "h2h4")
+
+
+def test_stop_ends_an_infinite_search(capsys):
+    out = run(capsys, "position startpos", "go infinite", "stop")
+    assert out[-2] == "bestmove"
+    assert UCI.parse_uci_move(UCI.gs, out[-1]) is not None
+
+
+def test_ponderhit_goes_on_with_the_clock_it_was_given(capsys):
+    started = time.time()
+    out = run(capsys, "position startpos", "go ponder wtime 2000 btime 2000", "ponderhit")
+    assert out[-2] == "bestmove"
+    assert not UCI.time_manager.pondering
+    assert UCI.time_manager.hard < 2
+    assert time.time() - started < 2
+
+
+def test_root_split_option_searches_within_the_limits(capsys):
+    UCI.handle_setoption("setoption name RootSplit value true")
+    UCI.handle_setoption("setoption name Threads value 2")
+    try:
+        assert isinstance(UCI.smp, UCI.RootSplit)
+        out = run(capsys, "position startpos", "go nodes 300")
+        assert 0 < int(out[out.index("nodes") + 1]) <= 300
+        assert UCI.parse_uci_move(UCI.gs, out[-1]) is not None
+    finally:
+        UCI.handle_setoption("setoption name Threads value 1")
+        UCI.handle_setoption("setoption name RootSplit value false")
+    assert UCI.smp is None
@@ -0,0 +1,62 @@
+import random
+
+import ChessEngine
+from test_perft import POSITIONS, random_game
+
+
+def snapshot(gs):
+    rights = gs.currentCastlingRights
+    return ([row[:] for row in gs.board], gs.whiteToMove, gs.whiteKingPosition, gs.blackKingPosition,
+            (rights.wks, rights.bks, rights.wqs, rights.bqs), gs.enPassantPossible, gs.current_zobrist_hash)
+
+
+def test_undo_restores_every_field():
+    rng = random.Random(5)
+    for fen, _ in POSITIONS.values():
+        gs = ChessEngine.GameState()
+        gs.load_fen(fen)
+        for moves in random_game(gs, rng, 30):
+            before = snapshot(gs)
+            for move in moves:
+                gs.makeMove(move)
+                gs.undoMove()
+                assert snapshot(gs) == before, move.getChessNotation()
+
+
+def test_undo_restores_en_passant_square_after_quiet_move():
+    gs = ChessEngine.GameState()
+    gs.load_fen("4k3/8/8/3Pp3/8/8/8/4K3 w - e6 0 2")
+    gs.makeMove(gs.parse_uci_move("e1d1"))
+    gs.undoMove()
+    assert gs.enPassantPossible == (2, 4)
+    assert gs.parse_uci_move("d5e6").isEnPassantMove
+
+
+def test_undo_stack_grows_past_its_preallocated_size():
+    gs = ChessEngine.GameState()
+    start = snapshot(gs)
+    shuffle = []
+    for uci in ("g1f3", "g8f6", "f3g1", "f6g8"):
+        shuffle.append(gs.parse_uci_move(uci))
+        gs.makeMove(shuffle[-1])
+    for _ in shuffle:
+        gs.undoMove()
+    plies = ChessEngine.UNDO_STACK_SIZE + 10
+    for ply in range(plies):
+        gs.makeMove(shuffle[ply % 4])
+    assert len(gs.moveLog) == plies
+    for _ in range(plies):
+        gs.undoMove()
+    assert snapshot(gs) == start and gs.moveLog == []
+
+
+def test_null_move_hash_matches_a_fresh_hash():
+    for fen, _ in POSITIONS.values():
+        gs = ChessEngine.GameState()
+        gs.load_fen(fen)
+        before = snapshot(gs)
+        enPassant = gs.makeNullMove()
+        assert gs.enPassantPossible == ()
+        assert gs.current_zobrist_hash == gs.generate_initial_hash()
+        gs.undoNullMove(enPassant)
+        assert snapshot(gs) == before